@@ -0,0 +1,126 @@
+import time
+
+# Entre fotogramas cuando no hace falta animar con fluidez (en reposo o sin foco)
+INTERVALO_REPOSO_MS = 500
+
+
+class PlanificadorAnimacion:
+    """Programa los fotogramas de una animación de Tk según el estado de la ventana
+
+    - Ventana minimizada u oculta: en pausa, sin ningún after() pendiente.
+    - Asistente activo (`activa()` verdadero) y ventana con foco: a
+      `intervalo_ms`.
+    - Activo sin foco, o en reposo con foco: a `intervalo_reposo_ms`.
+    - En reposo y sin foco: en pausa hasta que cambie algo.
+
+    Quien cambie el estado desde el hilo principal debe llamar a
+    despertar() para volver a la velocidad normal sin esperar al siguiente
+    fotograma lento. También mide lo que cuesta dibujar cada fotograma.
+    """
+
+    def __init__(self, ventana, dibujar, activa, intervalo_ms=50,
+                 intervalo_reposo_ms=INTERVALO_REPOSO_MS):
+        self.ventana = ventana
+        self.dibujar = dibujar
+        self.activa = activa
+        self.intervalo_ms = intervalo_ms
+        self.intervalo_reposo_ms = intervalo_reposo_ms
+        self.visible = True
+        self.enfocada = True
+        self._programado = None
+        self._espera = None  # Intervalo del fotograma programado
+        self._detenida = False
+        self.fotogramas = 0
+        self.coste_total = 0.0
+        self.coste_maximo = 0.0
+
+        ventana.bind("<Map>", lambda evento: self._al_mapear(evento, True), add="+")
+        ventana.bind("<Unmap>", lambda evento: self._al_mapear(evento, False), add="+")
+        ventana.bind("<FocusIn>", self._al_cambiar_foco, add="+")
+        ventana.bind("<FocusOut>", self._al_cambiar_foco, add="+")
+
+    def iniciar(self, retardo_ms=100):
+        self._programar(retardo_ms)
+
+    def detener(self):
+        self._detenida = True
+        self._cancelar()
+
+    def despertar(self):
+        """Dibuja cuanto antes si el fotograma programado es lento o no hay ninguno"""
+        if self._detenida or self._espera == self.intervalo_ms:
+            return
+        self._cancelar()
+        self._programar(0)
+
+    def intervalo(self):
+        """Milisegundos hasta el siguiente fotograma, o None para pausar"""
+        if not self.visible:
+            return None
+        activa = self.activa()
+        if activa and self.enfocada:
+            return self.intervalo_ms
+        if activa or self.enfocada:
+            return self.intervalo_reposo_ms
+        return None
+
+    def _programar(self, espera):
+        self._espera = espera
+        self._programado = self.ventana.after(espera, self._fotograma)
+
+    def _cancelar(self):
+        if self._programado is not None:
+            self.ventana.after_cancel(self._programado)
+        self._programado = None
+        self._espera = None
+
+    def _fotograma(self):
+        self._programado = None
+        self._espera = None
+        if self._detenida:
+            return
+
+        inicio = time.perf_counter()
+        try:
+            self.dibujar()
+        except Exception as e:
+            print(f"Error en animación: {e}")
+        coste = time.perf_counter() - inicio
+        self.fotogramas += 1
+        self.coste_total += coste
+        self.coste_maximo = max(self.coste_maximo, coste)
+
+        espera = self.intervalo()
+        if espera is not None:
+            self._programar(espera)
+
+    def _al_mapear(self, evento, visible):
+        # Los widgets hijos también generan Map al crearse; solo cuenta la ventana
+        if evento.widget is not self.ventana:
+            return
+        self.visible = visible
+        if visible:
+            self.despertar()
+        else:
+            self._cancelar()
+
+    def _al_cambiar_foco(self, _evento):
+        # FocusIn/FocusOut también llegan al moverse el foco entre widgets de
+        # la ventana; lo que importa es si la aplicación tiene el foco
+        self.ventana.after_idle(self._comprobar_foco)
+
+    def _comprobar_foco(self):
+        enfocada = self.ventana.focus_displayof() is not None
+        if enfocada != self.enfocada:
+            self.enfocada = enfocada
+            self.despertar()
+
+    def resumen(self):
+        """Línea de texto con el coste medido por fotograma"""
+        if not self.fotogramas:
+            return "🎞️ Animación: sin fotogramas todavía"
+        espera = self.intervalo()
+        ritmo = f"{1000 / espera:.0f} fps" if espera else "en pausa"
+        return (f"🎞️ Animación: {self.fotogramas} fotogramas, "
+                f"{self.coste_total / self.fotogramas * 1000:.2f} ms de media por fotograma "
+                f"(máx {self.coste_maximo * 1000:.2f} ms), ahora {ritmo}")
@@ -1,66 +1,486 @@
-import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox, simpledialog
 import datetime
+import importlib.util
 import random
 import webbrowser
 import threading
-import math
 import time
 import json
 import os
-import requests
+import copy
+import queue
 from typing import List, Dict
+from cache_respuestas import CacheRespuestas, hash_contexto, normalizar_prompt
+from cache_semantico import CacheSemantico, NUMPY_AVAILABLE
+from contexto_ia import ConstructorContexto
+from enrutador_ia import EnrutadorIA
+from limitador_ia import LimitadorIA, CODIGOS_REINTENTABLES
+from metricas_ia import MetricasIA, traza_actual, VARIABLE_EXPORTACION
+from configuracion_ia import AlmacenConfiguracion, ruta_datos
+from registro_ia import RegistroConversacion
+from indice_historial import IndiceBM25
+from coalescencia_ia import CoalescedorIA
+from intenciones import Intencion, Coincidencia, ReconocedorIntenciones, INICIO, COMPLETA
+from clasificador_intenciones import ClasificadorEnSegundoPlano
+from sesiones_ia import Conversacion, GestorSesiones, Turno
+from calibracion_voz import CalibradorRuido, reconocer
 
-# Importaciones opcionales para funciones de voz
-try:
-    import speech_recognition as sr
-    SPEECH_AVAILABLE = True
-except ImportError:
-    SPEECH_AVAILABLE = False
+# Dependencias opcionales para funciones de voz: aquí solo se comprueba que
+# están instaladas y se importan al abrir los dispositivos, en segundo plano
+# (requests tampoco se importa hasta abrir la primera sesión HTTP)
+SPEECH_AVAILABLE = importlib.util.find_spec("speech_recognition") is not None
+TTS_AVAILABLE = importlib.util.find_spec("pyttsx3") is not None
 
-try:
-    import pyttsx3
-    TTS_AVAILABLE = True
-except ImportError:
-    TTS_AVAILABLE = False
+# Hosts de cada proveedor (se pueden sustituir, p. ej. por servidor_simulado.py)
+HOSTS_IA = {
+    "openai": "https://api.openai.com",
+    "gemini": "https://generativelanguage.googleapis.com",
+    "huggingface": "https://api-inference.huggingface.co",
+}
+
+# Prefijos con los que los conectores devuelven errores en lugar de respuestas
+PREFIJOS_ERROR = ("❌", "⏰", "🤔", "⏹️")
+# Respuesta de una petición cancelada por el usuario (no se guarda en historial ni caché)
+RESPUESTA_CANCELADA = "⏹️ Respuesta cancelada"
+# Segundos que hablar() y escuchar() esperan a que se abran los dispositivos de voz
+ESPERA_VOZ = 10
+
+# Comandos que se resuelven sin IA; a mayor prioridad, antes se eligen
+INTENCIONES_IA = [
+    Intencion("configurar", ["configurar"], prioridad=100, posicion=INICIO),
+    Intencion("diagnostico", ["diagnóstico"], prioridad=95, posicion=COMPLETA),
+    # La consulta puede contener "hora", "hola"... así que va por delante
+    Intencion("buscar_historial", ["buscar en historial", "buscar en el historial"],
+              prioridad=90, posicion=INICIO),
+    Intencion("saludo", ["hola", "buenos días", "buenas tardes", "hey"], prioridad=80),
+    Intencion("hora", ["hora", "qué hora"], prioridad=70),
+    Intencion("fecha", ["fecha", "qué día"], prioridad=60),
+    Intencion("navegador", ["abrir navegador", "abre internet"], prioridad=50),
+    Intencion("buscar", ["buscar"], prioridad=40, posicion=INICIO),
+    Intencion("despedida", ["adiós", "hasta luego", "bye"], prioridad=30),
+    Intencion("ayuda", ["ayuda", "qué puedes hacer"], prioridad=20),
+]
+RECONOCEDOR_IA = ReconocedorIntenciones(INTENCIONES_IA)
+# Intenciones que puede activar el clasificador local: solo las que se
+# limitan a contestar. Abrir el navegador o buscar exige las palabras clave
+INTENCIONES_CLASIFICADOR = {"saludo", "hora", "fecha", "despedida", "ayuda"}
 
 class ConectorIA:
     """Clase para manejar conexiones con diferentes APIs de IA"""
     
-    def __init__(self):
+    def __init__(self, tamano_pool=4, hedging=False, retardo_hedging=1.0,
+                 ruta_cache="cache_respuestas.db", umbral_semantico=0.9,
+                 presupuesto_contexto=1200, plazo_peticion=30, hosts=None,
+                 limites_ritmo=None, ruta_config=None, ruta_historial="historial", configuracion=None,
+                 max_sesiones=10_000, memoria_sesiones=64 * 1024 * 1024, inactividad_sesion=1800.0):
+        # Configuración en una ruta fija, guardada en segundo plano y recargada
+        # si se edita desde fuera (o la que se pase, p. ej. una ConfiguracionEnMemoria)
+        self.configuracion = configuracion or AlmacenConfiguracion(ruta_config)
         self.api_keys = self.cargar_api_keys()
-        self.historial_conversacion = []
+        # La caché y el historial van junto a la configuración: las rutas
+        # relativas no dependen del directorio desde el que se lance (y se
+        # mudan con ella si se acaba de migrar un config.json antiguo)
+        directorio_datos = os.path.dirname(self.configuracion.ruta)
+        origen = self.configuracion.migrada_desde
+        if ruta_cache:
+            ruta_cache = ruta_datos(ruta_cache, directorio_datos, origen)
+        if ruta_historial:
+            ruta_historial = ruta_datos(ruta_historial, directorio_datos, origen)
         self.max_historial = 10  # Mantener últimas 10 interacciones
+        
+        # Contexto limitado por tokens: turnos recientes completos y un
+        # resumen acumulado de los que ya salieron del historial
+        self.constructor_contexto = ConstructorContexto(presupuesto_tokens=presupuesto_contexto)
+        self.conversacion = Conversacion(self.max_historial)
+        
+        # Conversaciones por id de sesión (varios clientes en un mismo
+        # proceso), con expulsión de las inactivas y límite de memoria
+        self.conversaciones = GestorSesiones(self.max_historial, max_sesiones, memoria_sesiones,
+                                             inactividad_sesion)
+        
+        # Registro en disco de todos los turnos (None para no guardarlos) y
+        # búsqueda de texto sobre él. El índice se carga en segundo plano desde
+        # la copia guardada al cerrar y se completa con los turnos posteriores
+        self.registro = None
+        self.indice_historial = None  # Disponible cuando termina de cargarse
+        self._indice_pendientes = []
+        self._lock_indice = threading.Lock()
+        # Número en el registro del último turno que guardó cada hilo, ver turno_guardado()
+        self._guardado = threading.local()
+        if ruta_historial:
+            try:
+                self.registro = RegistroConversacion(ruta_historial)
+                self.ruta_indice = os.path.join(ruta_historial, "indice_bm25.bin")
+                self.calentar_contexto()
+                threading.Thread(target=self.indexar_historial, args=(self.registro.total,),
+                                 daemon=True).start()
+            except Exception as e:
+                print(f"Error abriendo historial de conversación: {e}")
+        
+        # Enrutado por latencia con cortocircuito para proveedores que fallan
+        self.enrutador = EnrutadorIA()
+        
+        # Límite de ritmo por proveedor y reintentos ante 429/503 dentro del plazo
+        self.limitador = LimitadorIA(limites_ritmo)
+        self.plazo_peticion = plazo_peticion
+        
+        # Peticiones idénticas en curso comparten una sola llamada (compartido
+        # entre conversaciones, cada una con su contexto en la clave)
+        self.coalescedor = CoalescedorIA()
+        
+        # Trazas de tiempos por llamada e histogramas por proveedor; con la
+        # variable ASISTENTE_IA_METRICAS se vuelcan a ese archivo JSON cada minuto
+        self.metricas = MetricasIA()
+        if os.environ.get(VARIABLE_EXPORTACION):
+            self.metricas.iniciar_exportacion(os.environ[VARIABLE_EXPORTACION])
+        
+        # Caché persistente de respuestas (None para desactivarla)
+        self.cache = None
+        if ruta_cache:
+            try:
+                self.cache = CacheRespuestas(ruta_cache)
+            except Exception as e:
+                print(f"Error abriendo caché de respuestas: {e}")
+        
+        # Índice de preguntas parecidas sobre la caché (requiere numpy)
+        self.cache_semantico = None  # Disponible cuando numpy termina de importarse
+        if self.cache and NUMPY_AVAILABLE and umbral_semantico is not None:
+            threading.Thread(target=self.cargar_indice_semantico, args=(umbral_semantico,),
+                             daemon=True).start()
+        
+        # Sesiones HTTP con keep-alive, una por proveedor
+        self.hosts = dict(HOSTS_IA, **(hosts or {}))
+        self.tamano_pool = tamano_pool
+        self.sesiones = {}
+        self.contadores_pool = {}
+        self._precalentados = set()  # Servicios con la conexión ya abierta (o abriéndose)
+        self._lock_sesiones = threading.Lock()
+        
+        # Peticiones "hedged": en modo auto se lanza un segundo proveedor si el
+        # primero no respondió tras retardo_hedging segundos (0 = a la vez)
+        self.hedging = hedging
+        self.retardo_hedging = retardo_hedging
+        self.estadisticas_hedging = {
+            "peticiones": 0,
+            "respaldos_lanzados": 0,
+            "victorias": {},
+            "latencia_ahorrada": 0.0
+        }
+        self._lock_hedging = threading.Lock()
+        
+        self.configuracion.suscribir(self.aplicar_configuracion)
     
-    def cargar_api_keys(self):
-        """Carga las API keys desde un archivo JSON"""
-        try:
-            if os.path.exists("config.json"):
-                with open("config.json", "r") as f:
-                    return json.load(f)
-            else:
-                return {}
-        except:
-            return {}
+    def nueva_conversacion(self):
+        """Devuelve un conector con historial propio que comparte conexiones, caché y límites"""
+        conector = copy.copy(self)
+        conector.conversacion = Conversacion(self.max_historial)
+        conector.registro = None  # Solo la conversación principal se guarda en disco
+        return conector
     
-    def guardar_api_keys(self, keys):
-        """Guarda las API keys en un archivo JSON"""
+    def _sesion(self, servicio):
+        """Devuelve la sesión HTTP de un servicio, creándola si hace falta (requiere el lock)"""
+        sesion = self.sesiones.get(servicio)
+        if sesion is None:
+            import requests
+            from conexiones_ia import AdaptadorMedido
+            sesion = requests.Session()
+            adaptador = AdaptadorMedido(pool_connections=1, pool_maxsize=self.tamano_pool)
+            sesion.mount("https://", adaptador)
+            sesion.mount("http://", adaptador)
+            self.sesiones[servicio] = sesion
+            self.contadores_pool[servicio] = {"peticiones": 0, "precalentamientos": 0, "errores_precalentamiento": 0}
+        return sesion
+    
+    def obtener_sesion(self, servicio):
+        """Devuelve la sesión HTTP reutilizable (keep-alive) de un servicio"""
+        with self._lock_sesiones:
+            sesion = self._sesion(servicio)
+            self.contadores_pool[servicio]["peticiones"] += 1
+            return sesion
+    
+    def precalentar(self, servicio):
+        """Abre en segundo plano la conexión (DNS, TCP y TLS) con un servicio
+        
+        Solo una vez por servicio: se repite únicamente si su sesión se cerró
+        (cambio de API key o cerrar_sesiones). Devuelve el hilo, o None si no
+        hacía falta.
+        """
+        if servicio not in self.hosts:
+            return None
+        with self._lock_sesiones:
+            if servicio in self._precalentados:
+                return None
+            self._precalentados.add(servicio)
+        
+        def _abrir_conexion():
+            with self._lock_sesiones:
+                sesion = self._sesion(servicio)
+                self.contadores_pool[servicio]["precalentamientos"] += 1
+            try:
+                # Cualquier respuesta deja la conexión abierta en el pool
+                sesion.head(self.hosts[servicio], timeout=10)
+            except Exception:
+                with self._lock_sesiones:
+                    self.contadores_pool[servicio]["errores_precalentamiento"] += 1
+        
+        hilo = threading.Thread(target=_abrir_conexion, daemon=True)
+        hilo.start()
+        return hilo
+    
+    def precalentar_servicios(self):
+        """Precalienta los servicios que se usarían en modo automático"""
+        for servicio in self.servicios_candidatos():
+            self.precalentar(servicio)
+    
+    def enviar(self, servicio, url, **kwargs):
+        """Hace un POST respetando el límite de ritmo y reintenta ante 429/503
+        
+        Los reintentos usan backoff exponencial con jitter y respetan
+        Retry-After, siempre dentro de plazo_peticion segundos en total.
+        """
+        limite = time.monotonic() + self.plazo_peticion
+        traza = traza_actual()
+        intento = 0
+        while True:
+            inicio_espera = time.perf_counter()
+            turno = self.limitador.adquirir(servicio, limite)
+            if traza:
+                traza.espera_cola += time.perf_counter() - inicio_espera
+            if not turno:
+                self.limitador.registrar_rechazo(servicio)
+                import requests
+                raise requests.exceptions.Timeout(f"Límite de ritmo de {servicio} agotó el plazo")
+            
+            restante = max(1.0, limite - time.monotonic())
+            inicio_envio = time.perf_counter()
+            response = self.obtener_sesion(servicio).post(url, timeout=restante, **kwargs)
+            if traza:
+                traza.registrar_peticion(kwargs.get("json"))
+                traza.registrar_respuesta(response, inicio_envio, kwargs.get("stream", False))
+            self.limitador.registrar_cabeceras(servicio, response.headers)
+            if response.status_code not in CODIGOS_REINTENTABLES:
+                return response
+            
+            # Sin cuota no sirve de nada esperar
+            if intento >= self.limitador.max_reintentos or "insufficient_quota" in response.text:
+                self.limitador.registrar_rechazo(servicio)
+                return response
+            espera = self.limitador.espera_reintento(servicio, intento, response.headers)
+            if time.monotonic() + espera >= limite:
+                self.limitador.registrar_rechazo(servicio)
+                return response
+            
+            if traza:
+                traza.reintentos += 1
+            response.close()
+            time.sleep(espera)
+            intento += 1
+    
+    def estadisticas_pool(self):
+        """Devuelve estadísticas de los pools de conexiones por servicio"""
+        estadisticas = {}
+        with self._lock_sesiones:
+            for servicio, sesion in self.sesiones.items():
+                conexiones_abiertas = 0
+                peticiones_http = 0
+                for adaptador in sesion.adapters.values():
+                    pools = adaptador.poolmanager.pools
+                    for clave in pools.keys():
+                        try:
+                            pool = pools[clave]
+                        except KeyError:
+                            continue
+                        conexiones_abiertas += pool.num_connections
+                        peticiones_http += pool.num_requests
+                
+                datos = dict(self.contadores_pool[servicio])
+                datos["conexiones_abiertas"] = conexiones_abiertas
+                datos["peticiones_http"] = peticiones_http
+                datos["conexiones_reutilizadas"] = max(0, peticiones_http - conexiones_abiertas)
+                estadisticas[servicio] = datos
+        return estadisticas
+    
+    def cerrar_sesiones(self):
+        """Cierra todas las conexiones abiertas"""
+        with self._lock_sesiones:
+            for sesion in self.sesiones.values():
+                sesion.close()
+            self.sesiones.clear()
+            self._precalentados.clear()
+    
+    def cargar_indice_semantico(self, umbral):
+        """Crea el índice semántico e indexa las entradas guardadas en la caché persistente"""
         try:
-            with open("config.json", "w") as f:
-                json.dump(keys, f, indent=2)
-            self.api_keys = keys
+            self.cache_semantico = CacheSemantico(umbral=umbral)
+            entradas = [(clave, servicio, contexto, prompt)
+                        for clave, servicio, prompt, contexto in self.cache.entradas()]
+            for inicio in range(0, len(entradas), 1000):
+                self.cache_semantico.agregar_lote(entradas[inicio:inicio + 1000])
         except Exception as e:
-            print(f"Error guardando configuración: {e}")
+            print(f"Error cargando índice semántico: {e}")
+    
+    def buscar_en_cache(self, servicio, mensaje, contexto):
+        """Busca una respuesta guardada para el mensaje exacto o uno casi idéntico
+        
+        Cuenta un solo acierto o fallo por búsqueda, aunque se consulten las dos cachés.
+        """
+        semantico = self.cache_semantico
+        respuesta = self.cache.obtener(servicio, mensaje, contexto, contar_fallo=semantico is None)
+        if respuesta is None and semantico:
+            parecida = semantico.buscar(servicio, contexto, mensaje)
+            if not parecida:
+                self.cache.contar_fallo()
+                return None
+            clave, _ = parecida
+            respuesta = self.cache.obtener_por_clave(clave)
+            if respuesta is None:
+                # La entrada caducó o fue desalojada de la caché
+                semantico.descartar(clave)
+        return respuesta
+    
+    def diagnostico(self):
+        """Resumen de tiempos, errores, caché y estado de los proveedores"""
+        lineas = ["🩺 **Diagnóstico de la IA**", "", self.metricas.resumen()]
+        
+        enrutador = self.enrutador.estadisticas()
+        if enrutador:
+            lineas.append("")
+            for servicio, datos in enrutador.items():
+                lineas.append(f"🔌 {servicio}: circuito {datos['estado']}")
+        
+        if self.cache:
+            cache = self.cache.estadisticas()
+            lineas.append("")
+            lineas.append(f"💾 Caché: {cache['aciertos']} aciertos, {cache['fallos']} fallos, "
+                          f"{cache['entradas']} entradas")
+        
+        pools = self.estadisticas_pool()
+        if pools:
+            lineas.append("")
+            for servicio, datos in sorted(pools.items()):
+                lineas.append(f"🔗 Conexiones {servicio}: {datos['conexiones_abiertas']} abiertas, "
+                              f"{datos['conexiones_reutilizadas']} reutilizadas de {datos['peticiones_http']} "
+                              f"peticiones ({datos['precalentamientos']} precalentadas, "
+                              f"{datos['errores_precalentamiento']} fallidas)")
+        
+        agrupadas = self.coalescedor.estadisticas()
+        if agrupadas["agrupadas"]:
+            lineas.append(f"🔗 Peticiones repetidas agrupadas: {agrupadas['agrupadas']} "
+                          f"de {agrupadas['llamadas'] + agrupadas['agrupadas']}")
+        
+        sesiones = self.conversaciones.estadisticas()
+        if sesiones["creadas"]:
+            lineas.append(f"💬 Sesiones: {sesiones['sesiones']} activas "
+                          f"({sesiones['bytes'] / 1024:.0f} KB), {sesiones['expulsadas']} expulsadas")
+        
+        if self.hedging:
+            lineas.append(f"🏁 Hedging: {self.estadisticas_hedging}")
+        return "\n".join(lineas)
+    
+    def cerrar(self):
+        """Libera conexiones, cierra la caché y el historial y termina de guardar la configuración"""
+        self.cerrar_sesiones()
+        self.metricas.cerrar()
+        self.configuracion.cerrar()
+        if self.registro:
+            if self.indice_historial:
+                try:
+                    self.indice_historial.guardar(self.ruta_indice, self.registro.total)
+                except Exception as e:
+                    print(f"Error guardando índice del historial: {e}")
+            self.registro.cerrar()
+        if self.cache:
+            self.cache.cerrar()
+    
+    def servicios_configurados(self):
+        """Devuelve los servicios con API key, en orden de prioridad"""
+        return [s for s in ("openai", "gemini", "huggingface")
+                if s in self.api_keys and "key" in self.api_keys[s]]
+    
+    def servicios_candidatos(self, reservar=False):
+        """Devuelve los servicios sanos para el modo automático, del más rápido al más lento
+        
+        Sin API keys, o con todos los configurados fallando, se recurre a la IA
+        gratuita de Hugging Face. Con reservar=True se reserva la sonda de los
+        que están semiabiertos (ver EnrutadorIA): hay que liberar_reservas()
+        al terminar.
+        """
+        configurados = self.servicios_configurados() or ["huggingface"]
+        candidatos = self.enrutador.ordenar(configurados, reservar)
+        if not candidatos and "huggingface" not in configurados:
+            candidatos = self.enrutador.ordenar(["huggingface"], reservar)
+        return candidatos
+    
+    def servicio_activo(self):
+        """Devuelve el servicio que se usa en modo automático"""
+        candidatos = self.servicios_candidatos()
+        return candidatos[0] if candidatos else "huggingface"
+    
+    def cargar_api_keys(self):
+        """Devuelve las API keys de la configuración"""
+        return self.configuracion.obtener()
+    
+    def guardar_api_keys(self, keys):
+        """Guarda las API keys (la escritura en disco se hace en segundo plano)"""
+        self.configuracion.guardar(keys)
+        self.aplicar_configuracion(keys)
+    
+    def aplicar_configuracion(self, keys):
+        """Aplica unas API keys nuevas sin reiniciar
+        
+        Se modifica el diccionario existente para que las conversaciones
+        creadas con nueva_conversacion vean el cambio. Los servicios cuya key
+        cambió empiezan con un pool de conexiones y un enrutado limpios.
+        """
+        cambiados = [servicio for servicio in set(self.api_keys) | set(keys)
+                     if self.api_keys.get(servicio) != keys.get(servicio)]
+        for servicio in cambiados:
+            if servicio in keys:
+                self.api_keys[servicio] = keys[servicio]
+            else:
+                self.api_keys.pop(servicio, None)
+            
+            with self._lock_sesiones:
+                sesion = self.sesiones.pop(servicio, None)
+                self._precalentados.discard(servicio)
+            if sesion:
+                sesion.close()
+            self.enrutador.reiniciar(servicio)
+        
+        if cambiados:
+            print(f"🔄 Configuración actualizada: {', '.join(sorted(cambiados))}")
+            self.precalentar_servicios()
     
     def configurar_api_key(self, servicio, api_key):
         """Configura una API key para un servicio específico"""
-        if servicio not in self.api_keys:
-            self.api_keys[servicio] = {}
-        self.api_keys[servicio]["key"] = api_key
-        self.guardar_api_keys(self.api_keys)
+        keys = copy.deepcopy(self.api_keys)
+        keys.setdefault(servicio, {})["key"] = api_key
+        self.guardar_api_keys(keys)
+    
+    def leer_eventos_sse(self, response):
+        """Itera los datos JSON de una respuesta Server-Sent Events"""
+        # text/event-stream no siempre declara charset
+        response.encoding = "utf-8"
+        traza = traza_actual()
+        terminado = False
+        for linea in response.iter_lines(decode_unicode=True):
+            if traza and linea is not None:
+                traza.bytes_recibidos += len(linea.encode("utf-8")) + 1
+            if terminado or not linea or not linea.startswith("data:"):
+                continue
+            datos = linea[len("data:"):].strip()
+            if datos == "[DONE]":
+                # Leer hasta el final del cuerpo para que la conexión vuelva al pool
+                terminado = True
+                continue
+            try:
+                yield json.loads(datos)
+            except ValueError:
+                continue
     
-    def obtener_respuesta_openai(self, mensaje):
-        """Obtiene respuesta de OpenAI GPT"""
+    def obtener_respuesta_openai(self, mensaje, al_recibir=None, guardar=True, cancelado=None,
+                                 conversacion=None):
+        """Obtiene respuesta de OpenAI GPT (por fragmentos si se pasa al_recibir)"""
+        import requests
         if "openai" not in self.api_keys or "key" not in self.api_keys["openai"]:
             return "❌ API key de OpenAI no configurada. Usa 'configurar openai' para establecerla."
         
@@ -71,8 +491,11 @@ class ConectorIA:
             }
             
             # Preparar mensajes con historial
+            resumen, ventana = self.contexto_para("openai", conversacion)
             mensajes = []
-            for interaccion in self.historial_conversacion[-5:]:  # Últimas 5 interacciones
+            if resumen:
+                mensajes.append({"role": "system", "content": f"Resumen de la conversación anterior:\n{resumen}"})
+            for interaccion in ventana:
                 mensajes.append({"role": "user", "content": interaccion["pregunta"]})
                 mensajes.append({"role": "assistant", "content": interaccion["respuesta"]})
             
@@ -84,18 +507,44 @@ class ConectorIA:
                 "max_tokens": 500,
                 "temperature": 0.7
             }
+            if al_recibir:
+                data["stream"] = True
             
-            response = requests.post(
-                "https://api.openai.com/v1/chat/completions",
+            response = self.enviar(
+                "openai",
+                f"{self.hosts['openai']}/v1/chat/completions",
                 headers=headers,
                 json=data,
-                timeout=30
+                stream=bool(al_recibir)
             )
             
-            if response.status_code == 200:
+            if response.status_code == 200 and al_recibir:
+                fragmentos = []
+                with response:
+                    for evento in self.leer_eventos_sse(response):
+                        if cancelado is not None and cancelado.is_set():
+                            break
+                        opciones = evento.get("choices") or [{}]
+                        fragmento = opciones[0].get("delta", {}).get("content")
+                        if fragmento:
+                            fragmentos.append(fragmento)
+                            al_recibir(fragmento)
+                if cancelado is not None and cancelado.is_set():
+                    return RESPUESTA_CANCELADA
+                respuesta = "".join(fragmentos)
+                if not respuesta:
+                    return "❌ No se recibió respuesta válida de OpenAI"
+                if guardar:
+                    self.agregar_al_historial(mensaje, respuesta, conversacion)
+                return respuesta
+            elif response.status_code == 200:
                 result = response.json()
                 respuesta = result["choices"][0]["message"]["content"]
-                self.agregar_al_historial(mensaje, respuesta)
+                if guardar:
+                    # Ya llegó entera; si se canceló, solo falta no guardarla
+                    if cancelado is not None and cancelado.is_set():
+                        return RESPUESTA_CANCELADA
+                    self.agregar_al_historial(mensaje, respuesta, conversacion)
                 return respuesta
             else:
                 return f"❌ Error de OpenAI: {response.status_code} - {response.text}"
@@ -105,17 +554,23 @@ class ConectorIA:
         except Exception as e:
             return f"❌ Error conectando con OpenAI: {str(e)}"
     
-    def obtener_respuesta_gemini(self, mensaje):
-        """Obtiene respuesta de Google Gemini"""
+    def obtener_respuesta_gemini(self, mensaje, al_recibir=None, guardar=True, cancelado=None,
+                                 conversacion=None):
+        """Obtiene respuesta de Google Gemini (por fragmentos si se pasa al_recibir)"""
+        import requests
         if "gemini" not in self.api_keys or "key" not in self.api_keys["gemini"]:
             return "❌ API key de Gemini no configurada. Usa 'configurar gemini' para establecerla."
         
         try:
-            url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent?key={self.api_keys['gemini']['key']}"
+            if al_recibir:
+                url = f"{self.hosts['gemini']}/v1beta/models/gemini-pro:streamGenerateContent?alt=sse&key={self.api_keys['gemini']['key']}"
+            else:
+                url = f"{self.hosts['gemini']}/v1beta/models/gemini-pro:generateContent?key={self.api_keys['gemini']['key']}"
             
             # Preparar contexto con historial
-            contexto = ""
-            for interaccion in self.historial_conversacion[-3:]:
+            resumen, ventana = self.contexto_para("gemini", conversacion)
+            contexto = f"Resumen de la conversación anterior:\n{resumen}\n\n" if resumen else ""
+            for interaccion in ventana:
                 contexto += f"Usuario: {interaccion['pregunta']}\nAsistente: {interaccion['respuesta']}\n\n"
             
             prompt_completo = contexto + f"Usuario: {mensaje}\nAsistente:"
@@ -132,13 +587,36 @@ class ConectorIA:
                 }
             }
             
-            response = requests.post(url, json=data, timeout=30)
+            response = self.enviar("gemini", url, json=data, stream=bool(al_recibir))
             
-            if response.status_code == 200:
+            if response.status_code == 200 and al_recibir:
+                fragmentos = []
+                with response:
+                    for evento in self.leer_eventos_sse(response):
+                        if cancelado is not None and cancelado.is_set():
+                            break
+                        for candidato in evento.get("candidates", [])[:1]:
+                            for parte in candidato.get("content", {}).get("parts", []):
+                                fragmento = parte.get("text")
+                                if fragmento:
+                                    fragmentos.append(fragmento)
+                                    al_recibir(fragmento)
+                if cancelado is not None and cancelado.is_set():
+                    return RESPUESTA_CANCELADA
+                respuesta = "".join(fragmentos)
+                if not respuesta:
+                    return "❌ No se recibió respuesta válida de Gemini"
+                if guardar:
+                    self.agregar_al_historial(mensaje, respuesta, conversacion)
+                return respuesta
+            elif response.status_code == 200:
                 result = response.json()
                 if "candidates" in result and len(result["candidates"]) > 0:
                     respuesta = result["candidates"][0]["content"]["parts"][0]["text"]
-                    self.agregar_al_historial(mensaje, respuesta)
+                    if guardar:
+                        if cancelado is not None and cancelado.is_set():
+                            return RESPUESTA_CANCELADA
+                        self.agregar_al_historial(mensaje, respuesta, conversacion)
                     return respuesta
                 else:
                     return "❌ No se recibió respuesta válida de Gemini"
@@ -150,11 +628,12 @@ class ConectorIA:
         except Exception as e:
             return f"❌ Error conectando con Gemini: {str(e)}"
     
-    def obtener_respuesta_huggingface(self, mensaje):
+    def obtener_respuesta_huggingface(self, mensaje, guardar=True, cancelado=None, conversacion=None):
         """Obtiene respuesta de Hugging Face (modelo gratuito)"""
+        import requests
         try:
             # Usar modelo gratuito de Hugging Face
-            url = "https://api-inference.huggingface.co/models/microsoft/DialoGPT-medium"
+            url = f"{self.hosts['huggingface']}/models/microsoft/DialoGPT-medium"
             
             headers = {}
             if "huggingface" in self.api_keys and "key" in self.api_keys["huggingface"]:
@@ -162,14 +641,17 @@ class ConectorIA:
             
             data = {"inputs": mensaje}
             
-            response = requests.post(url, headers=headers, json=data, timeout=30)
+            response = self.enviar("huggingface", url, headers=headers, json=data)
             
             if response.status_code == 200:
                 result = response.json()
                 if isinstance(result, list) and len(result) > 0:
                     respuesta = result[0].get("generated_text", "").replace(mensaje, "").strip()
                     if respuesta:
-                        self.agregar_al_historial(mensaje, respuesta)
+                        if guardar:
+                            if cancelado is not None and cancelado.is_set():
+                                return RESPUESTA_CANCELADA
+                            self.agregar_al_historial(mensaje, respuesta, conversacion)
                         return respuesta
                     else:
                         return "🤔 No pude generar una respuesta adecuada."
@@ -183,63 +665,401 @@ class ConectorIA:
         except Exception as e:
             return f"❌ Error conectando con Hugging Face: {str(e)}"
     
-    def agregar_al_historial(self, pregunta, respuesta):
-        """Agrega una interacción al historial"""
-        self.historial_conversacion.append({
-            "timestamp": datetime.datetime.now().isoformat(),
-            "pregunta": pregunta,
-            "respuesta": respuesta
-        })
-        
-        # Mantener solo las últimas interacciones
-        if len(self.historial_conversacion) > self.max_historial:
-            self.historial_conversacion = self.historial_conversacion[-self.max_historial:]
+    def contexto_para(self, servicio, conversacion=None):
+        """Devuelve (resumen, turnos) que se envían como contexto a un servicio"""
+        conversacion = conversacion or self.conversacion
+        if servicio in ("openai", "gemini"):
+            return self.constructor_contexto.construir(conversacion.turnos, conversacion.resumen)
+        else:
+            return "", []
+    
+    def calentar_contexto(self):
+        """Recupera del registro en disco los últimos turnos con la IA"""
+        for entrada in self.registro.ultimos(self.max_historial, tipo="ia"):
+            timestamp = datetime.datetime.fromisoformat(entrada["timestamp"]).timestamp()
+            self.conversacion.turnos.append(Turno(entrada["pregunta"], entrada["respuesta"], timestamp))
+    
+    def indexar_historial(self, hasta):
+        """Prepara el índice de búsqueda con los turnos guardados antes de arrancar"""
+        try:
+            indice, desde = IndiceBM25.cargar(self.ruta_indice)
+            if indice is None or desde > hasta:
+                indice, desde = IndiceBM25(), 0
+            for inicio in range(desde, hasta, 1000):
+                indice.agregar_lote([
+                    (entrada["n"], f"{entrada['pregunta']} {entrada['respuesta']}")
+                    for entrada in self.registro.leer(inicio, min(hasta, inicio + 1000))
+                    if entrada.get("tipo") == "ia"
+                ])
+            
+            # Turnos guardados mientras se preparaba el índice
+            with self._lock_indice:
+                indice.agregar_lote(self._indice_pendientes)
+                self._indice_pendientes = []
+                self.indice_historial = indice
+        except Exception as e:
+            print(f"Error indexando historial: {e}")
+    
+    def guardar_turno(self, pregunta, respuesta, tipo="ia"):
+        """Escribe un turno en el registro en disco e indexa los de la IA"""
+        if not self.registro:
+            return
+        try:
+            numero = self.registro.agregar(pregunta, respuesta, tipo=tipo)
+            self._guardado.numero = numero
+            if tipo == "ia":
+                with self._lock_indice:
+                    if self.indice_historial is None:
+                        self._indice_pendientes.append((numero, f"{pregunta} {respuesta}"))
+                    else:
+                        self.indice_historial.agregar(numero, f"{pregunta} {respuesta}")
+        except Exception as e:
+            print(f"Error guardando historial: {e}")
+    
+    def turno_guardado(self):
+        """Número en el registro del último turno que guardó este hilo, o None; lo olvida al leerlo"""
+        numero = getattr(self._guardado, "numero", None)
+        self._guardado.numero = None
+        return numero
+    
+    def registrar_turno_local(self, pregunta, respuesta):
+        """Guarda en el registro un comando resuelto sin IA (no entra en el contexto)"""
+        self.guardar_turno(pregunta, respuesta, tipo="local")
+    
+    def buscar_historial(self, consulta, limite=5):
+        """Devuelve los turnos guardados más relevantes para la consulta (ranking BM25)"""
+        if not self.indice_historial:
+            return []
+        resultados = []
+        for numero, puntuacion in self.indice_historial.buscar(consulta, limite):
+            entradas = self.registro.leer(numero, numero + 1)
+            if entradas:
+                resultados.append(dict(entradas[0], puntuacion=puntuacion))
+        return resultados
     
-    def obtener_respuesta_ia(self, mensaje, servicio="auto"):
-        """Método principal para obtener respuesta de IA"""
+    def agregar_al_historial(self, pregunta, respuesta, conversacion=None):
+        """Agrega una interacción al historial (el de la conversación principal si no se indica otra)"""
+        conversacion = conversacion or self.conversacion
+        # Solo se guardan las últimas interacciones; las antiguas pasan al resumen
+        self.conversaciones.agregar(conversacion, pregunta, respuesta, self.constructor_contexto.plegar)
+        if conversacion is self.conversacion:
+            self.guardar_turno(pregunta, respuesta)
+    
+    def obtener_respuesta_ia(self, mensaje, servicio="auto", al_recibir=None, cancelado=None, sesion=None):
+        """Método principal para obtener respuesta de IA
+        
+        Si se pasa al_recibir, OpenAI y Gemini responden por streaming y cada
+        fragmento de texto se entrega a ese callback según llega. Si se pasa
+        cancelado (un threading.Event) y se activa, se deja de leer la
+        respuesta y se devuelve RESPUESTA_CANCELADA sin guardar nada. Con
+        `sesion` se usa el historial de esa sesión en lugar del principal.
+        """
+        if cancelado is not None and cancelado.is_set():
+            return RESPUESTA_CANCELADA
+        conversacion = self.conversacion if sesion is None else self.conversaciones.obtener(sesion)
+        servicio_pedido = servicio
+        hedged = []
+        candidatos = []
         if servicio == "auto":
-            # Detectar automáticamente qué servicio usar
-            if "openai" in self.api_keys and "key" in self.api_keys["openai"]:
-                return self.obtener_respuesta_openai(mensaje)
-            elif "gemini" in self.api_keys and "key" in self.api_keys["gemini"]:
-                return self.obtener_respuesta_gemini(mensaje)
+            # El enrutador ordena los servicios sanos por latencia
+            candidatos = self.servicios_candidatos(reservar=True)
+            if not candidatos:
+                return "❌ Todos los servicios de IA están fallando. Intenta de nuevo en unos segundos."
+            if self.hedging and len(candidatos) >= 2:
+                hedged = candidatos[:2]
+            servicio = candidatos[0]
+        
+        resumen, ventana = self.contexto_para(servicio, conversacion)
+        contexto = hash_contexto(ventana, resumen)
+        usar_cache = self.cache is not None and servicio in self.hosts
+        if usar_cache:
+            respuesta = self.buscar_en_cache(servicio, mensaje, contexto)
+            if respuesta is not None:
+                self.enrutador.liberar_reservas(candidatos)
+                self.agregar_al_historial(mensaje, respuesta, conversacion)
+                if al_recibir:
+                    al_recibir(respuesta)
+                return respuesta
+        
+        # Si ya hay una petición idéntica en curso (doble clic, voz y teclado a
+        # la vez...), esperar su respuesta en lugar de llamar otra vez
+        clave_vuelo = (servicio, normalizar_prompt(mensaje), contexto)
+        vuelo, es_lider = self.coalescedor.unirse(clave_vuelo, conversacion, al_recibir)
+        if not es_lider:
+            self.enrutador.liberar_reservas(candidatos)  # La llamada la hace la líder
+            respuesta = vuelo.esperar(cancelado)
+            if cancelado is not None and cancelado.is_set():
+                # Cancelada la nuestra: no se espera a la líder ni se guarda el turno
+                if al_recibir:
+                    vuelo.desuscribir(al_recibir)
+                return RESPUESTA_CANCELADA
+            if respuesta == RESPUESTA_CANCELADA:
+                # Se canceló la petición a la que nos unimos, no la nuestra
+                return self.obtener_respuesta_ia(mensaje, servicio_pedido, al_recibir, cancelado, sesion)
+            if not respuesta.startswith(PREFIJOS_ERROR):
+                # La líder ya guardó el turno en su conversación
+                if vuelo.conversacion is not conversacion:
+                    self.agregar_al_historial(mensaje, respuesta, conversacion)
+                else:
+                    self._guardado.numero = vuelo.numero
+                if al_recibir and not vuelo.fragmentos:
+                    al_recibir(respuesta)
+            return respuesta
+        
+        # La respuesta se guarda en caché a nombre del servicio que la dio, con
+        # su contexto: calcularlo antes de que el turno entre en el historial
+        contextos = {servicio: contexto}
+        if usar_cache:
+            for alternativo in (hedged or candidatos)[1:]:
+                resumen, ventana = self.contexto_para(alternativo, conversacion)
+                contextos[alternativo] = hash_contexto(ventana, resumen)
+        
+        respuesta = "❌ Error inesperado al consultar la IA"
+        respondio = servicio
+        self._guardado.numero = None
+        try:
+            receptor = vuelo.emitir if al_recibir else None
+            if hedged:
+                respondio, respuesta = self.obtener_respuesta_hedged(mensaje, hedged, receptor, cancelado,
+                                                                     conversacion)
             else:
-                return self.obtener_respuesta_huggingface(mensaje)
-        elif servicio == "openai":
-            return self.obtener_respuesta_openai(mensaje)
+                respuesta = self.llamar_servicio(servicio, mensaje, receptor, cancelado=cancelado,
+                                                 conversacion=conversacion)
+                # Si falla antes de emitir texto, pasar al siguiente servicio sano
+                for alternativo in candidatos[1:]:
+                    if vuelo.fragmentos or not respuesta.startswith(("❌", "⏰")):
+                        break
+                    respondio = alternativo
+                    respuesta = self.llamar_servicio(alternativo, mensaje, receptor, cancelado=cancelado,
+                                                     conversacion=conversacion)
+        finally:
+            self.enrutador.liberar_reservas(candidatos)
+            vuelo.numero = getattr(self._guardado, "numero", None)
+            self.coalescedor.terminar(clave_vuelo, vuelo, respuesta)
+        
+        if usar_cache and respondio in contextos and not respuesta.startswith(PREFIJOS_ERROR):
+            contexto = contextos[respondio]
+            clave = self.cache.guardar(respondio, mensaje, contexto, respuesta)
+            if clave and self.cache_semantico:
+                self.cache_semantico.agregar(clave, respondio, contexto, mensaje)
+        return respuesta
+    
+    def llamar_servicio(self, servicio, mensaje, al_recibir=None, guardar=True, cancelado=None,
+                        conversacion=None):
+        """Envía el mensaje a un servicio concreto y registra el resultado en el enrutador"""
+        if servicio not in self.hosts:
+            return "❌ Servicio de IA no reconocido"
+        
+        if not self.enrutador.iniciar_llamada(servicio):
+            return f"❌ {servicio} se está recuperando de varios fallos, prueba en unos segundos"
+        traza = self.metricas.iniciar_traza(servicio)
+        receptor = None
+        if al_recibir:
+            def receptor(fragmento):
+                if traza.primer_fragmento is None:
+                    traza.primer_fragmento = traza.transcurrido()
+                al_recibir(fragmento)
+        
+        respuesta = ""
+        try:
+            respuesta = self._despachar(servicio, mensaje, receptor, guardar, cancelado, conversacion)
+        finally:
+            fallo = not respuesta or respuesta.startswith(("❌", "⏰"))
+            traza.cerrar(respuesta, fallo)
+            self.metricas.finalizar_traza(traza)
+        
+        if cancelado is not None and cancelado.is_set():
+            # Cancelada por hedging: no dice nada de la salud del servicio
+            self.enrutador.cancelar_llamada(servicio)
+        elif fallo:
+            self.enrutador.registrar_fallo(servicio, traza.total)
+        else:
+            self.enrutador.registrar_exito(servicio, traza.total)
+        return respuesta
+    
+    def _despachar(self, servicio, mensaje, al_recibir, guardar, cancelado, conversacion=None):
+        """Llama al método del servicio indicado"""
+        if servicio == "openai":
+            return self.obtener_respuesta_openai(mensaje, al_recibir, guardar, cancelado, conversacion)
         elif servicio == "gemini":
-            return self.obtener_respuesta_gemini(mensaje)
+            return self.obtener_respuesta_gemini(mensaje, al_recibir, guardar, cancelado, conversacion)
         elif servicio == "huggingface":
-            return self.obtener_respuesta_huggingface(mensaje)
+            return self.obtener_respuesta_huggingface(mensaje, guardar, cancelado, conversacion)
         else:
             return "❌ Servicio de IA no reconocido"
+    
+    def obtener_respuesta_hedged(self, mensaje, servicios, al_recibir=None, cancelado=None,
+                                 conversacion=None):
+        """Envía el mensaje a varios servicios escalonados y devuelve (servicio, respuesta) de la primera válida
+        
+        El primer servicio se lanza de inmediato y cada respaldo tras
+        retardo_hedging segundos sin respuesta, o en cuanto falle el anterior.
+        Con streaming gana el primer servicio que emite texto. Los perdedores
+        se cancelan: dejan de leer su stream y su respuesta se descarta.
+        Si el usuario activa `cancelado`, se cancelan todos.
+        """
+        resultados = queue.Queue()
+        cancelados = {servicio: threading.Event() for servicio in servicios}
+        estado = {"ganador": None, "fin_ganador": None}
+        lock = threading.Lock()
+        
+        with self._lock_hedging:
+            self.estadisticas_hedging["peticiones"] += 1
+        
+        def reclamar(servicio):
+            with lock:
+                if estado["ganador"] is None:
+                    estado["ganador"] = servicio
+                    for otro, evento in cancelados.items():
+                        if otro != servicio:
+                            evento.set()
+                return estado["ganador"] == servicio
+        
+        def cancelar_todos():
+            """Propaga la cancelación del usuario a todos los servicios lanzados"""
+            if cancelado is None or not cancelado.is_set():
+                return False
+            for evento in cancelados.values():
+                evento.set()
+            return True
+        
+        def lanzar(servicio):
+            receptor = None
+            if al_recibir:
+                def receptor(fragmento):
+                    if not cancelar_todos() and reclamar(servicio):
+                        al_recibir(fragmento)
+            
+            def ejecutar():
+                respuesta = self.llamar_servicio(servicio, mensaje, receptor, guardar=False,
+                                                 cancelado=cancelados[servicio], conversacion=conversacion)
+                fin = time.monotonic()
+                with lock:
+                    ganador = estado["ganador"]
+                    fin_ganador = estado["fin_ganador"]
+                # Si el principal termina después de que ganara el respaldo, eso es lo ahorrado
+                if (servicio == servicios[0] and ganador not in (None, servicio)
+                        and fin_ganador is not None and not respuesta.startswith(PREFIJOS_ERROR)):
+                    with self._lock_hedging:
+                        self.estadisticas_hedging["latencia_ahorrada"] += max(0.0, fin - fin_ganador)
+                resultados.put((servicio, respuesta, fin))
+            
+            threading.Thread(target=ejecutar, daemon=True).start()
+        
+        lanzar(servicios[0])
+        en_curso = 1
+        siguiente = 1
+        primer_error = None
+        
+        while en_curso:
+            quedan_respaldos = siguiente < len(servicios)
+            try:
+                servicio, respuesta, fin = resultados.get(
+                    timeout=self.retardo_hedging if quedan_respaldos else None)
+            except queue.Empty:
+                servicio = None
+            
+            if cancelar_todos():
+                return None, RESPUESTA_CANCELADA
+            
+            if servicio is None or (quedan_respaldos and estado["ganador"] is None
+                                    and respuesta.startswith(PREFIJOS_ERROR)):
+                # Sin respuesta a tiempo o error del anterior: lanzar el respaldo
+                if quedan_respaldos:
+                    lanzar(servicios[siguiente])
+                    siguiente += 1
+                    en_curso += 1
+                    with self._lock_hedging:
+                        self.estadisticas_hedging["respaldos_lanzados"] += 1
+                if servicio is None:
+                    continue
+            
+            en_curso -= 1
+            valida = not respuesta.startswith(PREFIJOS_ERROR)
+            if estado["ganador"] == servicio or (valida and reclamar(servicio)):
+                with lock:
+                    estado["fin_ganador"] = fin
+                if valida:
+                    self.agregar_al_historial(mensaje, respuesta, conversacion)
+                with self._lock_hedging:
+                    victorias = self.estadisticas_hedging["victorias"]
+                    victorias[servicio] = victorias.get(servicio, 0) + 1
+                return servicio, respuesta
+            if primer_error is None and estado["ganador"] is None:
+                primer_error = (servicio, respuesta)
+        
+        return primer_error
 
 class AsistenteVirtualIA:
-    def __init__(self, nombre="Jarvis"):
+    def __init__(self, nombre="Jarvis", iniciar_voz=True, abrir_navegador=True):
         self.nombre = nombre
         self.activo = True
+        # Sin pantalla (modo servidor) los comandos de navegador devuelven la
+        # URL en lugar de abrirla en el equipo donde corre el asistente
+        self.abrir_navegador = abrir_navegador
         self.conector_ia = ConectorIA()
+        # Abrir ya las conexiones (DNS, TCP y TLS) que usará el primer mensaje
+        self.conector_ia.precalentar_servicios()
         
-        # Inicializar componentes de voz
+        # Clasificador local para comandos sin palabras clave: lo que reconoce
+        # con confianza se responde sin llamar a la IA remota
+        self.clasificador = ClasificadorEnSegundoPlano(permitidas=INTENCIONES_CLASIFICADOR)
+        # Funciones que añaden líneas al diagnóstico (p. ej. la interfaz)
+        self.diagnosticos_extra = []
+        
+        # Micrófono y motor de voz se abren en un hilo: pyttsx3.init(),
+        # recorrer las voces y abrir el micrófono tardan más que mostrar la
+        # ventana. Hasta que `voz_lista` se activa valen None
+        self.reconocedor = None
+        self.microfono = None
+        self.motor_voz = None
+        self.calibrador = None  # Umbral de ruido del micrófono, ver calibracion_voz
+        self.voz_lista = threading.Event()
+        self._al_preparar_voz = []
+        self._lock_voz = threading.Lock()
+        if iniciar_voz and (SPEECH_AVAILABLE or TTS_AVAILABLE):
+            threading.Thread(target=self.iniciar_voz, daemon=True).start()
+        else:
+            self.voz_lista.set()
+
+    def iniciar_voz(self):
+        """Importa las librerías de voz y abre micrófono y motor de voz (en segundo plano)"""
         if SPEECH_AVAILABLE:
             try:
+                import speech_recognition as sr
                 self.reconocedor = sr.Recognizer()
                 self.microfono = sr.Microphone()
-            except:
+                self.calibrador = CalibradorRuido(self.reconocedor, self.microfono)
+            except Exception:
                 self.reconocedor = None
                 self.microfono = None
-        else:
-            self.reconocedor = None
-            self.microfono = None
+                self.calibrador = None
         
         if TTS_AVAILABLE:
             try:
+                import pyttsx3
                 self.motor_voz = pyttsx3.init()
                 self.configurar_voz()
-            except:
+            except Exception:
                 self.motor_voz = None
-        else:
-            self.motor_voz = None
+        
+        with self._lock_voz:
+            self.voz_lista.set()
+            pendientes, self._al_preparar_voz = self._al_preparar_voz, []
+        for funcion in pendientes:
+            funcion()
+
+    def cuando_voz_lista(self, funcion):
+        """Llama a funcion() cuando la voz esté preparada (ya mismo si lo está)
+        
+        Puede llamarse desde el hilo de la voz: las interfaces deben pasar
+        a su hilo con after().
+        """
+        with self._lock_voz:
+            if not self.voz_lista.is_set():
+                self._al_preparar_voz.append(funcion)
+                return
+        funcion()
 
     def configurar_voz(self):
         if not self.motor_voz:
@@ -261,6 +1081,7 @@ class AsistenteVirtualIA:
 
     def hablar(self, texto):
         print(f"{self.nombre}: {texto}")
+        self.voz_lista.wait(ESPERA_VOZ)
         if self.motor_voz:
             try:
                 self.motor_voz.say(texto)
@@ -269,74 +1090,150 @@ class AsistenteVirtualIA:
                 print(f"Error al hablar: {e}")
 
     def escuchar(self):
+        self.voz_lista.wait(ESPERA_VOZ)
         if not self.reconocedor or not self.microfono:
             return "Reconocimiento de voz no disponible"
         
+        import speech_recognition as sr
         try:
-            with self.microfono as fuente:
-                self.reconocedor.adjust_for_ambient_noise(fuente, duration=1)
+            # El ruido ambiente ya está medido: no se espera un segundo por frase
+            with self.calibrador.abrir() as fuente:
                 audio = self.reconocedor.listen(fuente, timeout=5, phrase_time_limit=5)
                 
-            texto = self.reconocedor.recognize_google(audio, language="es-ES").lower()
-            return texto
+            texto, confianza = reconocer(self.reconocedor, audio)
+            self.calibrador.registrar(confianza)
+            return texto.lower()
             
         except sr.WaitTimeoutError:
+            self.calibrador.registrar(None)
             return "⏰ Tiempo de espera agotado"
         except sr.UnknownValueError:
+            self.calibrador.registrar(None)
             return "❌ No pude entender lo que dijiste"
         except sr.RequestError as e:
             return f"❌ Error de conexión: {str(e)}"
         except Exception as e:
             return f"❌ Error inesperado: {str(e)}"
 
-    def procesar_comando(self, comando):
-        """Procesa comandos locales y de IA"""
-        comando_original = comando
-        comando = comando.lower().strip()
+    def procesar_comando(self, comando, al_recibir=None, cancelado=None, sesion=None):
+        """Procesa comandos locales y de IA (con el historial de `sesion` si se indica)"""
+        respuesta = self.comando_local(comando)
+        if respuesta is None:
+            return self.conector_ia.obtener_respuesta_ia(comando, al_recibir=al_recibir, cancelado=cancelado,
+                                                         sesion=sesion)
+        
+        if sesion is None:
+            self.conector_ia.registrar_turno_local(comando, respuesta)
+        return respuesta
+    
+    def procesar_turno(self, comando, al_recibir=None, cancelado=None):
+        """Procesa un comando de la conversación principal y devuelve (respuesta, número en el registro)
+
+        El número es None si el turno no se guardó (error, cancelación...).
+        Las interfaces lo usan para saber qué turno del registro es cada
+        bloque del historial, porque los turnos se guardan al terminar y no
+        siempre en el orden en que se enviaron.
+        """
+        self.conector_ia.turno_guardado()  # Descartar lo que dejara otro comando en este hilo
+        respuesta = self.procesar_comando(comando, al_recibir, cancelado)
+        return respuesta, self.conector_ia.turno_guardado()
+    
+    def buscar_en_historial(self, consulta):
+        """Texto con los turnos del historial que mejor coinciden con la consulta"""
+        if self.conector_ia.registro and self.conector_ia.indice_historial is None:
+            return "⏳ Todavía estoy indexando el historial, prueba de nuevo en unos segundos"
+        
+        resultados = self.conector_ia.buscar_historial(consulta)
+        if not resultados:
+            return f"🔎 No encontré nada sobre '{consulta}' en el historial"
+        
+        def recortar(texto, limite=160):
+            texto = " ".join(texto.split())
+            return texto if len(texto) <= limite else texto[:limite - 1] + "…"
+        
+        lineas = [f"🔎 Encontré esto sobre '{consulta}' en el historial:"]
+        for entrada in resultados:
+            fecha = entrada["timestamp"][:16].replace("T", " ")
+            lineas.append(f"\n📅 {fecha}\n👤 {recortar(entrada['pregunta'], 100)}\n🧠 {recortar(entrada['respuesta'])}")
+        return "\n".join(lineas)
+    
+    def comando_local(self, comando):
+        """Responde los comandos que no necesitan IA; devuelve None para el resto"""
+        coincidencia = RECONOCEDOR_IA.reconocer(comando)
+        if coincidencia is None:
+            intencion = self.clasificador.clasificar(comando)
+            if intencion is None:
+                return None
+            texto = comando.lower().strip()
+            coincidencia = Coincidencia(intencion, texto, 0, len(texto))
+        intencion = coincidencia.nombre
         
         # Comandos de configuración
-        if comando.startswith("configurar"):
-            partes = comando.split()
-            if len(partes) >= 2:
-                servicio = partes[1]
+        if intencion == "configurar":
+            partes = coincidencia.resto.split()
+            if partes:
+                servicio = partes[0]
                 return f"🔑 Para configurar {servicio}, necesito que proporciones la API key a través del botón 'Configurar IA'"
             else:
                 return "💡 Uso: 'configurar [openai|gemini|huggingface]'"
         
+        elif intencion == "diagnostico":
+            lineas = [
+                self.conector_ia.diagnostico(),
+                f"🏠 Clasificador local: {self.clasificador.locales} respondidas en el equipo, "
+                f"{self.clasificador.remotas} enviadas a la IA"
+            ]
+            if self.calibrador:
+                lineas.append(self.calibrador.resumen())
+            lineas.extend(informe() for informe in self.diagnosticos_extra)
+            return "\n".join(lineas)
+        
+        elif intencion == "buscar_historial":
+            return self.buscar_en_historial(coincidencia.resto)
+        
         # Comandos básicos del sistema
-        elif any(saludo in comando for saludo in ["hola", "buenos días", "buenas tardes", "hey"]):
+        elif intencion == "saludo":
             return "¡Hola! Soy tu asistente con IA integrada. Puedo responder cualquier pregunta. ¿En qué puedo ayudarte?"
         
-        elif any(palabra in comando for palabra in ["hora", "qué hora"]):
+        elif intencion == "hora":
             return f"🕐 Son las {datetime.datetime.now().strftime('%H:%M')}"
         
-        elif any(palabra in comando for palabra in ["fecha", "qué día"]):
+        elif intencion == "fecha":
             fecha = datetime.datetime.now()
             return f"📅 Hoy es {fecha.strftime('%A, %d de %B de %Y')}"
         
-        elif "abrir navegador" in comando or "abre internet" in comando:
-            webbrowser.open("https://www.google.com")
+        elif intencion == "navegador":
+            url = "https://www.google.com"
+            if not self.abrir_navegador:
+                return f"🌐 Abre el navegador en {url}"
+            webbrowser.open(url)
             return "🌐 Abriendo el navegador web"
         
-        elif comando.startswith("buscar "):
-            termino = comando.replace("buscar ", "")
-            webbrowser.open(f"https://www.google.com/search?q={termino.replace(' ', '+')}")
+        elif intencion == "buscar":
+            termino = coincidencia.resto
+            if not termino:
+                return "❓ ¿Qué quieres que busque?"
+            url = f"https://www.google.com/search?q={termino.replace(' ', '+')}"
+            if not self.abrir_navegador:
+                return f"🔍 Resultados de '{termino}': {url}"
+            webbrowser.open(url)
             return f"🔍 Buscando: {termino}"
         
-        elif any(palabra in comando for palabra in ["adiós", "hasta luego", "bye"]):
+        elif intencion == "despedida":
             return random.choice([
                 "¡Hasta luego! Ha sido un placer conversar contigo.",
                 "¡Adiós! Vuelve cuando necesites ayuda.",
                 "¡Nos vemos! Que tengas un excelente día."
             ])
         
-        elif "ayuda" in comando or "qué puedes hacer" in comando:
+        elif intencion == "ayuda":
             return """🤖 Soy un asistente con IA avanzada. Puedo:
 
 📋 **Comandos básicos:**
 • Decir la hora y fecha
 • Abrir navegador web
 • Realizar búsquedas
+• 'buscar en historial ...' - Encontrar lo que hablamos antes
 
 🧠 **IA Conversacional:**
 • Responder cualquier pregunta
@@ -347,362 +1244,18 @@ class AsistenteVirtualIA:
 ⚙️ **Configuración:**
 • 'configurar openai/gemini' - Para usar IA premium
 • Sin configuración uso IA gratuita
+• 'diagnóstico' - Tiempos y errores de las llamadas a la IA
 
 ¡Pregúntame lo que quieras!"""
         
         # Para todo lo demás, usar IA
-        else:
-            return self.conector_ia.obtener_respuesta_ia(comando_original)
-
-class InterfazAsistenteIA(tk.Tk):
-    def __init__(self, asistente):
-        super().__init__()
-        self.asistente = asistente
-        self.title("🧠 Asistente Virtual con IA")
-        self.geometry("1000x800")
-        self.configure(bg="#0f1923")
-        self.resizable(True, True)
-        
-        # Variables de estado
-        self.hablando = False
-        self.escuchando = False
-        self.pensando = False
-        self.animacion_activa = True
-        self.tiempo_animacion = 0
-        
-        self.crear_widgets()
-        self.after(1000, self.saludo_inicial)
-
-    def crear_widgets(self):
-        # Frame principal
-        main_frame = tk.Frame(self, bg="#0f1923")
-        main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        
-        # Título
-        titulo = tk.Label(
-            main_frame, 
-            text="🧠 Jarvis AI - Asistente Inteligente", 
-            font=("Arial", 20, "bold"), 
-            fg="#00bfff", 
-            bg="#0f1923"
-        )
-        titulo.pack(pady=10)
-        
-        # Canvas para animación
-        self.canvas = tk.Canvas(
-            main_frame, 
-            height=120, 
-            bg="#0f1923", 
-            highlightthickness=0
-        )
-        self.canvas.pack(fill=tk.X, pady=10)
-        
-        # Frame de configuración
-        config_frame = tk.Frame(main_frame, bg="#0f1923")
-        config_frame.pack(fill=tk.X, pady=5)
-        
-        tk.Button(
-            config_frame,
-            text="⚙️ Configurar IA",
-            command=self.configurar_ia,
-            font=("Arial", 9, "bold"),
-            bg="#4a4a4a",
-            fg="#ffffff",
-            relief=tk.RAISED,
-            bd=2
-        ).pack(side=tk.LEFT, padx=5)
-        
-        # Indicador de estado de IA
-        self.estado_ia_var = tk.StringVar()
-        self.actualizar_estado_ia()
-        tk.Label(
-            config_frame,
-            textvariable=self.estado_ia_var,
-            font=("Arial", 9),
-            fg="#00ff00",
-            bg="#0f1923"
-        ).pack(side=tk.LEFT, padx=10)
-        
-        # Frame de entrada
-        entrada_frame = tk.Frame(main_frame, bg="#0f1923")
-        entrada_frame.pack(fill=tk.X, pady=10)
-        
-        tk.Label(
-            entrada_frame, 
-            text="💬 Pregúntame cualquier cosa:", 
-            font=("Arial", 10, "bold"), 
-            fg="#00bfff", 
-            bg="#0f1923"
-        ).pack(anchor=tk.W)
-        
-        input_frame = tk.Frame(entrada_frame, bg="#0f1923")
-        input_frame.pack(fill=tk.X, pady=5)
-        
-        self.entrada_texto = tk.Entry(
-            input_frame,
-            font=("Arial", 12),
-            bg="#1a2634",
-            fg="#ffffff",
-            insertbackground="#00bfff",
-            relief=tk.FLAT,
-            bd=5
-        )
-        self.entrada_texto.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 5))
-        self.entrada_texto.bind("<Return>", self.procesar_texto)
-        
-        tk.Button(
-            input_frame,
-            text="🚀 Enviar",
-            command=self.procesar_texto,
-            font=("Arial", 10, "bold"),
-            bg="#00364e",
-            fg="#ffffff",
-            activebackground="#005577",
-            relief=tk.RAISED,
-            bd=2
-        ).pack(side=tk.RIGHT)
-        
-        # Historial
-        historial_frame = tk.Frame(main_frame, bg="#0f1923")
-        historial_frame.pack(fill=tk.BOTH, expand=True, pady=10)
-        
-        tk.Label(
-            historial_frame, 
-            text="🗨️ Conversación:", 
-            font=("Arial", 12, "bold"), 
-            fg="#00bfff", 
-            bg="#0f1923"
-        ).pack(anchor=tk.W)
-        
-        self.historial = scrolledtext.ScrolledText(
-            historial_frame,
-            font=("Consolas", 10),
-            bg="#1a2634",
-            fg="#ffffff",
-            insertbackground="#00bfff",
-            wrap=tk.WORD,
-            relief=tk.FLAT,
-            bd=5
-        )
-        self.historial.pack(fill=tk.BOTH, expand=True, pady=5)
-        
-        # Controles
-        controles_frame = tk.Frame(main_frame, bg="#0f1923")
-        controles_frame.pack(fill=tk.X, pady=10)
-        
-        self.estado_var = tk.StringVar(value="✅ Listo para conversar")
-        tk.Label(
-            controles_frame,
-            textvariable=self.estado_var,
-            font=("Arial", 10),
-            fg="#00ff00",
-            bg="#0f1923"
-        ).pack(side=tk.LEFT)
-        
-        # Botones
-        if SPEECH_AVAILABLE and self.asistente.reconocedor:
-            self.boton_escuchar = tk.Button(
-                controles_frame,
-                text="🎤 Escuchar",
-                command=self.iniciar_escucha,
-                font=("Arial", 10, "bold"),
-                bg="#00364e",
-                fg="#ffffff",
-                relief=tk.RAISED,
-                bd=2,
-                padx=15
-            )
-            self.boton_escuchar.pack(side=tk.RIGHT, padx=5)
-        
-        tk.Button(
-            controles_frame,
-            text="🗑️ Limpiar",
-            command=self.limpiar_historial,
-            font=("Arial", 10, "bold"),
-            bg="#4a4a4a",
-            fg="#ffffff",
-            relief=tk.RAISED,
-            bd=2,
-            padx=15
-        ).pack(side=tk.RIGHT, padx=5)
-        
-        self.after(100, self.iniciar_animacion)
-
-    def actualizar_estado_ia(self):
-        """Actualiza el indicador de estado de la IA"""
-        keys = self.asistente.conector_ia.api_keys
-        if "openai" in keys and "key" in keys["openai"]:
-            self.estado_ia_var.set("🟢 OpenAI conectado")
-        elif "gemini" in keys and "key" in keys["gemini"]:
-            self.estado_ia_var.set("🟢 Gemini conectado")
-        else:
-            self.estado_ia_var.set("🟡 IA gratuita activa")
-
-    def configurar_ia(self):
-        """Ventana para configurar APIs de IA"""
-        config_window = tk.Toplevel(self)
-        config_window.title("⚙️ Configuración de IA")
-        config_window.geometry("400x300")
-        config_window.configure(bg="#0f1923")
-        config_window.transient(self)
-        config_window.grab_set()
-        
-        tk.Label(
-            config_window,
-            text="🔑 Configurar APIs de IA",
-            font=("Arial", 14, "bold"),
-            fg="#00bfff",
-            bg="#0f1923"
-        ).pack(pady=10)
-        
-        # OpenAI
-        openai_frame = tk.LabelFrame(
-            config_window,
-            text="OpenAI (ChatGPT)",
-            font=("Arial", 10, "bold"),
-            fg="#ffffff",
-            bg="#0f1923"
-        )
-        openai_frame.pack(fill=tk.X, padx=20, pady=10)
-        
-        openai_entry = tk.Entry(openai_frame, show="*", width=40)
-        openai_entry.pack(pady=5)
-        
-        tk.Button(
-            openai_frame,
-            text="Configurar OpenAI",
-            command=lambda: self.guardar_api_key("openai", openai_entry.get(), config_window),
-            bg="#00364e",
-            fg="#ffffff"
-        ).pack(pady=5)
-        
-        # Gemini
-        gemini_frame = tk.LabelFrame(
-            config_window,
-            text="Google Gemini",
-            font=("Arial", 10, "bold"),
-            fg="#ffffff",
-            bg="#0f1923"
-        )
-        gemini_frame.pack(fill=tk.X, padx=20, pady=10)
-        
-        gemini_entry = tk.Entry(gemini_frame, show="*", width=40)
-        gemini_entry.pack(pady=5)
-        
-        tk.Button(
-            gemini_frame,
-            text="Configurar Gemini",
-            command=lambda: self.guardar_api_key("gemini", gemini_entry.get(), config_window),
-            bg="#00364e",
-            fg="#ffffff"
-        ).pack(pady=5)
-        
-        # Información
-        info_text = """
-💡 Información:
-• OpenAI: Obtén tu API key en platform.openai.com
-• Gemini: Obtén tu API key en makersuite.google.com
-• Sin configurar: Usará IA gratuita (limitada)
-        """
-        
-        tk.Label(
-            config_window,
-            text=info_text,
-            font=("Arial", 8),
-            fg="#cccccc",
-            bg="#0f1923",
-            justify=tk.LEFT
-        ).pack(pady=10)
+        return None
 
-    def guardar_api_key(self, servicio, api_key, ventana):
-        """Guarda una API key"""
-        if api_key.strip():
-            self.asistente.conector_ia.configurar_api_key(servicio, api_key.strip())
-            self.actualizar_estado_ia()
-            messagebox.showinfo("✅ Éxito", f"API key de {servicio} configurada correctamente")
-            ventana.destroy()
-        else:
-            messagebox.showerror("❌ Error", "Por favor ingresa una API key válida")
-
-    def iniciar_animacion(self):
-        """Animación del canvas"""
-        if not self.animacion_activa:
-            return
-            
-        try:
-            self.canvas.delete("all")
-            ancho = self.canvas.winfo_width()
-            alto = self.canvas.winfo_height()
-            
-            if ancho <= 1 or alto <= 1:
-                self.after(100, self.iniciar_animacion)
-                return
-            
-            centro_x = ancho // 2
-            centro_y = alto // 2
-            
-            # Color según estado
-            if self.pensando:
-                color = "#ff6b6b"  # Rojo cuando piensa
-            elif self.hablando:
-                color = "#ffa500"  # Naranja cuando habla
-            elif self.escuchando:
-                color = "#4ecdc4"  # Verde cuando escucha
-            else:
-                color = "#00bfff"  # Azul normal
-            
-            # Círculo principal con pulso
-            radio = 25 + math.sin(self.tiempo_animacion * 3) * 5
-            self.canvas.create_oval(
-                centro_x - radio, centro_y - radio,
-                centro_x + radio, centro_y + radio,
-                outline=color, width=3
-            )
-            
-            # Ondas cerebrales cuando piensa
-            if self.pensando:
-                for i in range(5):
-                    onda_radio = radio + 10 + (i * 8) + (self.tiempo_animacion * 15) % 40
-                    if onda_radio < ancho // 2:
-                        intensidad = max(0.1, 1 - (i * 0.2))
-                        self.canvas.create_oval(
-                            centro_x - onda_radio, centro_y - onda_radio,
-                            centro_x + onda_radio, centro_y + onda_radio,
-                            outline=color, width=max(1, int(2 * intensidad))
-                        )
-            
-            self.tiempo_animacion += 0.1
-            
-        except Exception as e:
-            print(f"Error en animación: {e}")
-        
-        self.after(60, self.iniciar_animacion)
-
-    def agregar_al_historial(self, mensaje, tipo="info"):
-        """Agrega mensaje al historial"""
-        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-        
-        if tipo == "usuario":
-            prefijo = "👤"
-        elif tipo == "asistente":
-            prefijo = "🧠"
-        elif tipo == "error":
-            prefijo = "❌"
-        else:
-            prefijo = "ℹ️"
-        
-        self.historial.insert(tk.END, f"[{timestamp}] {prefijo} {mensaje}\n\n")
-        self.historial.see(tk.END)
-        self.update()
-
-    def saludo_inicial(self):
-        """Saludo inicial"""
-        mensaje = "¡Hola! Soy Jarvis AI, tu asistente inteligente. Puedo responder cualquier pregunta y mantener conversaciones naturales. ¿En qué puedo ayudarte?"
-        self.agregar_al_historial(mensaje, "asistente")
-        
-        if TTS_AVAILABLE and self.asistente.motor_voz:
-            threading.Thread(target=lambda: self.asistente.hablar(mensaje), daemon=True).start()
+def main():
+    """Función principal: abre la interfaz gráfica (el modo sin ventana está en servidor_asistente.py)"""
+    # Importación diferida: el resto del módulo no depende de tkinter
+    from interfaz_ia import main as main_interfaz
+    main_interfaz()
 
-    def procesar_texto(self, event=None):
-        """Procesa texto ingresado"""
-        texto = self.entrada_texto
\ No newline at end of file
+if __name__ == "__main__":
+    main()
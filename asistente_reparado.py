@@ -1,6 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
 import datetime
+import importlib.util
 import random
 import webbrowser
 import threading
@@ -9,50 +10,100 @@ import time
 import sys
 import os
 
-# Importaciones opcionales para funciones de voz
-try:
-    import speech_recognition as sr
-    SPEECH_AVAILABLE = True
-except ImportError:
-    SPEECH_AVAILABLE = False
+from intenciones import Intencion, ReconocedorIntenciones
+from transcripcion_tk import EscritorHistorial
+from animacion_tk import PlanificadorAnimacion
+from calibracion_voz import CalibradorRuido, reconocer
+
+# Dependencias opcionales para funciones de voz: aquí solo se comprueba que
+# están instaladas y se importan al abrir los dispositivos, en segundo plano
+SPEECH_AVAILABLE = importlib.util.find_spec("speech_recognition") is not None
+if not SPEECH_AVAILABLE:
     print("⚠️  speech_recognition no está instalado. Funciones de voz deshabilitadas.")
 
-try:
-    import pyttsx3
-    TTS_AVAILABLE = True
-except ImportError:
-    TTS_AVAILABLE = False
+TTS_AVAILABLE = importlib.util.find_spec("pyttsx3") is not None
+if not TTS_AVAILABLE:
     print("⚠️  pyttsx3 no está instalado. Síntesis de voz deshabilitada.")
 
+# Segundos que hablar() y escuchar() esperan a que se abran los dispositivos de voz
+ESPERA_VOZ = 10
+
+# Unidades de tiempo de la animación por segundo (antes 0,1 por fotograma de 50 ms)
+VELOCIDAD_ANIMACION = 0.1 / 0.05
+
+# Tabla de comandos; a mayor prioridad, antes se eligen
+INTENCIONES = [
+    Intencion("saludo", ["hola", "buenos días", "buenas tardes", "buenas noches", "hey"], prioridad=100),
+    Intencion("hora", ["hora", "qué hora"], prioridad=90),
+    Intencion("fecha", ["fecha", "día", "qué día", "calendario"], prioridad=80),
+    Intencion("navegador", ["abre navegador", "abrir navegador", "internet", "web"], prioridad=70),
+    Intencion("buscar", ["busca", "buscar", "search"], prioridad=60),
+    Intencion("youtube", ["youtube"], prioridad=50),
+    Intencion("clima", ["clima", "tiempo", "temperatura"], prioridad=40),
+    Intencion("despedida", ["adiós", "hasta luego", "bye", "chao", "nos vemos"], prioridad=30),
+    Intencion("gracias", ["gracias", "grazie", "thanks"], prioridad=20),
+    Intencion("estado", ["cómo estás", "qué tal"], prioridad=10),
+    Intencion("ayuda", ["ayuda", "help", "qué puedes hacer", "comandos"], prioridad=0),
+]
+RECONOCEDOR = ReconocedorIntenciones(INTENCIONES)
+
 class AsistenteVirtual:
     def __init__(self, nombre="Jarvis"):
         self.nombre = nombre
         self.activo = True
         
-        # Inicializar componentes de voz solo si están disponibles
+        # Micrófono y motor de voz se abren en un hilo para no retrasar la
+        # ventana. Hasta que `voz_lista` se activa valen None
+        self.reconocedor = None
+        self.microfono = None
+        self.motor_voz = None
+        self.calibrador = None  # Umbral de ruido del micrófono, ver calibracion_voz
+        self.voz_lista = threading.Event()
+        self._al_preparar_voz = []
+        self._lock_voz = threading.Lock()
+        if SPEECH_AVAILABLE or TTS_AVAILABLE:
+            threading.Thread(target=self.iniciar_voz, daemon=True).start()
+        else:
+            self.voz_lista.set()
+
+    def iniciar_voz(self):
+        """Inicializa los componentes de voz disponibles (en segundo plano)"""
         if SPEECH_AVAILABLE:
             try:
+                import speech_recognition as sr
                 self.reconocedor = sr.Recognizer()
                 self.microfono = sr.Microphone()
+                self.calibrador = CalibradorRuido(self.reconocedor, self.microfono)
                 print("✅ Reconocimiento de voz inicializado")
             except Exception as e:
                 print(f"❌ Error inicializando micrófono: {e}")
                 self.reconocedor = None
                 self.microfono = None
-        else:
-            self.reconocedor = None
-            self.microfono = None
+                self.calibrador = None
         
         if TTS_AVAILABLE:
             try:
+                import pyttsx3
                 self.motor_voz = pyttsx3.init()
                 self.configurar_voz()
                 print("✅ Síntesis de voz inicializada")
             except Exception as e:
                 print(f"❌ Error inicializando síntesis de voz: {e}")
                 self.motor_voz = None
-        else:
-            self.motor_voz = None
+        
+        with self._lock_voz:
+            self.voz_lista.set()
+            pendientes, self._al_preparar_voz = self._al_preparar_voz, []
+        for funcion in pendientes:
+            funcion()
+
+    def cuando_voz_lista(self, funcion):
+        """Llama a funcion() cuando la voz esté preparada (ya mismo si lo está)"""
+        with self._lock_voz:
+            if not self.voz_lista.is_set():
+                self._al_preparar_voz.append(funcion)
+                return
+        funcion()
 
     def configurar_voz(self):
         if not self.motor_voz:
@@ -76,6 +127,7 @@ class AsistenteVirtual:
 
     def hablar(self, texto):
         print(f"{self.nombre}: {texto}")
+        self.voz_lista.wait(ESPERA_VOZ)
         if self.motor_voz:
             try:
                 self.motor_voz.say(texto)
@@ -84,24 +136,28 @@ class AsistenteVirtual:
                 print(f"Error al hablar: {e}")
 
     def escuchar(self):
+        self.voz_lista.wait(ESPERA_VOZ)
         if not self.reconocedor or not self.microfono:
             return "Reconocimiento de voz no disponible"
         
+        import speech_recognition as sr
         try:
-            with self.microfono as fuente:
-                print("🎤 Ajustando ruido ambiente...")
-                self.reconocedor.adjust_for_ambient_noise(fuente, duration=1)
+            with self.calibrador.abrir() as fuente:
                 print("🎤 Escuchando...")
                 audio = self.reconocedor.listen(fuente, timeout=5, phrase_time_limit=5)
                 
             print("🔄 Procesando audio...")
-            texto = self.reconocedor.recognize_google(audio, language="es-ES").lower()
-            print(f"✅ Reconocido: {texto}")
+            texto, confianza = reconocer(self.reconocedor, audio)
+            self.calibrador.registrar(confianza)
+            texto = texto.lower()
+            print(f"✅ Reconocido: {texto} (confianza {confianza:.2f})")
             return texto
             
         except sr.WaitTimeoutError:
+            self.calibrador.registrar(None)
             return "⏰ Tiempo de espera agotado"
         except sr.UnknownValueError:
+            self.calibrador.registrar(None)
             return "❌ No pude entender lo que dijiste"
         except sr.RequestError as e:
             return f"❌ Error de conexión: {str(e)}"
@@ -110,10 +166,11 @@ class AsistenteVirtual:
 
     def procesar_comando(self, comando):
         """Procesa los comandos del usuario"""
-        comando = comando.lower().strip()
+        coincidencia = RECONOCEDOR.reconocer(comando)
+        intencion = coincidencia.nombre if coincidencia else None
         
         # Comandos de saludo
-        if any(saludo in comando for saludo in ["hola", "buenos días", "buenas tardes", "buenas noches", "hey"]):
+        if intencion == "saludo":
             respuestas = [
                 "¡Hola! ¿En qué puedo ayudarte hoy?",
                 "¡Saludos! Estoy aquí para asistirte.",
@@ -123,12 +180,12 @@ class AsistenteVirtual:
             return random.choice(respuestas)
         
         # Consultas de tiempo
-        elif any(palabra in comando for palabra in ["hora", "tiempo", "qué hora"]):
+        elif intencion == "hora":
             hora_actual = datetime.datetime.now().strftime("%H:%M")
             return f"🕐 Son las {hora_actual}"
         
         # Consultas de fecha
-        elif any(palabra in comando for palabra in ["fecha", "día", "qué día", "calendario"]):
+        elif intencion == "fecha":
             fecha_actual = datetime.datetime.now()
             dias_semana = ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"]
             meses = ["enero", "febrero", "marzo", "abril", "mayo", "junio",
@@ -140,7 +197,7 @@ class AsistenteVirtual:
             return f"📅 Hoy es {dia_semana}, {fecha_actual.day} de {mes} de {fecha_actual.year}"
         
         # Abrir navegador
-        elif any(palabra in comando for palabra in ["abre navegador", "abrir navegador", "internet", "web"]):
+        elif intencion == "navegador":
             try:
                 webbrowser.open("https://www.google.com")
                 return "🌐 Abriendo el navegador web"
@@ -148,12 +205,9 @@ class AsistenteVirtual:
                 return f"❌ Error abriendo navegador: {str(e)}"
         
         # Búsquedas
-        elif any(palabra in comando for palabra in ["busca", "buscar", "search"]):
+        elif intencion == "buscar":
             # Extraer término de búsqueda
-            terminos_busqueda = ["busca", "buscar", "search"]
-            termino = comando
-            for termino_busqueda in terminos_busqueda:
-                termino = termino.replace(termino_busquida, "").strip()
+            termino = coincidencia.sin_frase()
             
             if termino:
                 try:
@@ -166,7 +220,7 @@ class AsistenteVirtual:
                 return "❓ ¿Qué quieres que busque?"
         
         # YouTube
-        elif "youtube" in comando:
+        elif intencion == "youtube":
             try:
                 webbrowser.open("https://www.youtube.com")
                 return "📺 Abriendo YouTube"
@@ -174,7 +228,7 @@ class AsistenteVirtual:
                 return f"❌ Error abriendo YouTube: {str(e)}"
         
         # Clima (abre página de clima)
-        elif any(palabra in comando for palabra in ["clima", "tiempo", "temperatura"]):
+        elif intencion == "clima":
             try:
                 webbrowser.open("https://weather.com")
                 return "🌤️ Abriendo información del clima"
@@ -182,7 +236,7 @@ class AsistenteVirtual:
                 return f"❌ Error abriendo clima: {str(e)}"
         
         # Despedidas
-        elif any(palabra in comando for palabra in ["adiós", "hasta luego", "bye", "chao", "nos vemos"]):
+        elif intencion == "despedida":
             respuestas = [
                 "¡Hasta luego! Que tengas un excelente día.",
                 "¡Adiós! Estaré aquí cuando me necesites.",
@@ -192,7 +246,7 @@ class AsistenteVirtual:
             return random.choice(respuestas)
         
         # Agradecimientos
-        elif any(palabra in comando for palabra in ["gracias", "grazie", "thanks"]):
+        elif intencion == "gracias":
             respuestas = [
                 "¡De nada! Estoy aquí para ayudarte.",
                 "¡Un placer ayudarte!",
@@ -202,7 +256,7 @@ class AsistenteVirtual:
             return random.choice(respuestas)
         
         # Estado del asistente
-        elif any(palabra in comando for palabra in ["cómo estás", "como estas", "qué tal"]):
+        elif intencion == "estado":
             respuestas = [
                 "¡Estoy funcionando perfectamente! ¿Y tú qué tal?",
                 "¡Muy bien, gracias por preguntar! ¿Cómo puedo ayudarte?",
@@ -212,7 +266,7 @@ class AsistenteVirtual:
             return random.choice(respuestas)
         
         # Ayuda
-        elif any(palabra in comando for palabra in ["ayuda", "help", "qué puedes hacer", "comandos"]):
+        elif intencion == "ayuda":
             return """🤖 Puedo ayudarte con:
 • Decirte la hora y fecha
 • Abrir el navegador web
@@ -246,7 +300,6 @@ class InterfazAsistente(tk.Tk):
         self.hablando = False
         self.escuchando = False
         self.amplitud = 5
-        self.animacion_activa = True
         self.tiempo_animacion = 0
         
         # Configurar el icono de la ventana (opcional)
@@ -284,6 +337,7 @@ class InterfazAsistente(tk.Tk):
             highlightthickness=0
         )
         self.canvas.pack(fill=tk.X)
+        self.crear_figuras_animacion()
         
         # Frame para entrada de texto
         entrada_frame = tk.Frame(main_frame, bg="#0f1923")
@@ -348,6 +402,7 @@ class InterfazAsistente(tk.Tk):
             bd=5
         )
         self.historial.pack(fill=tk.BOTH, expand=True, pady=5)
+        self.escritor = EscritorHistorial(self.historial)
         
         # Frame de controles
         controles_frame = tk.Frame(main_frame, bg="#0f1923")
@@ -364,12 +419,13 @@ class InterfazAsistente(tk.Tk):
         )
         estado_label.pack(side=tk.LEFT)
         
-        # Botones de control
-        if SPEECH_AVAILABLE and self.asistente.reconocedor:
+        # Botones de control (el micrófono se habilita cuando termina de abrirse)
+        if SPEECH_AVAILABLE:
             self.boton_escuchar = tk.Button(
                 controles_frame,
-                text="🎤 Escuchar",
+                text="🎤 Preparando...",
                 command=self.iniciar_escucha,
+                state=tk.DISABLED,
                 font=("Arial", 10, "bold"),
                 bg="#00364e",
                 fg="#ffffff",
@@ -393,72 +449,87 @@ class InterfazAsistente(tk.Tk):
             padx=15
         ).pack(side=tk.RIGHT, padx=5)
         
-        # Iniciar animación
-        self.after(100, self.iniciar_animacion)
+        # Iniciar animación: a toda velocidad solo mientras habla o escucha
+        # y la ventana tiene el foco
+        self.animacion = PlanificadorAnimacion(
+            self, self.dibujar_animacion, lambda: self.hablando or self.escuchando, intervalo_ms=50)
+        self.animacion.iniciar()
+        
+        self.asistente.cuando_voz_lista(lambda: self.after(0, self.voz_preparada))
 
-    def iniciar_animacion(self):
-        if not self.animacion_activa:
+    def voz_preparada(self):
+        """Habilita el micrófono cuando termina de abrirse, o quita el botón si no hay"""
+        if not hasattr(self, 'boton_escuchar'):
+            return
+        if self.asistente.reconocedor:
+            self.boton_escuchar.config(state=tk.NORMAL, text="🎤 Escuchar")
+        else:
+            self.boton_escuchar.destroy()
+            del self.boton_escuchar
+
+    def crear_figuras_animacion(self):
+        """Crea una vez los óvalos de la animación; cada fotograma solo los mueve"""
+        self.circulo_animacion = self.canvas.create_oval(0, 0, 0, 0, width=3)
+        # Círculos concéntricos
+        self.anillos_animacion = []
+        for i in range(1, 4):
+            intensidad = max(0.1, 1 - (i * 0.3))
+            self.anillos_animacion.append(
+                self.canvas.create_oval(0, 0, 0, 0, width=max(1, int(3 * intensidad))))
+        # Ondas, solo visibles mientras habla o escucha
+        self.ondas_animacion = [self.canvas.create_oval(0, 0, 0, 0, width=1, state=tk.HIDDEN)
+                                for _ in range(3)]
+        self.ondas_visibles = [False] * len(self.ondas_animacion)
+        self.color_animacion = None
+        self.inicio_animacion = time.monotonic()
+
+    def dibujar_animacion(self):
+        """Dibuja un fotograma de la animación del canvas"""
+        ancho = self.canvas.winfo_width()
+        alto = self.canvas.winfo_height()
+        if ancho <= 1 or alto <= 1:
             return
-            
-        try:
-            self.canvas.delete("all")
-            ancho = self.canvas.winfo_width()
-            alto = self.canvas.winfo_height()
-            
-            if ancho <= 1 or alto <= 1:
-                self.after(100, self.iniciar_animacion)
-                return
-            
-            centro_x = ancho // 2
-            centro_y = alto // 2
-            
-            # Círculo principal animado
-            radio_base = 30
-            pulso = math.sin(self.tiempo_animacion * 2) * 5
-            radio = radio_base + pulso
-            
-            # Color que cambia según el estado
-            if self.hablando:
-                color = "#ff6b6b"  # Rojo cuando habla
-            elif self.escuchando:
-                color = "#4ecdc4"  # Verde cuando escucha
-            else:
-                color = "#00bfff"  # Azul normal
-            
-            # Círculo principal
-            self.canvas.create_oval(
-                centro_x - radio, centro_y - radio,
-                centro_x + radio, centro_y + radio,
-                outline=color, width=3
-            )
-            
-            # Círculos concéntricos
-            for i in range(1, 4):
-                radio_ext = radio + (i * 10)
-                intensidad = max(0.1, 1 - (i * 0.3))
-                self.canvas.create_oval(
-                    centro_x - radio_ext, centro_y - radio_ext,
-                    centro_x + radio_ext, centro_y + radio_ext,
-                    outline=color, width=max(1, int(3 * intensidad))
-                )
-            
-            # Ondas cuando está activo
-            if self.hablando or self.escuchando:
-                for i in range(3):
-                    onda_radio = radio + 40 + (i * 20) + (self.tiempo_animacion * 10) % 60
-                    if onda_radio < ancho // 2:
-                        self.canvas.create_oval(
-                            centro_x - onda_radio, centro_y - onda_radio,
-                            centro_x + onda_radio, centro_y + onda_radio,
-                            outline=color, width=1
-                        )
-            
-            self.tiempo_animacion += 0.1
-            
-        except Exception as e:
-            print(f"Error en animación: {e}")
         
-        self.after(50, self.iniciar_animacion)
+        centro_x = ancho // 2
+        centro_y = alto // 2
+        # Basado en el reloj para que la velocidad no dependa de los fps
+        self.tiempo_animacion = (time.monotonic() - self.inicio_animacion) * VELOCIDAD_ANIMACION
+        
+        # Círculo principal animado
+        radio_base = 30
+        pulso = math.sin(self.tiempo_animacion * 2) * 5
+        radio = radio_base + pulso
+        
+        # Color que cambia según el estado
+        if self.hablando:
+            color = "#ff6b6b"  # Rojo cuando habla
+        elif self.escuchando:
+            color = "#4ecdc4"  # Verde cuando escucha
+        else:
+            color = "#00bfff"  # Azul normal
+        figuras = [self.circulo_animacion] + self.anillos_animacion + self.ondas_animacion
+        if color != self.color_animacion:
+            self.color_animacion = color
+            for figura in figuras:
+                self.canvas.itemconfig(figura, outline=color)
+        
+        self.canvas.coords(self.circulo_animacion,
+                           centro_x - radio, centro_y - radio, centro_x + radio, centro_y + radio)
+        for i, anillo in enumerate(self.anillos_animacion, start=1):
+            radio_ext = radio + (i * 10)
+            self.canvas.coords(anillo, centro_x - radio_ext, centro_y - radio_ext,
+                               centro_x + radio_ext, centro_y + radio_ext)
+        
+        # Ondas cuando está activo
+        for i, onda in enumerate(self.ondas_animacion):
+            onda_radio = radio + 40 + (i * 20) + (self.tiempo_animacion * 10) % 60
+            visible = (self.hablando or self.escuchando) and onda_radio < ancho // 2
+            if visible:
+                self.canvas.coords(onda, centro_x - onda_radio, centro_y - onda_radio,
+                                   centro_x + onda_radio, centro_y + onda_radio)
+            if visible != self.ondas_visibles[i]:
+                self.ondas_visibles[i] = visible
+                self.canvas.itemconfig(onda, state=tk.NORMAL if visible else tk.HIDDEN)
 
     def agregar_al_historial(self, mensaje, tipo="info"):
         """Agrega un mensaje al historial"""
@@ -475,17 +546,15 @@ class InterfazAsistente(tk.Tk):
             prefijo = "ℹ️"
         
         mensaje_completo = f"[{timestamp}] {prefijo} {mensaje}\n"
-        self.historial.insert(tk.END, mensaje_completo)
-        self.historial.see(tk.END)
-        self.update()
+        self.escritor.escribir(mensaje_completo)
 
     def saludo_inicial(self):
         """Saludo inicial del asistente"""
         mensaje = f"¡Hola! Soy {self.asistente.nombre}, tu asistente virtual. ¿En qué puedo ayudarte hoy?"
         self.agregar_al_historial(mensaje, "asistente")
         
-        # Hablar solo si TTS está disponible
-        if TTS_AVAILABLE and self.asistente.motor_voz:
+        # Hablar solo si TTS está disponible (hablar() espera a que se abra el motor)
+        if TTS_AVAILABLE:
             threading.Thread(target=lambda: self.asistente.hablar(mensaje), daemon=True).start()
 
     def procesar_texto(self, event=None):
@@ -504,6 +573,7 @@ class InterfazAsistente(tk.Tk):
         # Hablar respuesta si está disponible
         if TTS_AVAILABLE and self.asistente.motor_voz:
             self.hablando = True
+            self.animacion.despertar()
             threading.Thread(target=self.hablar_respuesta, args=(respuesta,), daemon=True).start()
 
     def hablar_respuesta(self, respuesta):
@@ -519,6 +589,7 @@ class InterfazAsistente(tk.Tk):
             return
         
         self.escuchando = True
+        self.animacion.despertar()
         self.boton_escuchar.config(state=tk.DISABLED, text="🎤 Escuchando...")
         self.estado_var.set("🎤 Escuchando... Habla ahora")
         threading.Thread(target=self.procesar_voz, daemon=True).start()
@@ -557,17 +628,20 @@ class InterfazAsistente(tk.Tk):
 
     def limpiar_historial(self):
         """Limpia el historial de conversación"""
-        self.historial.delete(1.0, tk.END)
+        self.escritor.borrar()
         self.agregar_al_historial("Historial limpiado", "info")
 
     def on_closing(self):
         """Maneja el cierre de la aplicación"""
-        self.animacion_activa = False
+        self.animacion.detener()
+        print(self.animacion.resumen())
         try:
             if self.asistente.motor_voz:
                 self.asistente.motor_voz.stop()
         except:
             pass
+        if self.asistente.calibrador:
+            self.asistente.calibrador.cerrar()
         self.destroy()
 
 def main():
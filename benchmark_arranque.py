@@ -0,0 +1,214 @@
+"""Benchmark de arranque: importación y tiempo hasta que el asistente está listo
+
+Cada medida se toma en un proceso nuevo (en el mismo proceso los módulos ya
+importados falsearían las repeticiones) y con la configuración en una
+carpeta temporal, para no tocar la caché ni el historial reales:
+
+- importación de cada módulo, con python -X importtime
+- construcción de AsistenteVirtualIA
+- modo servidor: desde que se lanza el proceso hasta que acepta conexiones
+- interfaces: desde que se lanza el proceso hasta que la ventana se muestra
+  (solo si hay pantalla)
+
+Uso:
+    python benchmark_arranque.py --repeticiones 5
+    python benchmark_arranque.py --detalle asistente_con_ia   # qué importa y cuánto tarda
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from configuracion_ia import NOMBRE_ARCHIVO, VARIABLE_RUTA
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+MODULOS = ["asistente_con_ia", "servidor_asistente", "interfaz_ia", "asistente_reparado"]
+# (módulo, clase del asistente, clase de la ventana)
+INTERFACES = [
+    ("interfaz_ia", "AsistenteVirtualIA", "InterfazAsistenteIA"),
+    ("asistente_reparado", "AsistenteVirtual", "InterfazAsistente"),
+]
+
+CODIGO_ASISTENTE = """
+import time
+inicio = time.perf_counter()
+from asistente_con_ia import AsistenteVirtualIA
+importado = time.perf_counter()
+asistente = AsistenteVirtualIA()
+print(importado - inicio, time.perf_counter() - importado)
+asistente.conector_ia.cerrar()
+"""
+
+# Imprime la hora en que la ventana principal se muestra por primera vez y cierra
+CODIGO_VENTANA = """
+import time
+from {modulo} import {asistente}, {interfaz}
+app = {interfaz}({asistente}())
+def al_mostrar(evento):
+    if evento.widget is app:
+        app.update_idletasks()
+        print(time.time(), flush=True)
+        app.after(0, app.on_closing)
+app.bind("<Map>", al_mostrar, add="+")
+app.mainloop()
+"""
+
+
+def entorno(directorio):
+    """Entorno del proceso hijo, con la configuración (y la caché y el historial) en `directorio`"""
+    rutas = [RAIZ] + [ruta for ruta in [os.environ.get("PYTHONPATH")] if ruta]
+    return dict(os.environ, PYTHONPATH=os.pathsep.join(rutas), PYTHONUNBUFFERED="1",
+                **{VARIABLE_RUTA: os.path.join(directorio, NOMBRE_ARCHIVO)})
+
+
+def ejecutar(codigo, directorio, *opciones):
+    return subprocess.run([sys.executable, *opciones, "-c", codigo], cwd=directorio,
+                          env=entorno(directorio), capture_output=True, text=True, timeout=120)
+
+
+def tiempos_importacion(modulo, directorio):
+    """Devuelve [(nivel, módulo, segundos acumulados)] de importar `modulo` en un proceso nuevo"""
+    resultado = ejecutar(f"import {modulo}", directorio, "-X", "importtime")
+    tiempos = []
+    for linea in resultado.stderr.splitlines():
+        if not linea.startswith("import time:"):
+            continue
+        _, acumulado, nombre = linea[len("import time:"):].split("|")
+        if not acumulado.strip().isdigit():
+            continue  # Cabecera
+        nivel = (len(nombre) - len(nombre.lstrip()) - 1) // 2
+        tiempos.append((nivel, nombre.strip(), int(acumulado) / 1e6))
+    if not any(nombre == modulo for _, nombre, _ in tiempos):
+        raise RuntimeError(f"No se pudo importar {modulo}:\n{resultado.stderr[-500:]}")
+    return tiempos
+
+
+def importacion(modulo, directorio):
+    return next(segundos for _, nombre, segundos in tiempos_importacion(modulo, directorio)
+                if nombre == modulo)
+
+
+def construccion_asistente(directorio):
+    """Segundos en importar asistente_con_ia y en construir AsistenteVirtualIA"""
+    resultado = ejecutar(CODIGO_ASISTENTE, directorio)
+    if resultado.returncode != 0:
+        raise RuntimeError(resultado.stderr[-500:])
+    importar, construir = map(float, resultado.stdout.split()[:2])
+    return importar, construir
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def arranque_servidor(directorio):
+    """Segundos desde que se lanza servidor_asistente.py hasta que acepta una conexión"""
+    puerto = puerto_libre()
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen(
+        [sys.executable, os.path.join(RAIZ, "servidor_asistente.py"), "--puerto", str(puerto)],
+        cwd=directorio, env=entorno(directorio), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    try:
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", puerto), timeout=0.5).close()
+                return time.perf_counter() - inicio
+            except OSError:
+                if proceso.poll() is not None:
+                    raise RuntimeError(proceso.stderr.read()[-500:])
+                time.sleep(0.002)
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=10)
+
+
+def primer_fotograma(modulo, asistente, interfaz, directorio):
+    """Segundos desde que se lanza el proceso hasta que la ventana se muestra, o None sin pantalla"""
+    codigo = CODIGO_VENTANA.format(modulo=modulo, asistente=asistente, interfaz=interfaz)
+    inicio = time.time()
+    resultado = ejecutar(codigo, directorio)
+    if resultado.returncode != 0 or not resultado.stdout.strip():
+        if "display" in resultado.stderr.lower():
+            return None
+        raise RuntimeError(resultado.stderr[-500:])
+    return float(resultado.stdout.split()[-1]) - inicio
+
+
+def mediana(medir, repeticiones):
+    valores = [medir() for _ in range(repeticiones)]
+    if any(valor is None for valor in valores):
+        return None
+    return statistics.median(valores)
+
+
+def mostrar(descripcion, segundos):
+    valor = "sin pantalla" if segundos is None else f"{segundos * 1000:8.1f} ms"
+    print(f"  {descripcion:<44} {valor}")
+
+
+def detalle(modulo, directorio, limite=12):
+    """Muestra lo que importa directamente `modulo`, de más a menos lento"""
+    tiempos = tiempos_importacion(modulo, directorio)
+    posicion = next(i for i, (_, nombre, _) in enumerate(tiempos) if nombre == modulo)
+    nivel_modulo, _, total = tiempos[posicion]
+    # -X importtime escribe cada módulo después de los que importa
+    directos = []
+    for nivel, nombre, segundos in reversed(tiempos[:posicion]):
+        if nivel <= nivel_modulo:
+            break
+        if nivel == nivel_modulo + 1:
+            directos.append((segundos, nombre))
+    directos.sort(reverse=True)
+    print(f"📦 {modulo}: {total * 1000:.1f} ms en total")
+    for segundos, nombre in directos[:limite]:
+        print(f"  {nombre:<44} {segundos * 1000:8.1f} ms")
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Benchmark del arranque del asistente")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Procesos por medida (se da la mediana)")
+    parser.add_argument("--detalle", metavar="MODULO", help="Desglosar la importación de un módulo")
+    parser.add_argument("--sin-ventana", action="store_true", help="No medir las interfaces gráficas")
+    parser.add_argument("--json", help="Guardar los resultados en este archivo")
+    args = parser.parse_args(argumentos)
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        if args.detalle:
+            detalle(args.detalle, directorio)
+            return resultados
+
+        print(f"🧪 Arranque (mediana de {args.repeticiones} procesos nuevos)")
+        for modulo in MODULOS:
+            resultados[f"importar_{modulo}"] = mediana(lambda: importacion(modulo, directorio),
+                                                      args.repeticiones)
+            mostrar(f"importar {modulo}", resultados[f"importar_{modulo}"])
+
+        resultados["construir_asistente"] = mediana(lambda: construccion_asistente(directorio)[1],
+                                                    args.repeticiones)
+        mostrar("construir AsistenteVirtualIA", resultados["construir_asistente"])
+        resultados["servidor_listo"] = mediana(lambda: arranque_servidor(directorio), args.repeticiones)
+        mostrar("servidor aceptando conexiones", resultados["servidor_listo"])
+
+        if not args.sin_ventana:
+            for modulo, asistente, interfaz in INTERFACES:
+                clave = f"ventana_{modulo}"
+                resultados[clave] = mediana(
+                    lambda: primer_fotograma(modulo, asistente, interfaz, directorio), args.repeticiones)
+                mostrar(f"ventana de {modulo} visible", resultados[clave])
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+    return resultados
+
+
+if __name__ == "__main__":
+    main()
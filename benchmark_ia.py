@@ -0,0 +1,133 @@
+"""Benchmark de latencia y rendimiento de ConectorIA contra el servidor simulado
+
+No usa la red: arranca servidor_simulado.py en segundo plano y lanza
+obtener_respuesta_ia con distintos niveles de concurrencia, informando de
+p50/p95/p99 de latencia y peticiones por segundo.
+
+Uso:
+    python benchmark_ia.py --servicio openai --concurrencias 1 4 16 --peticiones 200
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asistente_con_ia import ConectorIA, PREFIJOS_ERROR
+from configuracion_ia import ConfiguracionEnMemoria
+from servidor_simulado import ConfiguracionSimulada, iniciar_en_hilo
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano de una lista ya ordenada"""
+    if not valores:
+        return 0.0
+    indice = max(0, min(len(valores) - 1, int(round(p / 100 * len(valores))) - 1))
+    return valores[indice]
+
+
+def crear_conector(servidor, concurrencia):
+    """ConectorIA apuntando al servidor simulado, sin caché ni límites de ritmo
+
+    Las claves simuladas van en una configuración en memoria: el config.json
+    del usuario no se lee, no se vigila y no se sobrescribe.
+    """
+    keys = {servicio: {"key": "simulada"} for servicio in servidor.hosts()}
+    return ConectorIA(
+        tamano_pool=concurrencia, ruta_cache=None, umbral_semantico=None, ruta_historial=None,
+        hosts=servidor.hosts(), configuracion=ConfiguracionEnMemoria(keys),
+        limites_ritmo={servicio: (10_000, 10_000.0) for servicio in servidor.hosts()})
+
+
+def medir(conector, servicio, concurrencia, peticiones, streaming):
+    """Lanza `peticiones` llamadas con `concurrencia` hilos y devuelve sus métricas"""
+    latencias = []
+    primeros_fragmentos = []
+    errores = [0]
+    lock = threading.Lock()
+    # Una conversación por hilo para que el historial no se mezcle
+    conversaciones = threading.local()
+
+    def una_peticion(numero):
+        if not hasattr(conversaciones, "conector"):
+            conversaciones.conector = conector.nueva_conversacion()
+        inicio = time.perf_counter()
+        primero = []
+
+        def al_recibir(fragmento):
+            if not primero:
+                primero.append(time.perf_counter() - inicio)
+
+        respuesta = conversaciones.conector.obtener_respuesta_ia(
+            f"Pregunta de prueba número {numero}", servicio=servicio,
+            al_recibir=al_recibir if streaming else None)
+        duracion = time.perf_counter() - inicio
+        with lock:
+            latencias.append(duracion)
+            primeros_fragmentos.extend(primero)
+            if respuesta.startswith(PREFIJOS_ERROR):
+                errores[0] += 1
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as ejecutor:
+        list(ejecutor.map(una_peticion, range(peticiones)))
+    total = time.perf_counter() - inicio
+
+    latencias.sort()
+    primeros_fragmentos.sort()
+    resultado = {
+        "servicio": servicio,
+        "concurrencia": concurrencia,
+        "peticiones": peticiones,
+        "errores": errores[0],
+        "peticiones_por_segundo": peticiones / total,
+        "p50": percentil(latencias, 50),
+        "p95": percentil(latencias, 95),
+        "p99": percentil(latencias, 99)
+    }
+    if streaming:
+        resultado["primer_fragmento_p50"] = percentil(primeros_fragmentos, 50)
+    return resultado
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Benchmark de ConectorIA sin red")
+    parser.add_argument("--servicio", default="openai", help="openai, gemini, huggingface o auto")
+    parser.add_argument("--concurrencias", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--peticiones", type=int, default=200, help="Peticiones por nivel")
+    parser.add_argument("--latencia", type=float, default=0.05, help="Latencia simulada en segundos")
+    parser.add_argument("--tasa-errores", type=float, default=0.0)
+    parser.add_argument("--tasa-429", type=float, default=0.0)
+    parser.add_argument("--streaming", action="store_true", help="Pedir respuestas por streaming")
+    parser.add_argument("--json", help="Guardar los resultados en este archivo")
+    args = parser.parse_args(argumentos)
+
+    configuracion = ConfiguracionSimulada(
+        latencia=args.latencia, variacion=args.latencia / 5, tasa_errores=args.tasa_errores,
+        tasa_429=args.tasa_429, retry_after=0.1, retardo_fragmento=0.005)
+    servidor = iniciar_en_hilo(configuracion)
+
+    print(f"🧪 Servidor simulado en {servidor.url} (latencia {args.latencia * 1000:.0f} ms)")
+    print(f"{'conc.':>6} {'pet/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errores':>8}")
+
+    resultados = []
+    try:
+        for concurrencia in args.concurrencias:
+            conector = crear_conector(servidor, concurrencia)
+            resultado = medir(conector, args.servicio, concurrencia, args.peticiones, args.streaming)
+            conector.cerrar()
+            resultados.append(resultado)
+            print(f"{concurrencia:>6} {resultado['peticiones_por_segundo']:>9.1f} "
+                  f"{resultado['p50'] * 1000:>9.1f} {resultado['p95'] * 1000:>9.1f} "
+                  f"{resultado['p99'] * 1000:>9.1f} {resultado['errores']:>8}")
+    finally:
+        servidor.shutdown()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+    return resultados
+
+
+if __name__ == "__main__":
+    main()
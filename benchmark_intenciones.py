@@ -0,0 +1,91 @@
+"""Benchmark del reconocimiento de intenciones de procesar_comando
+
+Compara, para tablas de intenciones cada vez más grandes, el coste por
+comando de la cadena de `any(frase in comando ...)` con el del autómata
+compilado de intenciones.py, y cuántos comandos activa cada uno: la
+búsqueda de subcadenas también coincide dentro de otras palabras.
+
+Uso:
+    python benchmark_intenciones.py --intenciones 10 100 500 1000 --comandos 2000
+"""
+import argparse
+import random
+import time
+
+from intenciones import Intencion, ReconocedorIntenciones, normalizar
+
+SILABAS = ["ca", "sa", "lo", "mi", "ta", "ne", "ro", "pu", "de", "vi", "ga", "to", "re", "na", "lu", "bo"]
+
+
+def generar_vocabulario(tamano, semilla):
+    aleatorio = random.Random(semilla)
+    vocabulario = set()
+    while len(vocabulario) < tamano:
+        vocabulario.add("".join(aleatorio.choices(SILABAS, k=aleatorio.randint(2, 4))))
+    return sorted(vocabulario)
+
+
+def generar_intenciones(numero, vocabulario, semilla):
+    """Intenciones sintéticas con 4 frases de 1 a 3 palabras cada una"""
+    aleatorio = random.Random(semilla)
+    return [
+        Intencion(f"intencion_{i}",
+                  [" ".join(aleatorio.choices(vocabulario, k=aleatorio.randint(1, 3))) for _ in range(4)],
+                  prioridad=numero - i)
+        for i in range(numero)
+    ]
+
+
+def cadena_subcadenas(tabla, comando):
+    """La forma anterior: una búsqueda de subcadenas por frase, en orden de prioridad"""
+    comando = normalizar(comando)
+    for nombre, frases in tabla:
+        if any(frase in comando for frase in frases):
+            return nombre
+    return None
+
+
+def medir(funcion, comandos):
+    """Devuelve (µs por comando, % de comandos con alguna intención)"""
+    coincidencias = 0
+    inicio = time.perf_counter()
+    for comando in comandos:
+        if funcion(comando) is not None:
+            coincidencias += 1
+    return (time.perf_counter() - inicio) / len(comandos) * 1e6, 100 * coincidencias / len(comandos)
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Coste por comando del reconocimiento de intenciones")
+    parser.add_argument("--intenciones", type=int, nargs="+", default=[10, 50, 100, 250, 500, 1000])
+    parser.add_argument("--comandos", type=int, default=2000, help="Comandos de prueba por tamaño")
+    parser.add_argument("--palabras", type=int, default=12, help="Palabras por comando")
+    args = parser.parse_args(argumentos)
+
+    vocabulario = generar_vocabulario(3000, semilla=1)
+    aleatorio = random.Random(2)
+    comandos = [" ".join(aleatorio.choices(vocabulario, k=args.palabras)) for _ in range(args.comandos)]
+
+    print(f"{'intenciones':>11} {'frases':>7} {'compilar ms':>12} {'subcadenas µs':>14} "
+          f"{'autómata µs':>12} {'activa subc.':>13} {'activa aut.':>12}")
+    resultados = []
+    for numero in args.intenciones:
+        intenciones = generar_intenciones(numero, vocabulario, semilla=numero)
+        inicio = time.perf_counter()
+        reconocedor = ReconocedorIntenciones(intenciones)
+        compilar = (time.perf_counter() - inicio) * 1000
+
+        # Tabla ordenada por prioridad, como la cadena de elif
+        tabla = [(i.nombre, [normalizar(f) for f in i.frases])
+                 for i in sorted(intenciones, key=lambda i: -i.prioridad)]
+        subcadenas, activa_subcadenas = medir(lambda comando: cadena_subcadenas(tabla, comando), comandos)
+        automata, activa_automata = medir(reconocedor.reconocer, comandos)
+        resultados.append({"intenciones": numero, "subcadenas_us": subcadenas, "automata_us": automata,
+                           "activa_subcadenas": activa_subcadenas, "activa_automata": activa_automata})
+        print(f"{numero:>11} {numero * 4:>7} {compilar:>12.1f} {subcadenas:>14.1f} {automata:>12.1f} "
+              f"{activa_subcadenas:>12.0f}% {activa_automata:>11.0f}%")
+    return resultados
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+
+def normalizar_prompt(texto):
+    """Normaliza un prompt para que variantes triviales compartan entrada"""
+    texto = unicodedata.normalize("NFC", texto).lower().strip()
+    texto = re.sub(r"\s+", " ", texto)
+    return texto.strip(" ¿?¡!.,;:")
+
+
+def hash_contexto(interacciones, resumen=""):
+    """Calcula un hash estable del contexto (resumen y turnos) enviado al modelo"""
+    ventana = [[i["pregunta"], i["respuesta"]] for i in interacciones]
+    datos = json.dumps([resumen, ventana], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(datos.encode("utf-8")).hexdigest()
+
+
+class CacheRespuestas:
+    """Caché persistente de respuestas en SQLite con desalojo LRU y caducidad por entrada"""
+
+    def __init__(self, ruta="cache_respuestas.db", max_bytes=20 * 1024 * 1024,
+                 ttl=7 * 24 * 3600):
+        self.ruta = ruta
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.aciertos = 0
+        self.fallos = 0
+        self.caducadas = 0
+        self.desalojadas = 0
+        self._lock = threading.Lock()
+
+        directorio = os.path.dirname(os.path.abspath(ruta))
+        os.makedirs(directorio, exist_ok=True)
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.execute("""
+            CREATE TABLE IF NOT EXISTS respuestas (
+                clave TEXT PRIMARY KEY,
+                servicio TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                contexto TEXT NOT NULL DEFAULT '',
+                respuesta TEXT NOT NULL,
+                creado REAL NOT NULL,
+                expira REAL NOT NULL,
+                ultimo_acceso REAL NOT NULL,
+                tamano INTEGER NOT NULL
+            )
+        """)
+        columnas = [fila[1] for fila in self._conexion.execute("PRAGMA table_info(respuestas)")]
+        if "contexto" not in columnas:
+            # Bases creadas antes de guardar el hash de contexto
+            self._conexion.execute(
+                "ALTER TABLE respuestas ADD COLUMN contexto TEXT NOT NULL DEFAULT ''")
+        self._conexion.execute(
+            "CREATE INDEX IF NOT EXISTS idx_respuestas_acceso ON respuestas (ultimo_acceso)")
+        self._conexion.commit()
+
+        fila = self._conexion.execute("SELECT COALESCE(SUM(tamano), 0) FROM respuestas").fetchone()
+        self._bytes_totales = fila[0]
+
+    @staticmethod
+    def calcular_clave(servicio, prompt, contexto):
+        """Devuelve la clave de caché para un servicio, prompt y hash de contexto"""
+        datos = f"{servicio}\x00{normalizar_prompt(prompt)}\x00{contexto}"
+        return hashlib.sha256(datos.encode("utf-8")).hexdigest()
+
+    def obtener(self, servicio, prompt, contexto, contar_fallo=True):
+        """Devuelve la respuesta guardada o None si no existe o ha caducado"""
+        return self.obtener_por_clave(self.calcular_clave(servicio, prompt, contexto), contar_fallo)
+
+    def contar_fallo(self):
+        """Cuenta un fallo decidido fuera (p. ej. tras consultar también la caché semántica)"""
+        with self._lock:
+            self.fallos += 1
+
+    def obtener_por_clave(self, clave, contar_fallo=True):
+        """Devuelve la respuesta de una clave ya calculada o None si no existe o ha caducado
+
+        Con contar_fallo=False un fallo no se cuenta: quien llama lo hará si
+        al final no encuentra respuesta por otra vía.
+        """
+        ahora = time.time()
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT respuesta, expira, tamano FROM respuestas WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila is None:
+                self.fallos += int(contar_fallo)
+                return None
+
+            respuesta, expira, tamano = fila
+            if expira <= ahora:
+                self._conexion.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+                self._conexion.commit()
+                self._bytes_totales -= tamano
+                self.caducadas += 1
+                self.fallos += int(contar_fallo)
+                return None
+
+            self._conexion.execute(
+                "UPDATE respuestas SET ultimo_acceso = ? WHERE clave = ?", (ahora, clave))
+            self._conexion.commit()
+            self.aciertos += 1
+            return respuesta
+
+    def guardar(self, servicio, prompt, contexto, respuesta, ttl=None):
+        """Guarda una respuesta y desaloja las menos usadas si se supera el tamaño máximo
+
+        Devuelve la clave de la entrada, o None si la respuesta no cabe en la caché.
+        """
+        clave = self.calcular_clave(servicio, prompt, contexto)
+        ahora = time.time()
+        expira = ahora + (self.ttl if ttl is None else ttl)
+        tamano = len(prompt.encode("utf-8")) + len(respuesta.encode("utf-8"))
+        if tamano > self.max_bytes:
+            return None
+
+        with self._lock:
+            anterior = self._conexion.execute(
+                "SELECT tamano FROM respuestas WHERE clave = ?", (clave,)).fetchone()
+            if anterior:
+                self._bytes_totales -= anterior[0]
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO respuestas "
+                "(clave, servicio, prompt, contexto, respuesta, creado, expira, ultimo_acceso, tamano) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (clave, servicio, prompt, contexto, respuesta, ahora, expira, ahora, tamano))
+            self._bytes_totales += tamano
+            self._desalojar()
+            self._conexion.commit()
+        return clave
+
+    def entradas(self):
+        """Devuelve (clave, servicio, prompt, contexto) de todas las entradas vigentes"""
+        with self._lock:
+            return self._conexion.execute(
+                "SELECT clave, servicio, prompt, contexto FROM respuestas WHERE expira > ?",
+                (time.time(),)).fetchall()
+
+    def _desalojar(self):
+        """Elimina caducadas y luego las entradas menos usadas hasta caber en max_bytes (requiere el lock)"""
+        if self._bytes_totales <= self.max_bytes:
+            return
+
+        ahora = time.time()
+        numero, tamano = self._conexion.execute(
+            "SELECT COUNT(*), COALESCE(SUM(tamano), 0) FROM respuestas WHERE expira <= ?",
+            (ahora,)).fetchone()
+        if numero:
+            self._conexion.execute("DELETE FROM respuestas WHERE expira <= ?", (ahora,))
+            self._bytes_totales -= tamano
+            self.caducadas += numero
+
+        while self._bytes_totales > self.max_bytes:
+            filas = self._conexion.execute(
+                "SELECT clave, tamano FROM respuestas ORDER BY ultimo_acceso LIMIT 64").fetchall()
+            if not filas:
+                self._bytes_totales = 0
+                break
+            for clave, tamano in filas:
+                if self._bytes_totales <= self.max_bytes:
+                    break
+                self._conexion.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+                self._bytes_totales -= tamano
+                self.desalojadas += 1
+
+    def limpiar(self):
+        """Elimina todas las entradas"""
+        with self._lock:
+            self._conexion.execute("DELETE FROM respuestas")
+            self._conexion.commit()
+            self._bytes_totales = 0
+
+    def estadisticas(self):
+        """Devuelve contadores de aciertos, fallos y ocupación"""
+        with self._lock:
+            entradas = self._conexion.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0]
+            consultas = self.aciertos + self.fallos
+            return {
+                "entradas": entradas,
+                "bytes": self._bytes_totales,
+                "max_bytes": self.max_bytes,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+                "caducadas": self.caducadas,
+                "desalojadas": self.desalojadas
+            }
+
+    def cerrar(self):
+        """Cierra la base de datos"""
+        with self._lock:
+            self._conexion.close()
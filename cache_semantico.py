@@ -0,0 +1,195 @@
+import importlib.util
+import re
+import threading
+import unicodedata
+import zlib
+
+# numpy tarda más en importarse que el resto del arranque: aquí solo se
+# comprueba que está instalado y se importa al usarlo, normalmente desde los
+# hilos que cargan el índice semántico y entrenan el clasificador
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+# Palabras frecuentes que no aportan significado a la pregunta
+PALABRAS_VACIAS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes como con contra cual cuales
+de del desde donde dos el ella ellas ellos en entre era es esa esas ese eso esos esta
+estas este esto estos fue ha hay la las le les lo los me mi mis muy nos o os para pero
+por que se si sin sobre su sus te ti tu tus un una uno unos y ya yo
+puedes podrias dime decir explicame explica quiero saber favor porfavor
+""".split())
+
+
+def quitar_acentos(texto):
+    """Pasa a minúsculas y elimina tildes y diéresis (la ñ se conserva)"""
+    texto = unicodedata.normalize("NFD", texto.lower().replace("ñ", "\x00"))
+    texto = "".join(c for c in texto if unicodedata.category(c) != "Mn")
+    return unicodedata.normalize("NFC", texto).replace("\x00", "ñ")
+
+
+def extraer_rasgos(texto):
+    """Devuelve las palabras con significado y sus n-gramas de caracteres (3 a 5)"""
+    palabras = [p for p in re.findall(r"\w+", quitar_acentos(texto)) if p not in PALABRAS_VACIAS]
+    rasgos = list(palabras)
+    for palabra in palabras:
+        marcada = f"<{palabra}>"
+        for n in (3, 4, 5):
+            rasgos.extend(marcada[i:i + n] for i in range(len(marcada) - n + 1))
+    return rasgos
+
+
+def firma_numerica(texto):
+    """Devuelve las cifras del texto; preguntas con cifras distintas nunca son equivalentes"""
+    return " ".join(re.findall(r"\d+(?:[.,]\d+)?", texto))
+
+
+def vectorizar(texto, dimension=512):
+    """Calcula un embedding local por hashing de rasgos, normalizado a norma 1"""
+    import numpy as np
+    rasgos = extraer_rasgos(texto)
+    if not rasgos:
+        return np.zeros(dimension, dtype=np.float32)
+
+    # crc32 es estable entre ejecuciones (hash() no lo es)
+    hashes = np.fromiter((zlib.crc32(r.encode("utf-8")) for r in rasgos),
+                         dtype=np.uint32, count=len(rasgos))
+    indices = (hashes % dimension).astype(np.intp)
+    signos = np.where(hashes & 0x80000000, -1.0, 1.0)
+    vector = np.bincount(indices, weights=signos, minlength=dimension).astype(np.float32)
+
+    norma = np.linalg.norm(vector)
+    if norma > 0:
+        vector /= norma
+    return vector
+
+
+class CacheSemantico:
+    """Índice en memoria de prompts para encontrar preguntas casi idénticas
+
+    Cada prompt se guarda como una fila de una matriz; una búsqueda es un
+    producto matriz-vector contra todas las filas. La matriz se reserva por
+    bloques de `tamano_bloque` filas según se añaden entradas (2 MB cada uno
+    con 1024 filas de 512 dimensiones), así que un índice casi vacío apenas
+    ocupa memoria aunque admita `max_entradas`. Solo se comparan entradas
+    del mismo servicio, la misma ventana de contexto y las mismas cifras. Al
+    llenarse, las filas más antiguas se reutilizan.
+    """
+
+    def __init__(self, dimension=512, umbral=0.9, max_entradas=100_000, tamano_bloque=1024):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy no está instalado")
+
+        self.dimension = dimension
+        self.umbral = umbral
+        self.max_entradas = max_entradas
+        self.tamano_bloque = min(tamano_bloque, max_entradas)
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+
+        self._bloques = []  # Matrices de tamano_bloque filas, creadas al necesitarlas
+        self._grupos = []  # Id de grupo de cada fila, por bloques como la matriz
+        self._claves = []  # Clave de cada fila usada
+        self._filas = {}  # clave -> fila
+        self._ids_grupo = {}  # (servicio, contexto, cifras) -> id
+        self._usadas = 0
+        self._siguiente = 0  # Próxima fila a reutilizar cuando el índice está lleno
+
+    def _id_grupo(self, servicio, contexto, prompt, crear=False):
+        """Devuelve el id numérico del grupo comparable de un prompt (requiere el lock)"""
+        grupo = (servicio, contexto, firma_numerica(prompt))
+        if grupo not in self._ids_grupo:
+            if not crear:
+                return None
+            self._ids_grupo[grupo] = len(self._ids_grupo)
+        return self._ids_grupo[grupo]
+
+    def _posicion(self, fila):
+        """(bloque, fila dentro del bloque) de una fila"""
+        return divmod(fila, self.tamano_bloque)
+
+    def _reservar_fila(self):
+        """Devuelve una fila libre, añadiendo un bloque o reutilizando la más antigua (requiere el lock)"""
+        if self._usadas < self.max_entradas:
+            fila = self._usadas
+            if fila == len(self._bloques) * self.tamano_bloque:
+                import numpy as np
+                filas = min(self.tamano_bloque, self.max_entradas - fila)
+                self._bloques.append(np.zeros((filas, self.dimension), dtype=np.float32))
+                self._grupos.append(np.full(filas, -1, dtype=np.int64))
+            self._claves.append(None)
+            self._usadas += 1
+            return fila
+
+        fila = self._siguiente
+        self._siguiente = (self._siguiente + 1) % self.max_entradas
+        antigua = self._claves[fila]
+        if antigua is not None:
+            del self._filas[antigua]
+        return fila
+
+    def agregar(self, clave, servicio, contexto, prompt):
+        """Indexa el prompt de una entrada de caché"""
+        self.agregar_lote([(clave, servicio, contexto, prompt)])
+
+    def agregar_lote(self, entradas):
+        """Indexa varias entradas (clave, servicio, contexto, prompt) de una vez"""
+        vectores = [vectorizar(prompt, self.dimension) for _, _, _, prompt in entradas]
+        with self._lock:
+            for (clave, servicio, contexto, prompt), vector in zip(entradas, vectores):
+                fila = self._filas.get(clave)
+                if fila is None:
+                    fila = self._reservar_fila()
+                    self._filas[clave] = fila
+                    self._claves[fila] = clave
+                bloque, posicion = self._posicion(fila)
+                self._bloques[bloque][posicion] = vector
+                self._grupos[bloque][posicion] = self._id_grupo(servicio, contexto, prompt, crear=True)
+
+    def buscar(self, servicio, contexto, prompt):
+        """Devuelve (clave, similitud) del prompt más parecido por encima del umbral, o None"""
+        vector = vectorizar(prompt, self.dimension)
+        with self._lock:
+            grupo = self._id_grupo(servicio, contexto, prompt)
+            if grupo is None or self._usadas == 0:
+                self.fallos += 1
+                return None
+
+            fila, similitud = -1, -1.0
+            for numero, (matriz, grupos) in enumerate(zip(self._bloques, self._grupos)):
+                usadas = min(len(matriz), self._usadas - numero * self.tamano_bloque)
+                similitudes = matriz[:usadas] @ vector
+                similitudes[grupos[:usadas] != grupo] = -1.0
+                mejor = int(similitudes.argmax())
+                if similitudes[mejor] > similitud:
+                    fila, similitud = numero * self.tamano_bloque + mejor, float(similitudes[mejor])
+            if similitud < self.umbral:
+                self.fallos += 1
+                return None
+
+            self.aciertos += 1
+            return self._claves[fila], similitud
+
+    def descartar(self, clave):
+        """Quita del índice una entrada que ya no existe en la caché"""
+        with self._lock:
+            fila = self._filas.pop(clave, None)
+            if fila is not None:
+                self._claves[fila] = None
+                bloque, posicion = self._posicion(fila)
+                self._grupos[bloque][posicion] = -1
+                self._bloques[bloque][posicion] = 0.0
+
+    def estadisticas(self):
+        """Devuelve ocupación y contadores del índice"""
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._filas),
+                "capacidad": sum(len(matriz) for matriz in self._bloques),
+                "max_entradas": self.max_entradas,
+                "dimension": self.dimension,
+                "umbral": self.umbral,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": self.aciertos / consultas if consultas else 0.0
+            }
@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from configuracion_ia import AlmacenConfiguracion, ruta_configuracion
+
+NOMBRE_ARCHIVO = "calibracion_voz.json"
+
+
+def ruta_calibracion():
+    """Archivo de la calibración, junto al de configuración"""
+    return os.path.join(os.path.dirname(ruta_configuracion()), NOMBRE_ARCHIVO)
+
+
+def prioridad_baja(nice=10):
+    """Baja la prioridad del hilo actual (solo donde el sistema lo permite)"""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), nice)
+    except (AttributeError, OSError):
+        pass
+
+
+def reconocer(reconocedor, audio, idioma="es-ES"):
+    """Transcribe con Google y devuelve (texto, confianza); lanza UnknownValueError si no entiende
+
+    Google solo da la confianza de la mejor alternativa y a veces ni esa:
+    entonces se toma 1.0 para no provocar recalibraciones sin motivo.
+    """
+    import speech_recognition as sr
+    resultado = reconocedor.recognize_google(audio, language=idioma, show_all=True)
+    alternativas = resultado.get("alternative") if isinstance(resultado, dict) else None
+    if not alternativas:
+        raise sr.UnknownValueError()
+    mejor = alternativas[0]
+    return mejor["transcript"], mejor.get("confidence", 1.0)
+
+
+class CalibradorRuido:
+    """Umbral de energía del micrófono medido una vez y reutilizado
+
+    Antes escuchar() medía el ruido ambiente durante un segundo antes de
+    cada frase. Ahora el reconocedor conserva el umbral, que se guarda en
+    disco para el siguiente arranque, y solo se vuelve a medir:
+
+    - en un hilo de baja prioridad, si la medida tiene más de `intervalo`
+      segundos y el micrófono lleva `reposo` segundos sin usarse;
+    - al empezar la siguiente frase, si hubo `max_fallos` seguidas sin
+      reconocer o con confianza menor que `confianza_minima`.
+    """
+
+    def __init__(self, reconocedor, microfono, ruta=None, duracion=1.0, intervalo=900.0,
+                 reposo=20.0, confianza_minima=0.6, max_fallos=2):
+        self.reconocedor = reconocedor
+        self.microfono = microfono
+        self.duracion = duracion
+        self.intervalo = intervalo
+        self.reposo = reposo
+        self.confianza_minima = confianza_minima
+        self.max_fallos = max_fallos
+        indice = getattr(microfono, "device_index", None)
+        self.clave = "predeterminado" if indice is None else f"dispositivo-{indice}"
+
+        self.umbral = None
+        self.calibrado = 0.0  # time.time() de la última medida
+        self.pendiente = False  # Recalibrar al empezar la próxima frase
+        self.fallos = 0
+        self.calibraciones = 0
+        self._ultimo_uso = time.monotonic()
+        self._lock_microfono = threading.Lock()
+        self._detener = threading.Event()
+        self._almacen = AlmacenConfiguracion(ruta or ruta_calibracion(), vigilar=False, migrar=False)
+
+        guardada = self._almacen.obtener().get(self.clave)
+        if isinstance(guardada, dict) and guardada.get("umbral"):
+            self.umbral = float(guardada["umbral"])
+            self.calibrado = float(guardada.get("fecha", 0.0))
+            self.reconocedor.energy_threshold = self.umbral
+
+        threading.Thread(target=self._bucle, daemon=True).start()
+
+    @contextmanager
+    def abrir(self):
+        """Abre el micrófono para escuchar; solo mide el ruido si no hay umbral o hace falta"""
+        with self._lock_microfono:
+            try:
+                with self.microfono as fuente:
+                    if self.umbral is None or self.pendiente:
+                        self._medir(fuente)
+                    yield fuente
+            finally:
+                # listen() ajusta el umbral sobre la marcha con el ruido que oye
+                if self.umbral is not None:
+                    self.umbral = self.reconocedor.energy_threshold
+                self._ultimo_uso = time.monotonic()
+
+    def registrar(self, confianza):
+        """Anota el resultado de una frase: la confianza del reconocimiento, o None si falló"""
+        if confianza is not None and confianza >= self.confianza_minima:
+            self.fallos = 0
+            return
+        self.fallos += 1
+        if self.fallos >= self.max_fallos:
+            self.pendiente = True
+
+    def calibrar(self):
+        """Mide el ruido si el micrófono está libre; devuelve False si estaba en uso"""
+        if not self._lock_microfono.acquire(blocking=False):
+            return False
+        try:
+            with self.microfono as fuente:
+                self._medir(fuente)
+            return True
+        except Exception as e:
+            print(f"Error calibrando el micrófono: {e}")
+            return False
+        finally:
+            self._lock_microfono.release()
+
+    def _medir(self, fuente):
+        """Mide el ruido ambiente con el micrófono ya abierto (requiere el lock)"""
+        self.reconocedor.adjust_for_ambient_noise(fuente, duration=self.duracion)
+        self.umbral = self.reconocedor.energy_threshold
+        self.calibrado = time.time()
+        self.pendiente = False
+        self.fallos = 0
+        self.calibraciones += 1
+        self.guardar()
+
+    def guardar(self):
+        """Programa la escritura del umbral actual en disco"""
+        if self.umbral is None:
+            return
+        datos = self._almacen.obtener()
+        datos[self.clave] = {"umbral": round(self.umbral, 1), "fecha": self.calibrado}
+        self._almacen.guardar(datos)
+
+    def _bucle(self):
+        prioridad_baja()
+        if self.umbral is None:
+            self.calibrar()  # Primer arranque: medir ya, antes de la primera frase
+        while not self._detener.wait(min(self.reposo, self.intervalo)):
+            en_reposo = time.monotonic() - self._ultimo_uso >= self.reposo
+            caducada = time.time() - self.calibrado >= self.intervalo
+            if self.umbral is None or (en_reposo and caducada):
+                self.calibrar()
+
+    def resumen(self):
+        if self.umbral is None:
+            return "🎤 Micrófono: sin calibrar"
+        minutos = (time.time() - self.calibrado) / 60
+        return (f"🎤 Micrófono: umbral {self.umbral:.0f}, medido hace {minutos:.0f} min "
+                f"({self.calibraciones} calibraciones en esta sesión)")
+
+    def cerrar(self):
+        """Detiene el hilo y guarda el último umbral"""
+        self._detener.set()
+        self.guardar()
+        self._almacen.cerrar()
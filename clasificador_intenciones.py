@@ -0,0 +1,159 @@
+import json
+import os
+import re
+import threading
+import zlib
+
+from cache_semantico import NUMPY_AVAILABLE
+
+# Ejemplos etiquetados que se distribuyen con el asistente
+RUTA_EJEMPLOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "intenciones.jsonl")
+# Etiqueta de lo que debe responder el modelo remoto
+INTENCION_IA = "ia"
+
+_SIN_ACENTOS = str.maketrans("áéíóúüàèìòù", "aeiouuaeiou")
+_PALABRA = re.compile(r"\w+")
+
+
+def cargar_ejemplos(ruta=RUTA_EJEMPLOS):
+    """Lee los ejemplos [(texto, intencion)] de un archivo JSONL"""
+    ejemplos = []
+    with open(ruta, "r", encoding="utf-8") as f:
+        for linea in f:
+            if linea.strip():
+                registro = json.loads(linea)
+                ejemplos.append((registro["texto"], registro["intencion"]))
+    return ejemplos
+
+
+def rasgos(texto):
+    """Palabras, pares de palabras y trigramas de caracteres del texto
+
+    A diferencia de la caché semántica aquí se conservan las palabras
+    vacías: "qué tal" o "cómo estás" son justo lo que distingue la intención.
+    """
+    palabras = _PALABRA.findall(texto.lower().translate(_SIN_ACENTOS))
+    resultado = [f"p:{p}" for p in palabras]
+    marcadas = ["<"] + palabras + [">"]
+    resultado.extend(f"b:{a} {b}" for a, b in zip(marcadas, marcadas[1:]))
+    for palabra in palabras:
+        marcada = f"<{palabra}>"
+        resultado.extend(f"c:{marcada[i:i + 3]}" for i in range(len(marcada) - 2))
+    return resultado
+
+
+class ClasificadorIntenciones:
+    """Regresión logística multinomial sobre rasgos con hashing (requiere numpy)
+
+    Se entrena en menos de un segundo con los ejemplos distribuidos y decide si
+    un comando es una habilidad local o debe ir al modelo remoto. Solo se
+    acepta una intención local si su probabilidad supera `umbral`.
+    """
+
+    def __init__(self, dimension=4096, umbral=0.6, regularizacion=1e-4):
+        self.dimension = dimension
+        self.umbral = umbral
+        self.regularizacion = regularizacion
+        self.intenciones = []
+        self.pesos = None
+        self.sesgos = None
+
+    def vectorizar(self, textos):
+        """Matriz (textos x dimension) de rasgos con log(1 + frecuencia), normalizada por filas"""
+        import numpy as np
+        matriz = np.zeros((len(textos), self.dimension), dtype=np.float32)
+        for fila, texto in enumerate(textos):
+            lista = rasgos(texto)
+            if not lista:
+                continue
+            indices = np.fromiter((zlib.crc32(r.encode("utf-8")) % self.dimension for r in lista),
+                                  dtype=np.intp, count=len(lista))
+            np.add.at(matriz[fila], indices, 1.0)
+        np.log1p(matriz, out=matriz)
+        normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+        np.divide(matriz, normas, out=matriz, where=normas > 0)
+        return matriz
+
+    def entrenar(self, ejemplos, iteraciones=300, tasa=20.0):
+        """Ajusta el modelo por descenso de gradiente sobre la entropía cruzada"""
+        import numpy as np
+        textos = [texto for texto, _ in ejemplos]
+        self.intenciones = sorted({intencion for _, intencion in ejemplos})
+        etiquetas = np.array([self.intenciones.index(intencion) for _, intencion in ejemplos])
+        x = self.vectorizar(textos)
+        y = np.eye(len(self.intenciones), dtype=np.float32)[etiquetas]
+
+        pesos = np.zeros((self.dimension, len(self.intenciones)), dtype=np.float32)
+        sesgos = np.zeros(len(self.intenciones), dtype=np.float32)
+        for _ in range(iteraciones):
+            probabilidades = self._softmax(x @ pesos + sesgos)
+            error = (probabilidades - y) / len(textos)
+            pesos -= tasa * (x.T @ error + self.regularizacion * pesos)
+            sesgos -= tasa * error.sum(axis=0)
+        self.pesos = pesos
+        self.sesgos = sesgos
+        return self
+
+    @staticmethod
+    def _softmax(logits):
+        import numpy as np
+        logits = logits - logits.max(axis=1, keepdims=True)
+        exponenciales = np.exp(logits)
+        return exponenciales / exponenciales.sum(axis=1, keepdims=True)
+
+    def probabilidades(self, texto):
+        """Devuelve {intencion: probabilidad} para un texto"""
+        fila = self._softmax(self.vectorizar([texto]) @ self.pesos + self.sesgos)[0]
+        return dict(zip(self.intenciones, fila.tolist()))
+
+    def predecir(self, texto):
+        """Devuelve (intencion, probabilidad); la intención es INTENCION_IA si no hay confianza suficiente"""
+        probabilidades = self.probabilidades(texto)
+        intencion = max(probabilidades, key=probabilidades.get)
+        if probabilidades[intencion] < self.umbral:
+            return INTENCION_IA, probabilidades[intencion]
+        return intencion, probabilidades[intencion]
+
+
+class ClasificadorEnSegundoPlano:
+    """Entrena el clasificador en un hilo para no retrasar el arranque
+
+    Mientras no esté listo, todo se envía a la IA remota. Solo devuelve las
+    intenciones de `permitidas` (todas si es None): el modelo aprende a
+    distinguir también las demás, pero un comando que las active va a la
+    IA. Los textos de menos de `min_palabras` palabras ("hoy", "mañana")
+    son demasiado ambiguos y también van a la IA.
+    """
+
+    def __init__(self, ruta=RUTA_EJEMPLOS, permitidas=None, min_palabras=2, **opciones):
+        self.permitidas = permitidas
+        self.min_palabras = min_palabras
+        self.clasificador = None
+        self.locales = 0
+        self.remotas = 0
+        self._lock = threading.Lock()
+        if NUMPY_AVAILABLE:
+            threading.Thread(target=self._entrenar, args=(ruta, opciones), daemon=True).start()
+
+    def _entrenar(self, ruta, opciones):
+        try:
+            self.clasificador = ClasificadorIntenciones(**opciones).entrenar(cargar_ejemplos(ruta))
+        except Exception as e:
+            print(f"Error entrenando clasificador de intenciones: {e}")
+
+    def clasificar(self, texto):
+        """Intención local con confianza suficiente, o None si debe responder la IA"""
+        if self.clasificador is None:
+            return None
+        if len(_PALABRA.findall(texto)) < self.min_palabras:
+            intencion = INTENCION_IA
+        else:
+            intencion, _ = self.clasificador.predecir(texto)
+            if self.permitidas is not None and intencion not in self.permitidas:
+                intencion = INTENCION_IA
+        with self._lock:
+            if intencion == INTENCION_IA:
+                self.remotas += 1
+                return None
+            self.locales += 1
+        return intencion
@@ -0,0 +1,103 @@
+import threading
+
+
+class Vuelo:
+    """Una petición en curso a la que pueden unirse peticiones idénticas"""
+
+    __slots__ = ("conversacion", "fragmentos", "receptores", "respuesta", "numero", "seguidores",
+                 "_terminado", "_lock")
+
+    def __init__(self, conversacion):
+        self.conversacion = conversacion  # Conversación de la petición que hace la llamada real
+        self.fragmentos = []
+        self.receptores = []
+        self.respuesta = None
+        self.numero = None  # Número en el registro del turno que guardó la líder
+        self.seguidores = 0
+        self._terminado = threading.Event()
+        self._lock = threading.Lock()
+
+    def emitir(self, fragmento):
+        """Reparte un fragmento de la respuesta a todos los que esperan por streaming"""
+        with self._lock:
+            self.fragmentos.append(fragmento)
+            for receptor in self.receptores:
+                try:
+                    receptor(fragmento)
+                except Exception as e:
+                    print(f"Error entregando fragmento: {e}")
+
+    def suscribir(self, al_recibir):
+        """Entrega los fragmentos ya recibidos y apunta al receptor para los siguientes"""
+        with self._lock:
+            for fragmento in self.fragmentos:
+                al_recibir(fragmento)
+            self.receptores.append(al_recibir)
+
+    def desuscribir(self, al_recibir):
+        """Deja de entregar fragmentos a un receptor (su petición se canceló)"""
+        with self._lock:
+            if al_recibir in self.receptores:
+                self.receptores.remove(al_recibir)
+
+    def esperar(self, cancelado=None, intervalo=0.05):
+        """Espera la respuesta de la líder; devuelve None si antes se activa `cancelado`
+
+        Se espera a tramos de `intervalo` segundos para atender la cancelación
+        propia sin depender de que termine la líder.
+        """
+        while not self._terminado.wait(intervalo if cancelado is not None else None):
+            if cancelado.is_set():
+                return None
+        return self.respuesta
+
+    def terminar(self, respuesta):
+        self.respuesta = respuesta
+        self._terminado.set()
+
+
+class CoalescedorIA:
+    """Agrupa peticiones idénticas en curso para hacer una sola llamada al proveedor
+
+    La primera petición con una clave dada (servicio, prompt y contexto) es la
+    líder y hace la llamada; las que llegan mientras tanto esperan su
+    respuesta y, si piden streaming, reciben los mismos fragmentos.
+    """
+
+    def __init__(self):
+        self._vuelos = {}
+        self._lock = threading.Lock()
+        self.llamadas = 0
+        self.agrupadas = 0
+
+    def unirse(self, clave, conversacion, al_recibir=None):
+        """Devuelve (vuelo, es_lider) para la clave"""
+        with self._lock:
+            vuelo = self._vuelos.get(clave)
+            if vuelo is None:
+                vuelo = Vuelo(conversacion)
+                self._vuelos[clave] = vuelo
+                self.llamadas += 1
+                es_lider = True
+            else:
+                vuelo.seguidores += 1
+                self.agrupadas += 1
+                es_lider = False
+        if al_recibir:
+            vuelo.suscribir(al_recibir)
+        return vuelo, es_lider
+
+    def terminar(self, clave, vuelo, respuesta):
+        """Publica la respuesta de la líder y libera la clave para nuevas peticiones"""
+        with self._lock:
+            if self._vuelos.get(clave) is vuelo:
+                del self._vuelos[clave]
+        vuelo.terminar(respuesta)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "llamadas": self.llamadas,
+                "agrupadas": self.agrupadas,
+                "en_curso": len(self._vuelos)
+            }
@@ -0,0 +1,51 @@
+import time
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from metricas_ia import traza_actual
+
+
+class _ConexionMedida(HTTPConnection):
+    """Conexión HTTP que suma su tiempo de conexión a la traza del hilo"""
+
+    def connect(self):
+        inicio = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            traza = traza_actual()
+            if traza is not None:
+                traza.conexion += time.perf_counter() - inicio
+                traza.conexiones_nuevas += 1
+
+
+class _ConexionHTTPSMedida(HTTPSConnection):
+    """Conexión HTTPS (TCP + TLS) que suma su tiempo de conexión a la traza del hilo"""
+
+    def connect(self):
+        inicio = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            traza = traza_actual()
+            if traza is not None:
+                traza.conexion += time.perf_counter() - inicio
+                traza.conexiones_nuevas += 1
+
+
+class _PoolMedido(HTTPConnectionPool):
+    ConnectionCls = _ConexionMedida
+
+
+class _PoolHTTPSMedido(HTTPSConnectionPool):
+    ConnectionCls = _ConexionHTTPSMedida
+
+
+class AdaptadorMedido(HTTPAdapter):
+    """HTTPAdapter cuyas conexiones nuevas registran su tiempo de conexión"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _PoolMedido, "https": _PoolHTTPSMedido}
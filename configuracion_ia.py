@@ -0,0 +1,252 @@
+import copy
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from registro_ia import es_registro
+
+# Variable de entorno con la que se puede elegir otro archivo de configuración
+VARIABLE_RUTA = "ASISTENTE_IA_CONFIG"
+NOMBRE_ARCHIVO = "config.json"
+
+
+def ruta_configuracion():
+    """Ruta estable del archivo de configuración, independiente del directorio actual"""
+    ruta = os.environ.get(VARIABLE_RUTA)
+    if ruta:
+        return os.path.abspath(os.path.expanduser(ruta))
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), NOMBRE_ARCHIVO)
+
+
+def ruta_datos(ruta, directorio, origen=None):
+    """Resuelve una ruta de datos (caché, historial...) relativa a `directorio`
+
+    `origen` es el directorio del que se acaba de migrar un config.json
+    antiguo (AlmacenConfiguracion.migrada_desde): solo en ese arranque, si
+    los datos aún no existen en `directorio` pero sí en `origen`, se mueven
+    con él. Un directorio solo se mueve si tiene la forma de un historial
+    del asistente, para no llevarse datos ajenos con el mismo nombre.
+    """
+    ruta = os.path.expanduser(ruta)
+    destino = os.path.join(directorio, ruta)
+    if os.path.isabs(ruta) or origen is None or os.path.exists(destino):
+        return destino
+    anterior = os.path.join(origen, ruta)
+    if not os.path.exists(anterior) or os.path.abspath(anterior) == os.path.abspath(destino):
+        return destino
+    if os.path.isdir(anterior) and not es_registro(anterior):
+        print(f"⚠️ {anterior} no parece un historial del asistente: no se migra")
+        return destino
+    try:
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        # Los archivos auxiliares de SQLite acompañan a la base de datos
+        for sufijo in ("", "-wal", "-shm"):
+            if os.path.exists(anterior + sufijo):
+                shutil.move(anterior + sufijo, destino + sufijo)
+                print(f"📦 Migrado {anterior + sufijo} a {destino + sufijo}")
+    except OSError as e:
+        print(f"Error migrando {anterior}: {e}")
+        return anterior
+    return destino
+
+
+def firma_archivo(ruta):
+    """(mtime_ns, tamaño, inodo) del archivo, o None si no existe"""
+    try:
+        estado = os.stat(ruta)
+    except OSError:
+        return None
+    return (estado.st_mtime_ns, estado.st_size, estado.st_ino)
+
+
+def leer_configuracion(ruta):
+    """Devuelve el JSON de un archivo, o None si no existe o no es válido"""
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            datos = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Error leyendo configuración {ruta}: {e}")
+        return None
+    return datos if isinstance(datos, dict) else None
+
+
+class AlmacenConfiguracion:
+    """Configuración cargada una vez, guardada de forma atómica y vigilada
+
+    Las escrituras se hacen en un hilo propio (archivo temporal + rename),
+    así que guardar() no bloquea a quien lo llama; si llegan varios cambios
+    seguidos solo se escribe el último. Un segundo hilo comprueba cada
+    `intervalo` segundos si el archivo cambió desde fuera y, en ese caso, lo
+    recarga y avisa a los suscriptores. Con migrar=False no se busca un
+    config.json antiguo en el directorio actual (para otros archivos).
+    """
+
+    def __init__(self, ruta=None, intervalo=1.0, vigilar=True, migrar=True):
+        self.ruta = ruta or ruta_configuracion()
+        self.intervalo = intervalo
+        self.migrar = migrar
+        self._suscriptores = []
+        self._lock = threading.Lock()
+        self._condicion = threading.Condition(self._lock)
+        self._pendiente = None  # Datos a escribir
+        self._escribiendo = False
+        self._detener = threading.Event()
+        self.migrada_desde = None  # Directorio del config.json antiguo, si se migró en este arranque
+        self.datos = self._leer_inicial()
+        self._firma = firma_archivo(self.ruta)
+
+        self._escritor = threading.Thread(target=self._bucle_escritura, daemon=True)
+        self._escritor.start()
+        self._vigilante = None
+        if vigilar:
+            self._vigilante = threading.Thread(target=self._bucle_vigilancia, daemon=True)
+            self._vigilante.start()
+
+    def _leer_inicial(self):
+        """Lee la configuración; si aún no existe, migra el config.json del directorio actual"""
+        datos = self._leer(self.ruta)
+        if datos is None and self.migrar and os.path.abspath(NOMBRE_ARCHIVO) != self.ruta:
+            datos = self._leer(NOMBRE_ARCHIVO)
+            if datos:
+                print(f"📦 Migrando configuración de {os.path.abspath(NOMBRE_ARCHIVO)} a {self.ruta}")
+                self.migrada_desde = os.getcwd()
+                self.guardar(datos)
+        return datos or {}
+
+    def _leer(self, ruta):
+        return leer_configuracion(ruta)
+
+    def obtener(self):
+        """Copia de la configuración actual"""
+        with self._lock:
+            return copy.deepcopy(self.datos)
+
+    def suscribir(self, funcion):
+        """Registra funcion(datos) para cuando el archivo cambie desde fuera"""
+        self._suscriptores.append(funcion)
+
+    def guardar(self, datos):
+        """Actualiza la configuración en memoria y programa su escritura en disco"""
+        with self._condicion:
+            self.datos = copy.deepcopy(datos)
+            self._pendiente = copy.deepcopy(datos)
+            self._condicion.notify()
+
+    def esperar_escritura(self, plazo=5.0):
+        """Espera a que se escriban los cambios pendientes; devuelve False si no da tiempo"""
+        with self._condicion:
+            return self._condicion.wait_for(
+                lambda: self._pendiente is None and not self._escribiendo, plazo)
+
+    def _bucle_escritura(self):
+        while True:
+            with self._condicion:
+                self._condicion.wait_for(lambda: self._pendiente is not None or self._detener.is_set())
+                if self._pendiente is None:
+                    return
+                datos, self._pendiente = self._pendiente, None
+                self._escribiendo = True
+            try:
+                self._escribir(datos)
+            except Exception as e:
+                print(f"Error guardando configuración: {e}")
+            finally:
+                with self._condicion:
+                    self._escribiendo = False
+                    self._condicion.notify_all()
+
+    def _escribir(self, datos):
+        """Escribe el archivo de forma atómica: nunca queda a medio escribir"""
+        directorio = os.path.dirname(self.ruta)
+        os.makedirs(directorio, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=directorio, prefix=".config-", suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+                json.dump(datos, f, indent=2, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(temporal, 0o600)  # Contiene API keys
+            os.replace(temporal, self.ruta)
+        except Exception:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        with self._lock:
+            # Nuestro propio cambio no cuenta como edición externa
+            self._firma = firma_archivo(self.ruta)
+
+    def _bucle_vigilancia(self):
+        while not self._detener.wait(self.intervalo):
+            self.comprobar_cambios()
+
+    def comprobar_cambios(self):
+        """Recarga el archivo si cambió desde fuera; devuelve True si lo hizo
+
+        Se lee con el lock tomado: un guardar() que llegue mientras tanto
+        espera y queda por encima de lo leído, en lugar de perderse.
+        """
+        with self._lock:
+            firma = firma_archivo(self.ruta)
+            if firma == self._firma or self._pendiente is not None or self._escribiendo:
+                return False
+            datos = self._leer(self.ruta) if firma else {}
+            if datos is None:
+                return False  # Archivo a medio editar: se reintenta en la próxima vuelta
+            self._firma = firma
+            self.datos = datos
+        for funcion in list(self._suscriptores):
+            try:
+                funcion(copy.deepcopy(datos))
+            except Exception as e:
+                print(f"Error aplicando configuración: {e}")
+        return True
+
+    def cerrar(self):
+        """Escribe lo pendiente y detiene los hilos"""
+        self.esperar_escritura()
+        with self._condicion:
+            self._detener.set()
+            self._condicion.notify_all()
+
+
+class ConfiguracionEnMemoria:
+    """Configuración con la misma interfaz que AlmacenConfiguracion, sin tocar el disco
+
+    Para herramientas (lote, benchmark) que no deben escribir ni vigilar el
+    config.json del usuario. `ruta` solo sirve para situar la caché y el
+    historial, como con la configuración real.
+    """
+
+    migrada_desde = None
+
+    def __init__(self, datos=None, ruta=None):
+        self.ruta = ruta or ruta_configuracion()
+        self.datos = copy.deepcopy(datos or {})
+        self._lock = threading.Lock()
+
+    @classmethod
+    def copia_de(cls, ruta=None):
+        """Copia en memoria de un archivo de configuración, leído una sola vez"""
+        ruta = ruta or ruta_configuracion()
+        return cls(leer_configuracion(ruta), ruta)
+
+    def obtener(self):
+        with self._lock:
+            return copy.deepcopy(self.datos)
+
+    def suscribir(self, funcion):
+        pass  # Nunca cambia desde fuera
+
+    def guardar(self, datos):
+        with self._lock:
+            self.datos = copy.deepcopy(datos)
+
+    def esperar_escritura(self, plazo=5.0):
+        return True
+
+    def cerrar(self):
+        pass
@@ -0,0 +1,92 @@
+import re
+from itertools import islice
+
+# Palabras y signos sueltos; aproximan las piezas de un tokenizador BPE
+_PIEZAS = re.compile(r"\w+|[^\w\s]")
+_FIN_FRASE = re.compile(r"(?<=[.!?])\s")
+
+
+def estimar_tokens(texto):
+    """Estima los tokens de un texto sin tokenizador
+
+    Cuenta una pieza por palabra o signo y una más por cada 4 letras
+    adicionales en las palabras largas.
+    """
+    total = 0
+    for pieza in _PIEZAS.findall(texto):
+        total += 1 + (len(pieza) - 1) // 4
+    return total
+
+
+def truncar_tokens(texto, max_tokens):
+    """Corta un texto en un límite de palabra para que no supere max_tokens"""
+    if estimar_tokens(texto) <= max_tokens:
+        return texto
+
+    total = 0
+    for coincidencia in _PIEZAS.finditer(texto):
+        pieza = coincidencia.group()
+        total += 1 + (len(pieza) - 1) // 4
+        if total > max_tokens - 1:  # Reservar uno para la elipsis
+            return texto[:coincidencia.start()].rstrip() + "…"
+    return texto
+
+
+def compactar_turno(pregunta, respuesta, max_tokens=40):
+    """Resume un turno en una línea: la pregunta y la primera frase de la respuesta"""
+    primera_frase = _FIN_FRASE.split(respuesta.strip(), maxsplit=1)[0]
+    pregunta = truncar_tokens(" ".join(pregunta.split()), max_tokens // 2)
+    primera_frase = truncar_tokens(" ".join(primera_frase.split()), max_tokens // 2)
+    return f"- Usuario: {pregunta} → Asistente: {primera_frase}"
+
+
+class ConstructorContexto:
+    """Arma el contexto de cada petición dentro de un presupuesto de tokens
+
+    Los turnos más recientes se envían completos (cada mensaje recortado a
+    max_tokens_mensaje) mientras quepan en el presupuesto; los anteriores se
+    condensan en un resumen de una línea por turno que nunca supera
+    max_tokens_resumen.
+    """
+
+    def __init__(self, presupuesto_tokens=1200, max_tokens_mensaje=300, max_tokens_resumen=250):
+        self.presupuesto_tokens = presupuesto_tokens
+        self.max_tokens_mensaje = max_tokens_mensaje
+        self.max_tokens_resumen = max_tokens_resumen
+
+    def ajustar_resumen(self, lineas):
+        """Descarta las líneas más antiguas hasta que el resumen quepa en su presupuesto"""
+        total = sum(estimar_tokens(linea) for linea in lineas)
+        inicio = 0
+        while total > self.max_tokens_resumen and inicio < len(lineas):
+            total -= estimar_tokens(lineas[inicio])
+            inicio += 1
+        return lineas[inicio:]
+
+    def plegar(self, resumen, interaccion):
+        """Añade al resumen acumulado un turno que sale del historial"""
+        resumen.append(compactar_turno(interaccion["pregunta"], interaccion["respuesta"]))
+        resumen[:] = self.ajustar_resumen(resumen)
+
+    def construir(self, historial, resumen):
+        """Devuelve (texto_resumen, turnos) para enviar como contexto"""
+        disponible = self.presupuesto_tokens - self.max_tokens_resumen
+        ventana = []
+        for interaccion in reversed(historial):
+            pregunta = truncar_tokens(interaccion["pregunta"], self.max_tokens_mensaje)
+            respuesta = truncar_tokens(interaccion["respuesta"], self.max_tokens_mensaje)
+            coste = estimar_tokens(pregunta) + estimar_tokens(respuesta) + 8  # Cabeceras de rol
+            if coste > disponible:
+                if not ventana and disponible > 16:
+                    # El último turno siempre se envía, aunque sea más recortado
+                    pregunta = truncar_tokens(pregunta, disponible // 2)
+                    respuesta = truncar_tokens(respuesta, disponible - estimar_tokens(pregunta) - 8)
+                    ventana.append({"pregunta": pregunta, "respuesta": respuesta})
+                break
+            ventana.append({"pregunta": pregunta, "respuesta": respuesta})
+            disponible -= coste
+        ventana.reverse()
+
+        fuera = islice(historial, len(historial) - len(ventana))
+        lineas = list(resumen) + [compactar_turno(i["pregunta"], i["respuesta"]) for i in fuera]
+        return "\n".join(self.ajustar_resumen(lineas)), ventana
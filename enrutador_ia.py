@@ -0,0 +1,190 @@
+import threading
+import time
+
+CERRADO = "cerrado"
+ABIERTO = "abierto"
+SEMIABIERTO = "semiabierto"
+
+
+class EstadoProveedor:
+    """Métricas y estado del cortocircuito de un proveedor"""
+
+    __slots__ = ("latencia_ewma", "tasa_errores", "fallos_consecutivos", "llamadas",
+                 "ultima_muestra", "estado", "abierto_hasta", "espera", "sonda_en_curso",
+                 "sonda_reservada_hasta")
+
+    def __init__(self, espera):
+        self.latencia_ewma = None
+        self.tasa_errores = 0.0
+        self.fallos_consecutivos = 0
+        self.llamadas = 0
+        self.ultima_muestra = 0.0
+        self.estado = CERRADO
+        self.abierto_hasta = 0.0
+        self.espera = espera
+        self.sonda_en_curso = False
+        self.sonda_reservada_hasta = 0.0  # Reservada por ordenar(reservar=True) y aún sin empezar
+
+
+class EnrutadorIA:
+    """Elige el proveedor más rápido entre los sanos y aísla a los que fallan
+
+    La latencia y la tasa de errores se siguen con medias móviles
+    exponenciales. Tras umbral_fallos fallos seguidos (o con una tasa de
+    errores mayor que max_tasa_errores) el circuito se abre y el proveedor
+    no recibe tráfico durante espera_apertura segundos; después pasa a
+    semiabierto y admite una única petición de sonda. Si la sonda falla, la
+    espera se duplica hasta max_espera.
+
+    La sonda se reserva en ordenar(reservar=True), con el lock tomado: las
+    llamadas concurrentes ya no ven al proveedor. Si quien la reservó no
+    llega a usarla, la libera con liberar_reservas() o caduca a los
+    caducidad_reserva segundos. Aun así, iniciar_llamada() solo deja pasar
+    una sonda a la vez.
+    """
+
+    def __init__(self, alfa=0.3, umbral_fallos=3, max_tasa_errores=0.5, espera_apertura=30.0,
+                 max_espera=300.0, caducidad_latencia=120.0, caducidad_reserva=30.0):
+        self.alfa = alfa
+        self.caducidad_reserva = caducidad_reserva
+        self.umbral_fallos = umbral_fallos
+        self.max_tasa_errores = max_tasa_errores
+        self.espera_apertura = espera_apertura
+        self.max_espera = max_espera
+        self.caducidad_latencia = caducidad_latencia
+        self._estados = {}
+        self._lock = threading.Lock()
+
+    def _estado(self, servicio):
+        """Devuelve el estado de un proveedor, creándolo si hace falta (requiere el lock)"""
+        estado = self._estados.get(servicio)
+        if estado is None:
+            estado = EstadoProveedor(self.espera_apertura)
+            self._estados[servicio] = estado
+        return estado
+
+    def _disponible(self, estado, ahora):
+        """Indica si un proveedor puede recibir tráfico (requiere el lock)"""
+        if estado.estado == ABIERTO and ahora >= estado.abierto_hasta:
+            estado.estado = SEMIABIERTO
+            estado.sonda_en_curso = False
+            estado.sonda_reservada_hasta = 0.0
+        if estado.estado == SEMIABIERTO:
+            return not estado.sonda_en_curso and ahora >= estado.sonda_reservada_hasta
+        return estado.estado == CERRADO
+
+    def ordenar(self, servicios, reservar=False):
+        """Devuelve los servicios disponibles, del más rápido al más lento
+
+        Los servicios sin medidas recientes van primero (en su orden original)
+        para que su latencia se vuelva a medir. Con reservar=True (quien va a
+        llamar) se reserva la sonda de los semiabiertos que se devuelven.
+        """
+        ahora = time.monotonic()
+        candidatos = []
+        with self._lock:
+            for posicion, servicio in enumerate(servicios):
+                estado = self._estado(servicio)
+                if not self._disponible(estado, ahora):
+                    continue
+                if reservar and estado.estado == SEMIABIERTO:
+                    estado.sonda_reservada_hasta = ahora + self.caducidad_reserva
+                reciente = (estado.latencia_ewma is not None
+                            and ahora - estado.ultima_muestra < self.caducidad_latencia)
+                latencia = estado.latencia_ewma if reciente else 0.0
+                candidatos.append((latencia, posicion, servicio))
+        return [servicio for _, _, servicio in sorted(candidatos)]
+
+    def iniciar_llamada(self, servicio):
+        """Marca el inicio de una llamada; devuelve False si es una segunda sonda a la vez
+
+        Con el circuito semiabierto la llamada es la sonda, y solo puede
+        haber una en curso.
+        """
+        with self._lock:
+            estado = self._estado(servicio)
+            self._disponible(estado, time.monotonic())  # Pasa a semiabierto si ya toca
+            if estado.estado == SEMIABIERTO:
+                if estado.sonda_en_curso:
+                    return False
+                estado.sonda_en_curso = True
+                estado.sonda_reservada_hasta = 0.0
+            return True
+
+    def liberar_reservas(self, servicios):
+        """Libera las sondas reservadas en ordenar() que no se llegaron a usar"""
+        with self._lock:
+            for servicio in servicios:
+                estado = self._estados.get(servicio)
+                if estado is not None and not estado.sonda_en_curso:
+                    estado.sonda_reservada_hasta = 0.0
+
+    def cancelar_llamada(self, servicio):
+        """Libera la sonda de una llamada cancelada antes de terminar"""
+        with self._lock:
+            self._estado(servicio).sonda_en_curso = False
+
+    def reiniciar(self, servicio):
+        """Olvida el historial de un proveedor (p. ej. tras cambiar su API key)"""
+        with self._lock:
+            self._estados.pop(servicio, None)
+
+    def registrar_exito(self, servicio, latencia):
+        """Registra una respuesta válida y cierra el circuito"""
+        with self._lock:
+            estado = self._estado(servicio)
+            self._actualizar(estado, latencia, error=False)
+            estado.fallos_consecutivos = 0
+            estado.estado = CERRADO
+            estado.espera = self.espera_apertura
+            estado.sonda_en_curso = False
+            estado.sonda_reservada_hasta = 0.0
+
+    def registrar_fallo(self, servicio, latencia):
+        """Registra un error o timeout y abre el circuito si se supera el umbral"""
+        with self._lock:
+            estado = self._estado(servicio)
+            self._actualizar(estado, latencia, error=True)
+            estado.fallos_consecutivos += 1
+
+            if estado.estado == SEMIABIERTO:
+                # La sonda falló: volver a abrir con una espera mayor
+                estado.espera = min(estado.espera * 2, self.max_espera)
+                self._abrir(estado)
+            elif (estado.fallos_consecutivos >= self.umbral_fallos
+                  or (estado.llamadas >= self.umbral_fallos
+                      and estado.tasa_errores > self.max_tasa_errores)):
+                self._abrir(estado)
+
+    def _abrir(self, estado):
+        """Abre el circuito de un proveedor (requiere el lock)"""
+        estado.estado = ABIERTO
+        estado.abierto_hasta = time.monotonic() + estado.espera
+        estado.sonda_en_curso = False
+        estado.sonda_reservada_hasta = 0.0
+
+    def _actualizar(self, estado, latencia, error):
+        """Actualiza las medias móviles con una nueva muestra (requiere el lock)"""
+        if estado.latencia_ewma is None:
+            estado.latencia_ewma = latencia
+        else:
+            estado.latencia_ewma += self.alfa * (latencia - estado.latencia_ewma)
+        estado.tasa_errores += self.alfa * ((1.0 if error else 0.0) - estado.tasa_errores)
+        estado.llamadas += 1
+        estado.ultima_muestra = time.monotonic()
+
+    def estadisticas(self):
+        """Devuelve el estado y las métricas de cada proveedor"""
+        ahora = time.monotonic()
+        with self._lock:
+            return {
+                servicio: {
+                    "estado": estado.estado,
+                    "latencia_ewma": estado.latencia_ewma,
+                    "tasa_errores": estado.tasa_errores,
+                    "fallos_consecutivos": estado.fallos_consecutivos,
+                    "llamadas": estado.llamadas,
+                    "reabre_en": max(0.0, estado.abierto_hasta - ahora) if estado.estado == ABIERTO else 0.0
+                }
+                for servicio, estado in self._estados.items()
+            }
@@ -0,0 +1,163 @@
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+
+from cache_semantico import PALABRAS_VACIAS, NUMPY_AVAILABLE
+
+# Tildes y diéresis (la ñ se conserva); solo se aplica a las palabras que no
+# son ASCII, mucho más rápido que unicodedata al indexar miles de turnos
+_SIN_ACENTOS = str.maketrans("áéíóúüàèìòùâêîôûäëïö", "aeiouuaeiouaeiouaeio")
+_PALABRA = re.compile(r"\w+")
+
+
+def terminos(texto):
+    """Palabras normalizadas de un texto: sin acentos, sin palabras vacías y sin plural en -s"""
+    palabras = (p if p.isascii() else p.translate(_SIN_ACENTOS) for p in _PALABRA.findall(texto.lower()))
+    return [p[:-1] if len(p) > 3 and p[-1] == "s" else p
+            for p in palabras if len(p) > 1 and p not in PALABRAS_VACIAS]
+
+
+class IndiceBM25:
+    """Índice invertido incremental con ranking BM25
+
+    Los documentos se identifican por un número entero (el número de turno
+    del registro de conversación). Cada término guarda sus documentos y
+    frecuencias en un array compacto; con numpy la puntuación de una
+    consulta se calcula vectorizada sobre esas listas.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        # termino -> array de (número de documento << 16 | frecuencia en él)
+        self._postings = {}
+        self._longitudes = array("I")  # número de documento -> términos que contiene
+        self._indexados = 0
+        self._suma_longitudes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def total(self):
+        return self._indexados
+
+    def agregar(self, numero, texto):
+        """Indexa un documento"""
+        self.agregar_lote([(numero, texto)])
+
+    def agregar_lote(self, documentos):
+        """Indexa varios documentos [(numero, texto)] tomando el lock una sola vez"""
+        analizados = [(numero, Counter(terminos(texto))) for numero, texto in documentos]
+        with self._lock:
+            postings = self._postings
+            for numero, cuentas in analizados:
+                if numero >= len(self._longitudes):
+                    self._longitudes.extend([0] * (numero + 1 - len(self._longitudes)))
+                longitud = sum(cuentas.values())
+                self._longitudes[numero] = longitud
+                self._suma_longitudes += longitud
+                self._indexados += 1
+                base = numero << 16
+                for termino, cuenta in cuentas.items():
+                    lista = postings.get(termino)
+                    if lista is None:
+                        lista = postings[termino] = array("Q")
+                    lista.append(base | min(cuenta, 0xFFFF))
+
+    def buscar(self, consulta, limite=5):
+        """Devuelve [(numero, puntuacion)] de los documentos más relevantes"""
+        consulta = list(dict.fromkeys(terminos(consulta)))
+        with self._lock:
+            n = self._indexados
+            if not consulta or not n:
+                return []
+            media = self._suma_longitudes / n
+            listas = [self._postings[t] for t in consulta if t in self._postings]
+            if NUMPY_AVAILABLE:
+                return self._buscar_numpy(listas, n, media, limite)
+            return self._buscar_python(listas, n, media, limite)
+
+    def _idf(self, n, df):
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def _buscar_numpy(self, listas, n, media, limite):
+        import numpy as np
+        longitudes = np.frombuffer(self._longitudes, dtype=np.uint32)
+        puntuaciones = np.zeros(len(longitudes), dtype=np.float32)
+        for lista in listas:
+            postings = np.frombuffer(lista, dtype=np.uint64)
+            ids = (postings >> 16).astype(np.intp)
+            tf = (postings & 0xFFFF).astype(np.float32)
+            norma = self.k1 * (1 - self.b + self.b * longitudes[ids] / media)
+            puntuaciones[ids] += self._idf(n, len(ids)) * tf * (self.k1 + 1) / (tf + norma)
+
+        candidatos = np.flatnonzero(puntuaciones)
+        if len(candidatos) > limite:
+            candidatos = candidatos[np.argpartition(-puntuaciones[candidatos], limite)[:limite]]
+        # A igual puntuación, primero los turnos más recientes
+        candidatos = candidatos[::-1]
+        orden = candidatos[np.argsort(-puntuaciones[candidatos], kind="stable")]
+        return [(int(i), float(puntuaciones[i])) for i in orden]
+
+    def _buscar_python(self, listas, n, media, limite):
+        puntuaciones = {}
+        for lista in listas:
+            idf = self._idf(n, len(lista))
+            for posting in lista:
+                numero, tf = posting >> 16, posting & 0xFFFF
+                norma = self.k1 * (1 - self.b + self.b * self._longitudes[numero] / media)
+                puntuaciones[numero] = puntuaciones.get(numero, 0.0) + idf * tf * (self.k1 + 1) / (tf + norma)
+        return heapq.nlargest(limite, puntuaciones.items(), key=lambda item: (item[1], item[0]))
+
+    def guardar(self, ruta, hasta):
+        """Guarda el índice en disco (de forma atómica) junto al número de turnos que cubre"""
+        with self._lock:
+            terminos_guardados = list(self._postings.items())
+            cabecera = {
+                "version": 1,
+                "hasta": hasta,
+                "indexados": self._indexados,
+                "suma_longitudes": self._suma_longitudes,
+                "longitudes": len(self._longitudes),
+                "terminos": [[termino, len(lista)] for termino, lista in terminos_guardados]
+            }
+            bloques = [self._longitudes.tobytes()] + [lista.tobytes() for _, lista in terminos_guardados]
+
+        temporal = f"{ruta}.tmp"
+        with open(temporal, "wb") as f:
+            f.write(json.dumps(cabecera, ensure_ascii=False).encode("utf-8") + b"\n")
+            f.writelines(bloques)
+        os.replace(temporal, ruta)
+
+    @classmethod
+    def cargar(cls, ruta, **opciones):
+        """Lee un índice guardado; devuelve (indice, hasta) o (None, 0) si no hay uno válido"""
+        try:
+            with open(ruta, "rb") as f:
+                cabecera = json.loads(f.readline())
+                datos = memoryview(f.read())
+            if cabecera.get("version") != 1:
+                return None, 0
+
+            indice = cls(**opciones)
+            posicion = cabecera["longitudes"] * indice._longitudes.itemsize
+            indice._longitudes.frombytes(datos[:posicion])
+            for termino, cantidad in cabecera["terminos"]:
+                lista = array("Q")
+                fin = posicion + cantidad * lista.itemsize
+                lista.frombytes(datos[posicion:fin])
+                indice._postings[termino] = lista
+                posicion = fin
+            if posicion != len(datos):
+                return None, 0
+            indice._indexados = cabecera["indexados"]
+            indice._suma_longitudes = cabecera["suma_longitudes"]
+            return indice, cabecera["hasta"]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Error leyendo índice del historial: {e}")
+            return None, 0
@@ -0,0 +1,130 @@
+"""Reconocimiento de intenciones de comandos en una sola pasada
+
+Las intenciones se declaran como tablas de frases y se compilan en un
+autómata Aho-Corasick sobre palabras: el texto se recorre una vez sea cual
+sea el número de frases, y solo coinciden palabras completas ("hora" no
+coincide dentro de "ahora"). Si coinciden varias intenciones gana la de
+mayor prioridad; a igual prioridad, la que aparece antes y la frase más
+larga.
+"""
+import re
+from collections import deque
+
+# Minúsculas sin tildes ni diéresis; cada carácter se sustituye por uno, así
+# que las posiciones del texto normalizado valen para el original
+_SIN_ACENTOS = str.maketrans("áéíóúüàèìòù", "aeiouuaeiou")
+_PALABRA = re.compile(r"\w+")
+
+# Dónde puede aparecer la frase de una intención
+CUALQUIERA = "cualquiera"
+INICIO = "inicio"  # Al principio del comando
+COMPLETA = "completa"  # El comando entero
+
+
+def normalizar(texto):
+    """Minúsculas sin acentos (misma longitud que texto.lower())"""
+    return texto.lower().translate(_SIN_ACENTOS)
+
+
+class Intencion:
+    """Una intención y las frases que la activan"""
+
+    __slots__ = ("nombre", "frases", "prioridad", "posicion")
+
+    def __init__(self, nombre, frases, prioridad=0, posicion=CUALQUIERA):
+        self.nombre = nombre
+        self.frases = frases
+        self.prioridad = prioridad
+        self.posicion = posicion
+
+
+class Coincidencia:
+    """Intención reconocida y posición de la frase en el comando"""
+
+    __slots__ = ("nombre", "texto", "inicio", "fin")
+
+    def __init__(self, nombre, texto, inicio, fin):
+        self.nombre = nombre
+        self.texto = texto  # Comando en minúsculas
+        self.inicio = inicio
+        self.fin = fin
+
+    @property
+    def resto(self):
+        """Lo que sigue a la frase reconocida (p. ej. el término de una búsqueda)"""
+        return self.texto[self.fin:].strip(" ,.:;¿?¡!")
+
+    def sin_frase(self):
+        """El comando sin la frase reconocida"""
+        return " ".join(f"{self.texto[:self.inicio]} {self.texto[self.fin:]}".split()).strip(" ,.:;¿?¡!")
+
+
+class ReconocedorIntenciones:
+    """Autómata Aho-Corasick sobre palabras compilado a partir de una tabla de intenciones"""
+
+    def __init__(self, intenciones):
+        self._hijos = [{}]
+        self._fallo = [0]
+        self._salidas = [[]]  # nodo -> [(intencion, palabras de la frase)]
+
+        for intencion in intenciones:
+            for frase in intencion.frases:
+                palabras = _PALABRA.findall(normalizar(frase))
+                if not palabras:
+                    continue
+                nodo = 0
+                for palabra in palabras:
+                    siguiente = self._hijos[nodo].get(palabra)
+                    if siguiente is None:
+                        siguiente = len(self._hijos)
+                        self._hijos.append({})
+                        self._fallo.append(0)
+                        self._salidas.append([])
+                        self._hijos[nodo][palabra] = siguiente
+                    nodo = siguiente
+                self._salidas[nodo].append((intencion, len(palabras)))
+        self._enlazar()
+
+    def _enlazar(self):
+        """Calcula los enlaces de fallo en anchura y hereda las salidas de los sufijos"""
+        cola = deque(self._hijos[0].values())
+        while cola:
+            nodo = cola.popleft()
+            for palabra, hijo in self._hijos[nodo].items():
+                fallo = self._fallo[nodo]
+                while fallo and palabra not in self._hijos[fallo]:
+                    fallo = self._fallo[fallo]
+                destino = self._hijos[fallo].get(palabra, 0)
+                self._fallo[hijo] = destino if destino != hijo else 0
+                self._salidas[hijo] = self._salidas[hijo] + self._salidas[self._fallo[hijo]]
+                cola.append(hijo)
+
+    def reconocer(self, texto):
+        """Devuelve la Coincidencia de mayor prioridad en el texto, o None"""
+        minusculas = texto.lower().strip()
+        palabras = list(_PALABRA.finditer(minusculas.translate(_SIN_ACENTOS)))
+        hijos, fallo, salidas = self._hijos, self._fallo, self._salidas
+
+        mejor = None
+        mejor_orden = None
+        nodo = 0
+        for i, palabra in enumerate(palabras):
+            clave = palabra.group()
+            while nodo and clave not in hijos[nodo]:
+                nodo = fallo[nodo]
+            nodo = hijos[nodo].get(clave, 0)
+
+            for intencion, largo in salidas[nodo]:
+                primera = i - largo + 1
+                if intencion.posicion != CUALQUIERA:
+                    if primera != 0 or (intencion.posicion == COMPLETA and i != len(palabras) - 1):
+                        continue
+                orden = (intencion.prioridad, -primera, largo)
+                if mejor_orden is None or orden > mejor_orden:
+                    mejor_orden = orden
+                    mejor = (intencion.nombre, palabras[primera].start(), palabra.end())
+
+        if mejor is None:
+            return None
+        nombre, inicio, fin = mejor
+        return Coincidencia(nombre, minusculas, inicio, fin)
@@ -0,0 +1,661 @@
+import tkinter as tk
+from tkinter import ttk, scrolledtext, messagebox, simpledialog
+import datetime
+import threading
+import math
+import time
+from collections import deque
+
+from asistente_con_ia import AsistenteVirtualIA, SPEECH_AVAILABLE, TTS_AVAILABLE
+from trabajos_ia import ColaTrabajos
+from transcripcion_tk import EscritorHistorial
+from animacion_tk import PlanificadorAnimacion
+
+# Cada cuánto mira la interfaz si los trabajadores han producido algo
+INTERVALO_SONDEO_MS = 40
+# Unidades de tiempo de la animación por segundo (antes 0,1 por fotograma de 60 ms)
+VELOCIDAD_ANIMACION = 0.1 / 0.06
+
+class InterfazAsistenteIA(tk.Tk):
+    def __init__(self, asistente):
+        super().__init__()
+        self.asistente = asistente
+        self.title("🧠 Asistente Virtual con IA")
+        self.geometry("1000x800")
+        self.configure(bg="#0f1923")
+        self.resizable(True, True)
+        
+        # Variables de estado
+        self.hablando = False
+        self.escuchando = False
+        self.pensando = False
+        self.tiempo_animacion = 0
+        self.respuesta_en_curso = None  # Texto recibido de la respuesta en streaming
+        
+        # Los comandos se procesan en un hilo trabajador; los turnos se
+        # muestran en el orden en que se enviaron. Todos comparten la
+        # conversación principal, así que van de uno en uno: cada turno sale
+        # con el anterior ya en el contexto y se guarda en el registro en orden
+        self.trabajos = ColaTrabajos(max_concurrentes=1)
+        self.turnos = deque()
+        self.bloques_turnos = {}  # Número de trabajo -> marca de su bloque en el historial
+        self.fragmentos_mostrados = 0  # Del turno que se está mostrando
+        self._sondeo = None
+        
+        self.crear_widgets()
+        self.after(1000, self.saludo_inicial)
+        
+        # Si config.json se edita a mano, refrescar el estado sin reiniciar
+        self.asistente.conector_ia.configuracion.suscribir(
+            lambda _: self.after(0, self.actualizar_estado_ia))
+
+    def crear_widgets(self):
+        # Frame principal
+        main_frame = tk.Frame(self, bg="#0f1923")
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        # Título
+        titulo = tk.Label(
+            main_frame, 
+            text="🧠 Jarvis AI - Asistente Inteligente", 
+            font=("Arial", 20, "bold"), 
+            fg="#00bfff", 
+            bg="#0f1923"
+        )
+        titulo.pack(pady=10)
+        
+        # Canvas para animación
+        self.canvas = tk.Canvas(
+            main_frame, 
+            height=120, 
+            bg="#0f1923", 
+            highlightthickness=0
+        )
+        self.canvas.pack(fill=tk.X, pady=10)
+        self.crear_figuras_animacion()
+        
+        # Frame de configuración
+        config_frame = tk.Frame(main_frame, bg="#0f1923")
+        config_frame.pack(fill=tk.X, pady=5)
+        
+        tk.Button(
+            config_frame,
+            text="⚙️ Configurar IA",
+            command=self.configurar_ia,
+            font=("Arial", 9, "bold"),
+            bg="#4a4a4a",
+            fg="#ffffff",
+            relief=tk.RAISED,
+            bd=2
+        ).pack(side=tk.LEFT, padx=5)
+        
+        # Indicador de estado de IA
+        self.estado_ia_var = tk.StringVar()
+        self.actualizar_estado_ia()
+        tk.Label(
+            config_frame,
+            textvariable=self.estado_ia_var,
+            font=("Arial", 9),
+            fg="#00ff00",
+            bg="#0f1923"
+        ).pack(side=tk.LEFT, padx=10)
+        
+        # Frame de entrada
+        entrada_frame = tk.Frame(main_frame, bg="#0f1923")
+        entrada_frame.pack(fill=tk.X, pady=10)
+        
+        tk.Label(
+            entrada_frame, 
+            text="💬 Pregúntame cualquier cosa:", 
+            font=("Arial", 10, "bold"), 
+            fg="#00bfff", 
+            bg="#0f1923"
+        ).pack(anchor=tk.W)
+        
+        input_frame = tk.Frame(entrada_frame, bg="#0f1923")
+        input_frame.pack(fill=tk.X, pady=5)
+        
+        self.entrada_texto = tk.Entry(
+            input_frame,
+            font=("Arial", 12),
+            bg="#1a2634",
+            fg="#ffffff",
+            insertbackground="#00bfff",
+            relief=tk.FLAT,
+            bd=5
+        )
+        self.entrada_texto.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 5))
+        self.entrada_texto.bind("<Return>", self.procesar_texto)
+        
+        tk.Button(
+            input_frame,
+            text="🚀 Enviar",
+            command=self.procesar_texto,
+            font=("Arial", 10, "bold"),
+            bg="#00364e",
+            fg="#ffffff",
+            activebackground="#005577",
+            relief=tk.RAISED,
+            bd=2
+        ).pack(side=tk.RIGHT)
+        
+        # Historial
+        historial_frame = tk.Frame(main_frame, bg="#0f1923")
+        historial_frame.pack(fill=tk.BOTH, expand=True, pady=10)
+        
+        tk.Label(
+            historial_frame, 
+            text="🗨️ Conversación:", 
+            font=("Arial", 12, "bold"), 
+            fg="#00bfff", 
+            bg="#0f1923"
+        ).pack(anchor=tk.W)
+        
+        self.historial = scrolledtext.ScrolledText(
+            historial_frame,
+            font=("Consolas", 10),
+            bg="#1a2634",
+            fg="#ffffff",
+            insertbackground="#00bfff",
+            wrap=tk.WORD,
+            relief=tk.FLAT,
+            bd=5
+        )
+        self.historial.pack(fill=tk.BOTH, expand=True, pady=5)
+        # El widget solo guarda lo reciente; lo anterior se lee del registro al subir
+        registro = self.asistente.conector_ia.registro
+        self.escritor = EscritorHistorial(
+            self.historial,
+            cargar_anteriores=self.cargar_turnos_registro if registro else None,
+            anteriores=self.turnos_guardados())
+        
+        # Controles
+        controles_frame = tk.Frame(main_frame, bg="#0f1923")
+        controles_frame.pack(fill=tk.X, pady=10)
+        
+        self.estado_var = tk.StringVar(value="✅ Listo para conversar")
+        tk.Label(
+            controles_frame,
+            textvariable=self.estado_var,
+            font=("Arial", 10),
+            fg="#00ff00",
+            bg="#0f1923"
+        ).pack(side=tk.LEFT)
+        
+        # Botones (el micrófono se abre en segundo plano: el botón se
+        # habilita cuando esté listo)
+        if SPEECH_AVAILABLE:
+            self.boton_escuchar = tk.Button(
+                controles_frame,
+                text="🎤 Preparando...",
+                command=self.iniciar_escucha,
+                state=tk.DISABLED,
+                font=("Arial", 10, "bold"),
+                bg="#00364e",
+                fg="#ffffff",
+                relief=tk.RAISED,
+                bd=2,
+                padx=15
+            )
+            self.boton_escuchar.pack(side=tk.RIGHT, padx=5)
+        
+        self.boton_cancelar = tk.Button(
+            controles_frame,
+            text="⏹️ Cancelar",
+            command=self.cancelar_turnos,
+            state=tk.DISABLED,
+            font=("Arial", 10, "bold"),
+            bg="#6b2a2a",
+            fg="#ffffff",
+            relief=tk.RAISED,
+            bd=2,
+            padx=15
+        )
+        self.boton_cancelar.pack(side=tk.RIGHT, padx=5)
+        self.bind("<Escape>", lambda _: self.cancelar_turnos())
+        
+        tk.Button(
+            controles_frame,
+            text="🗑️ Limpiar",
+            command=self.limpiar_historial,
+            font=("Arial", 10, "bold"),
+            bg="#4a4a4a",
+            fg="#ffffff",
+            relief=tk.RAISED,
+            bd=2,
+            padx=15
+        ).pack(side=tk.RIGHT, padx=5)
+        
+        # A toda velocidad solo mientras el asistente hace algo y la ventana tiene el foco
+        self.animacion = PlanificadorAnimacion(
+            self, self.dibujar_animacion,
+            lambda: self.pensando or self.hablando or self.escuchando,
+            intervalo_ms=60)
+        self.animacion.iniciar()
+        self.asistente.diagnosticos_extra.append(self.animacion.resumen)
+        
+        self.asistente.cuando_voz_lista(lambda: self.after(0, self.voz_preparada))
+
+    def voz_preparada(self):
+        """Habilita el micrófono cuando termina de abrirse, o quita el botón si no hay"""
+        if not hasattr(self, 'boton_escuchar'):
+            return
+        if self.asistente.reconocedor:
+            self.boton_escuchar.config(state=tk.NORMAL, text="🎤 Escuchar")
+        else:
+            self.boton_escuchar.destroy()
+            del self.boton_escuchar
+
+    def actualizar_estado_ia(self):
+        """Actualiza el indicador de estado de la IA"""
+        servicio = self.asistente.conector_ia.servicio_activo()
+        if servicio == "openai":
+            self.estado_ia_var.set("🟢 OpenAI conectado")
+        elif servicio == "gemini":
+            self.estado_ia_var.set("🟢 Gemini conectado")
+        else:
+            self.estado_ia_var.set("🟡 IA gratuita activa")
+
+    def configurar_ia(self):
+        """Ventana para configurar APIs de IA"""
+        config_window = tk.Toplevel(self)
+        config_window.title("⚙️ Configuración de IA")
+        config_window.geometry("400x300")
+        config_window.configure(bg="#0f1923")
+        config_window.transient(self)
+        config_window.grab_set()
+        
+        tk.Label(
+            config_window,
+            text="🔑 Configurar APIs de IA",
+            font=("Arial", 14, "bold"),
+            fg="#00bfff",
+            bg="#0f1923"
+        ).pack(pady=10)
+        
+        # OpenAI
+        openai_frame = tk.LabelFrame(
+            config_window,
+            text="OpenAI (ChatGPT)",
+            font=("Arial", 10, "bold"),
+            fg="#ffffff",
+            bg="#0f1923"
+        )
+        openai_frame.pack(fill=tk.X, padx=20, pady=10)
+        
+        openai_entry = tk.Entry(openai_frame, show="*", width=40)
+        openai_entry.pack(pady=5)
+        
+        tk.Button(
+            openai_frame,
+            text="Configurar OpenAI",
+            command=lambda: self.guardar_api_key("openai", openai_entry.get(), config_window),
+            bg="#00364e",
+            fg="#ffffff"
+        ).pack(pady=5)
+        
+        # Gemini
+        gemini_frame = tk.LabelFrame(
+            config_window,
+            text="Google Gemini",
+            font=("Arial", 10, "bold"),
+            fg="#ffffff",
+            bg="#0f1923"
+        )
+        gemini_frame.pack(fill=tk.X, padx=20, pady=10)
+        
+        gemini_entry = tk.Entry(gemini_frame, show="*", width=40)
+        gemini_entry.pack(pady=5)
+        
+        tk.Button(
+            gemini_frame,
+            text="Configurar Gemini",
+            command=lambda: self.guardar_api_key("gemini", gemini_entry.get(), config_window),
+            bg="#00364e",
+            fg="#ffffff"
+        ).pack(pady=5)
+        
+        # Información
+        info_text = """
+💡 Información:
+• OpenAI: Obtén tu API key en platform.openai.com
+• Gemini: Obtén tu API key en makersuite.google.com
+• Sin configurar: Usará IA gratuita (limitada)
+        """
+        
+        tk.Label(
+            config_window,
+            text=info_text,
+            font=("Arial", 8),
+            fg="#cccccc",
+            bg="#0f1923",
+            justify=tk.LEFT
+        ).pack(pady=10)
+
+    def guardar_api_key(self, servicio, api_key, ventana):
+        """Guarda una API key"""
+        if api_key.strip():
+            self.asistente.conector_ia.configurar_api_key(servicio, api_key.strip())
+            self.actualizar_estado_ia()
+            messagebox.showinfo("✅ Éxito", f"API key de {servicio} configurada correctamente")
+            ventana.destroy()
+        else:
+            messagebox.showerror("❌ Error", "Por favor ingresa una API key válida")
+
+    def crear_figuras_animacion(self):
+        """Crea una vez los óvalos de la animación; cada fotograma solo los mueve"""
+        self.circulo_animacion = self.canvas.create_oval(0, 0, 0, 0, width=3)
+        self.ondas_animacion = []
+        for i in range(5):
+            intensidad = max(0.1, 1 - (i * 0.2))
+            self.ondas_animacion.append(
+                self.canvas.create_oval(0, 0, 0, 0, width=max(1, int(2 * intensidad)), state=tk.HIDDEN))
+        self.ondas_visibles = [False] * len(self.ondas_animacion)
+        self.color_animacion = None
+        self.inicio_animacion = time.monotonic()
+
+    def dibujar_animacion(self):
+        """Dibuja un fotograma de la animación del canvas"""
+        ancho = self.canvas.winfo_width()
+        alto = self.canvas.winfo_height()
+        if ancho <= 1 or alto <= 1:
+            return
+        
+        centro_x = ancho // 2
+        centro_y = alto // 2
+        # Basado en el reloj para que la velocidad no dependa de los fps
+        self.tiempo_animacion = (time.monotonic() - self.inicio_animacion) * VELOCIDAD_ANIMACION
+        
+        # Color según estado
+        if self.pensando:
+            color = "#ff6b6b"  # Rojo cuando piensa
+        elif self.hablando:
+            color = "#ffa500"  # Naranja cuando habla
+        elif self.escuchando:
+            color = "#4ecdc4"  # Verde cuando escucha
+        else:
+            color = "#00bfff"  # Azul normal
+        if color != self.color_animacion:
+            self.color_animacion = color
+            for figura in [self.circulo_animacion] + self.ondas_animacion:
+                self.canvas.itemconfig(figura, outline=color)
+        
+        # Círculo principal con pulso
+        radio = 25 + math.sin(self.tiempo_animacion * 3) * 5
+        self.canvas.coords(self.circulo_animacion,
+                           centro_x - radio, centro_y - radio, centro_x + radio, centro_y + radio)
+        
+        # Ondas cerebrales cuando piensa
+        for i, onda in enumerate(self.ondas_animacion):
+            onda_radio = radio + 10 + (i * 8) + (self.tiempo_animacion * 15) % 40
+            visible = self.pensando and onda_radio < ancho // 2
+            if visible:
+                self.canvas.coords(onda, centro_x - onda_radio, centro_y - onda_radio,
+                                   centro_x + onda_radio, centro_y + onda_radio)
+            if visible != self.ondas_visibles[i]:
+                self.ondas_visibles[i] = visible
+                self.canvas.itemconfig(onda, state=tk.NORMAL if visible else tk.HIDDEN)
+
+    def agregar_al_historial(self, mensaje, tipo="info"):
+        """Agrega mensaje al historial; para los del usuario devuelve la marca del bloque del turno"""
+        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+        
+        if tipo == "usuario":
+            prefijo = "👤"
+        elif tipo == "asistente":
+            prefijo = "🧠"
+        elif tipo == "error":
+            prefijo = "❌"
+        else:
+            prefijo = "ℹ️"
+        
+        bloque = None
+        if tipo == "usuario":
+            # Un turno nuevo: punto por el que se puede recortar el historial.
+            # Su número en el registro se sabe cuando termina (atender_turnos)
+            bloque = self.escritor.marcar_bloque()
+        self.escritor.escribir(f"[{timestamp}] {prefijo} {mensaje}\n\n")
+        return bloque
+
+    def turnos_guardados(self):
+        """Número de turnos en el registro en disco (0 si no hay registro)"""
+        registro = self.asistente.conector_ia.registro
+        return registro.total if registro else 0
+
+    def cargar_turnos_registro(self, desde, hasta):
+        """Texto de los turnos [desde, hasta) del registro, con el formato del historial"""
+        bloques = []
+        for entrada in self.asistente.conector_ia.registro.leer(desde, hasta):
+            fecha = entrada["timestamp"][:19].replace("T", " ")
+            bloques.append(f"[{fecha}] 👤 {entrada['pregunta']}\n\n[{fecha}] 🧠 {entrada['respuesta']}\n\n")
+        return bloques
+
+    def saludo_inicial(self):
+        """Saludo inicial"""
+        mensaje = "¡Hola! Soy Jarvis AI, tu asistente inteligente. Puedo responder cualquier pregunta y mantener conversaciones naturales. ¿En qué puedo ayudarte?"
+        self.agregar_al_historial(mensaje, "asistente")
+        
+        # hablar() espera a que el motor de voz termine de abrirse
+        if TTS_AVAILABLE:
+            threading.Thread(target=lambda: self.asistente.hablar(mensaje), daemon=True).start()
+
+    def agregar_fragmento(self, fragmento):
+        """Agrega un fragmento de la respuesta en curso al historial"""
+        if self.respuesta_en_curso is None:
+            timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+            self.escritor.escribir(f"[{timestamp}] 🧠 ")
+            self.respuesta_en_curso = ""
+        
+        self.respuesta_en_curso += fragmento
+        self.escritor.escribir(fragmento)
+
+    def finalizar_respuesta(self, respuesta):
+        """Cierra la respuesta en streaming o la muestra completa si no hubo fragmentos"""
+        recibido = self.respuesta_en_curso
+        self.respuesta_en_curso = None
+        
+        if recibido is None:
+            self.agregar_al_historial(respuesta, "asistente")
+            return
+        
+        self.escritor.escribir("\n\n")
+        if respuesta != recibido:
+            # El stream se cortó: mostrar el error tras el texto parcial
+            self.agregar_al_historial(respuesta, "error")
+
+    def procesar_texto(self, event=None):
+        """Procesa texto ingresado"""
+        texto = self.entrada_texto.get().strip()
+        if not texto:
+            return
+        
+        self.entrada_texto.delete(0, tk.END)
+        bloque = self.agregar_al_historial(texto, "usuario")
+        self.enviar_turno(texto, bloque)
+
+    def enviar_turno(self, comando, bloque=None):
+        """Encola el comando para un hilo trabajador sin bloquear la interfaz"""
+        trabajo = self.trabajos.enviar(self.asistente.procesar_turno, comando)
+        if trabajo is None:
+            self.escritor.numerar_bloque(bloque, None)
+            self.agregar_al_historial("Hay demasiadas peticiones en curso, espera a que terminen", "error")
+            return
+        
+        self.turnos.append(trabajo)
+        self.bloques_turnos[trabajo.numero] = bloque
+        self.actualizar_estado_turnos()
+        if self._sondeo is None:
+            self._sondeo = self.after(INTERVALO_SONDEO_MS, self.atender_turnos)
+
+    def atender_turnos(self):
+        """Muestra lo que han producido los trabajadores; se repite con after() mientras haya turnos"""
+        self._sondeo = None
+        while self.turnos:
+            trabajo = self.turnos[0]
+            if trabajo.caducado:
+                self.turnos.popleft()
+                self.escritor.numerar_bloque(self.bloques_turnos.pop(trabajo.numero, None), None)
+                self.agregar_al_historial("⌛ Petición descartada: esperó demasiado en la cola", "info")
+                continue
+            
+            # Leer terminado antes que los fragmentos: el trabajador añade
+            # todos los fragmentos antes de marcarse como terminado
+            terminado = trabajo.terminado.is_set()
+            nuevos = trabajo.fragmentos[self.fragmentos_mostrados:]
+            if nuevos:
+                self.fragmentos_mostrados += len(nuevos)
+                self.agregar_fragmento("".join(nuevos))
+            if not terminado:
+                break
+            
+            self.turnos.popleft()
+            self.fragmentos_mostrados = 0
+            bloque = self.bloques_turnos.pop(trabajo.numero, None)
+            if trabajo.error is not None:
+                self.escritor.numerar_bloque(bloque, None)
+                self.finalizar_respuesta(f"❌ Error procesando el comando: {trabajo.error}")
+            else:
+                respuesta, numero = trabajo.resultado
+                self.escritor.numerar_bloque(bloque, numero)
+                self.finalizar_respuesta(respuesta)
+                self.hablar_en_segundo_plano(respuesta)
+        
+        self.actualizar_estado_turnos()
+        if self.turnos:
+            self._sondeo = self.after(INTERVALO_SONDEO_MS, self.atender_turnos)
+
+    def cancelar_turnos(self):
+        """Cancela las respuestas pendientes y descarta lo que llegue de ellas"""
+        if not self.turnos:
+            return
+        cancelados = len(self.turnos)
+        for trabajo in self.turnos:
+            trabajo.cancelar()
+            self.escritor.numerar_bloque(self.bloques_turnos.pop(trabajo.numero, None), None)
+        self.turnos.clear()
+        self.fragmentos_mostrados = 0
+        if self.respuesta_en_curso is not None:
+            self.respuesta_en_curso = None
+            self.escritor.escribir("\n\n")
+        self.agregar_al_historial(
+            "⏹️ Respuesta cancelada" if cancelados == 1 else f"⏹️ {cancelados} respuestas canceladas", "info")
+        self.actualizar_estado_turnos()
+
+    def actualizar_estado_turnos(self):
+        """Refleja en la interfaz si hay respuestas en camino"""
+        self.pensando = bool(self.turnos)
+        if self.pensando:
+            self.animacion.despertar()
+        self.boton_cancelar.config(state=tk.NORMAL if self.turnos else tk.DISABLED)
+        if self.escuchando:
+            return
+        if len(self.turnos) > 1:
+            self.estado_var.set(f"🧠 Pensando... ({len(self.turnos)} en cola)")
+        elif self.turnos:
+            self.estado_var.set("🧠 Pensando...")
+        else:
+            self.estado_var.set("✅ Listo para conversar")
+
+    def hablar_en_segundo_plano(self, respuesta):
+        """Lee la respuesta en voz alta si hay motor de voz"""
+        if TTS_AVAILABLE and self.asistente.motor_voz:
+            self.hablando = True
+            self.animacion.despertar()
+            threading.Thread(target=self.hablar_respuesta, args=(respuesta,), daemon=True).start()
+
+    def hablar_respuesta(self, respuesta):
+        """Habla la respuesta en un hilo separado"""
+        try:
+            self.asistente.hablar(respuesta)
+        finally:
+            self.hablando = False
+
+    def iniciar_escucha(self):
+        """Inicia el proceso de escucha por voz"""
+        if self.escuchando or not hasattr(self, 'boton_escuchar'):
+            return
+        
+        self.escuchando = True
+        self.animacion.despertar()
+        self.boton_escuchar.config(state=tk.DISABLED, text="🎤 Escuchando...")
+        self.estado_var.set("🎤 Escuchando... Habla ahora")
+        threading.Thread(target=self.procesar_voz, daemon=True).start()
+
+    def procesar_voz(self):
+        """Procesa el comando de voz"""
+        try:
+            comando = self.asistente.escuchar()
+            
+            # El comando se procesa en la cola de trabajos, desde el hilo principal
+            self.after(0, self.recibir_comando_voz, comando)
+            
+        except Exception as e:
+            error_msg = f"Error procesando voz: {str(e)}"
+            self.after(0, lambda: self.agregar_al_historial(error_msg, "error"))
+        
+        finally:
+            self.after(0, self.restaurar_estado_voz)
+
+    def recibir_comando_voz(self, comando):
+        """Muestra el comando reconocido y lo encola si no es un error"""
+        bloque = self.agregar_al_historial(comando, "usuario")
+        if not any(error in comando for error in ["❌", "⏰", "Tiempo de espera"]):
+            self.enviar_turno(comando, bloque)
+        else:
+            self.escritor.numerar_bloque(bloque, None)
+
+    def restaurar_estado_voz(self):
+        """Restaura el estado después de escuchar"""
+        self.escuchando = False
+        self.actualizar_estado_turnos()
+        if hasattr(self, 'boton_escuchar'):
+            self.boton_escuchar.config(state=tk.NORMAL, text="🎤 Escuchar")
+
+    def limpiar_historial(self):
+        """Limpia el historial de conversación"""
+        # Las respuestas pendientes ya no tienen dónde mostrarse
+        for trabajo in self.turnos:
+            trabajo.cancelar()
+        self.turnos.clear()
+        self.bloques_turnos.clear()
+        self.fragmentos_mostrados = 0
+        self.actualizar_estado_turnos()
+        self.escritor.borrar(anteriores=self.turnos_guardados())
+        self.respuesta_en_curso = None
+        self.agregar_al_historial("Historial limpiado", "info")
+
+    def on_closing(self):
+        """Maneja el cierre de la aplicación"""
+        self.animacion.detener()
+        print(self.animacion.resumen())
+        self.trabajos.cerrar()
+        try:
+            if self.asistente.motor_voz:
+                self.asistente.motor_voz.stop()
+        except:
+            pass
+        if self.asistente.calibrador:
+            self.asistente.calibrador.cerrar()
+        self.asistente.conector_ia.cerrar()
+        self.destroy()
+
+def main():
+    """Función principal"""
+    print("🚀 Iniciando Asistente Virtual con IA...")
+    
+    try:
+        asistente = AsistenteVirtualIA("Jarvis")
+        app = InterfazAsistenteIA(asistente)
+        app.protocol("WM_DELETE_WINDOW", app.on_closing)
+        
+        print("✅ Interfaz iniciada correctamente")
+        print("💡 Escribe tu pregunta o usa el botón de micrófono (si está disponible)")
+        
+        app.mainloop()
+        
+    except Exception as e:
+        print(f"❌ Error crítico: {e}")
+        messagebox.showerror("Error", f"Error iniciando la aplicación:\n{str(e)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import email.utils
+import random
+import re
+import threading
+import time
+
+# Capacidad (ráfaga) y recarga por segundo por defecto de cada proveedor.
+# (None, None) es sin límite propio: los planes de pago admiten mucho más
+# de lo que se podría fijar aquí, así que solo se frena cuando el proveedor
+# anuncia su límite (cabeceras x-ratelimit-*, que Gemini no envía) o
+# responde 429 con Retry-After
+LIMITES_POR_DEFECTO = {
+    "openai": (None, None),
+    "gemini": (None, None),
+    "huggingface": (5, 0.5),
+}
+
+# Códigos que indican saturación y merecen reintento
+CODIGOS_REINTENTABLES = (429, 503)
+
+_DURACION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+
+
+def parsear_duracion(texto):
+    """Convierte duraciones como '1s', '6m0s' o '20ms' (cabeceras de OpenAI) a segundos"""
+    if not texto:
+        return None
+    unidades = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    partes = _DURACION.findall(texto)
+    if not partes:
+        return None
+    return sum(float(valor) * unidades[unidad] for valor, unidad in partes)
+
+
+def parsear_retry_after(valor):
+    """Devuelve los segundos de una cabecera Retry-After (número o fecha HTTP)"""
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        fecha = email.utils.parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, fecha.timestamp() - time.time())
+
+
+class CuboTokens:
+    """Cubo de tokens: permite ráfagas de `capacidad` peticiones y recarga a ritmo constante
+
+    Con capacidad None no limita nada hasta que ajustar() recibe un límite;
+    bloquear() funciona igual.
+    """
+
+    def __init__(self, capacidad, recarga):
+        self.capacidad = capacidad
+        self.recarga = recarga
+        self.tokens = float("inf") if capacidad is None else float(capacidad)
+        self.bloqueado_hasta = 0.0
+        self._ultimo = time.monotonic()
+        self._condicion = threading.Condition()
+
+    def _recargar(self, ahora):
+        """Suma los tokens acumulados desde la última consulta (requiere el lock)"""
+        if self.capacidad is not None:
+            self.tokens = min(self.capacidad, self.tokens + (ahora - self._ultimo) * self.recarga)
+        self._ultimo = ahora
+
+    def adquirir(self, limite):
+        """Espera un token hasta el instante `limite` (time.monotonic); devuelve False si no llega"""
+        with self._condicion:
+            while True:
+                ahora = time.monotonic()
+                self._recargar(ahora)
+                if ahora >= self.bloqueado_hasta and self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+
+                espera = self.bloqueado_hasta - ahora
+                if self.tokens < 1:
+                    espera = max(espera, (1 - self.tokens) / self.recarga)
+                if ahora + espera > limite:
+                    return False
+                self._condicion.wait(espera)
+
+    def bloquear(self, segundos):
+        """Impide nuevas peticiones durante unos segundos (p. ej. tras un 429)"""
+        with self._condicion:
+            self.bloqueado_hasta = max(self.bloqueado_hasta, time.monotonic() + segundos)
+
+    def ajustar(self, limite_por_minuto=None, restantes=None):
+        """Ajusta el cubo a los límites que anuncia el proveedor"""
+        with self._condicion:
+            self._recargar(time.monotonic())
+            if limite_por_minuto:
+                if self.capacidad is None:
+                    # Primer límite anunciado: ráfaga de un minuto, recortada por `restantes`
+                    self.capacidad = self.tokens = float(limite_por_minuto)
+                self.recarga = limite_por_minuto / 60.0
+            if restantes is not None:
+                self.tokens = min(self.tokens, float(restantes))
+
+
+class LimitadorIA:
+    """Limitación de ritmo por proveedor y cálculo de esperas para reintentos"""
+
+    def __init__(self, limites=None, espera_base=0.5, espera_maxima=20.0, max_reintentos=4):
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.max_reintentos = max_reintentos
+        self._cubos = {servicio: CuboTokens(capacidad, recarga)
+                       for servicio, (capacidad, recarga) in (limites or LIMITES_POR_DEFECTO).items()}
+        self.reintentos = {servicio: 0 for servicio in self._cubos}
+        self.rechazos = {servicio: 0 for servicio in self._cubos}
+
+    def adquirir(self, servicio, limite):
+        """Espera turno para una petición al servicio antes del instante `limite`"""
+        cubo = self._cubos.get(servicio)
+        return cubo is None or cubo.adquirir(limite)
+
+    def registrar_cabeceras(self, servicio, cabeceras):
+        """Aplica las cabeceras x-ratelimit-* de la respuesta al cubo del servicio"""
+        cubo = self._cubos.get(servicio)
+        if cubo is None:
+            return
+
+        try:
+            limite = int(cabeceras.get("x-ratelimit-limit-requests", 0)) or None
+            restantes = cabeceras.get("x-ratelimit-remaining-requests")
+            restantes = int(restantes) if restantes is not None else None
+        except ValueError:
+            return
+        cubo.ajustar(limite, restantes)
+
+        # Sin peticiones o tokens restantes: esperar a que se renueve la ventana
+        for recurso in ("requests", "tokens"):
+            if cabeceras.get(f"x-ratelimit-remaining-{recurso}") == "0":
+                reinicio = parsear_duracion(cabeceras.get(f"x-ratelimit-reset-{recurso}"))
+                if reinicio:
+                    cubo.bloquear(reinicio)
+
+    def espera_reintento(self, servicio, intento, cabeceras):
+        """Segundos a esperar antes del reintento `intento` (backoff exponencial con jitter)
+
+        Si el servidor envía Retry-After se respeta como mínimo y se bloquea el
+        cubo del servicio para que las demás peticiones también esperen.
+        """
+        exponencial = min(self.espera_maxima, self.espera_base * (2 ** intento))
+        espera = random.uniform(exponencial / 2, exponencial)
+        retry_after = parsear_retry_after(cabeceras.get("retry-after"))
+        if retry_after is not None:
+            espera = max(espera, retry_after)
+            cubo = self._cubos.get(servicio)
+            if cubo:
+                cubo.bloquear(retry_after)
+        if servicio in self.reintentos:
+            self.reintentos[servicio] += 1
+        return espera
+
+    def registrar_rechazo(self, servicio):
+        """Cuenta una petición que se abandona por agotar el plazo o los reintentos"""
+        if servicio in self.rechazos:
+            self.rechazos[servicio] += 1
+
+    def estadisticas(self):
+        """Devuelve tokens disponibles, reintentos y rechazos por servicio"""
+        ahora = time.monotonic()
+        return {
+            servicio: {
+                "tokens": None if cubo.capacidad is None else round(cubo.tokens, 2),
+                "recarga_por_segundo": cubo.recarga,
+                "bloqueado_durante": max(0.0, cubo.bloqueado_hasta - ahora),
+                "reintentos": self.reintentos[servicio],
+                "rechazos": self.rechazos[servicio]
+            }
+            for servicio, cubo in self._cubos.items()
+        }
@@ -0,0 +1,284 @@
+"""Procesa un archivo de prompts (JSONL o CSV) con ConectorIA sin abrir la interfaz
+
+Cada registro tiene un campo "prompt" y, opcionalmente, "conversacion" e "id".
+Los prompts de una misma conversación se envían en orden y comparten
+historial; conversaciones distintas se procesan en paralelo. Los resultados se
+escriben en JSONL a medida que terminan y, si la ejecución se interrumpe, al
+relanzarla con la misma salida se retoma desde las líneas pendientes. Una
+línea que no es un objeto JSON válido se anota como error y no detiene el lote.
+
+Uso:
+    python lote_ia.py preguntas.jsonl respuestas.jsonl --trabajadores 4
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from asistente_con_ia import ConectorIA, PREFIJOS_ERROR
+from configuracion_ia import ConfiguracionEnMemoria
+
+
+def leer_registros(ruta):
+    """Itera (linea, registro, error) de un archivo JSONL o CSV sin cargarlo entero
+
+    Si una línea no es un objeto JSON, `registro` es None y `error` dice por qué.
+    """
+    with open(ruta, "r", encoding="utf-8", newline="") as f:
+        if ruta.lower().endswith(".csv"):
+            for linea, fila in enumerate(csv.DictReader(f), start=1):
+                yield linea, fila, None
+        else:
+            for linea, texto in enumerate(f, start=1):
+                texto = texto.strip()
+                if not texto:
+                    continue
+                try:
+                    registro = json.loads(texto)
+                except ValueError as e:
+                    yield linea, None, f"JSON no válido: {e}"
+                    continue
+                if isinstance(registro, dict):
+                    yield linea, registro, None
+                else:
+                    yield linea, None, f"Se esperaba un objeto JSON, no {type(registro).__name__}"
+
+
+def cargar_completadas(ruta):
+    """Lee una salida previa y devuelve sus resultados correctos, ordenados por línea
+
+    Si la última línea quedó a medias por una interrupción, se recorta. Si
+    hay resultados con error (que se van a reintentar) o repetidos, el
+    archivo se reescribe solo con los correctos: así cada línea de entrada
+    acaba con un único resultado.
+    """
+    if not os.path.exists(ruta):
+        return []
+
+    with open(ruta, "rb+") as f:
+        contenido = f.read()
+        if contenido and not contenido.endswith(b"\n"):
+            f.truncate(contenido.rfind(b"\n") + 1)
+            contenido = contenido[:contenido.rfind(b"\n") + 1]
+
+    resultados = {}
+    leidos = 0
+    for texto in contenido.decode("utf-8").splitlines():
+        leidos += 1
+        try:
+            resultado = json.loads(texto)
+        except ValueError:
+            continue
+        if not resultado.get("error"):
+            resultados[resultado["linea"]] = resultado
+    completadas = [resultados[linea] for linea in sorted(resultados)]
+    if leidos != len(completadas):
+        reescribir(ruta, completadas)
+    return completadas
+
+
+def reescribir(ruta, resultados):
+    """Sustituye el archivo de salida por `resultados` de forma atómica"""
+    descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(ruta)),
+                                            prefix=".lote-", suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+            for resultado in resultados:
+                f.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+        os.replace(temporal, ruta)
+    except Exception:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+class ProcesadorLote:
+    """Envía registros a ConectorIA con un número acotado de trabajadores
+
+    Se conservan como mucho `max_conversaciones` conversaciones con su
+    historial; al pasarse se olvida la usada hace más tiempo (si vuelve a
+    aparecer, empieza sin historial). Los registros sin conversación usan un
+    conector de un solo uso.
+    """
+
+    def __init__(self, conector, ruta_salida, trabajadores=4, servicio="auto", max_conversaciones=1000):
+        self.conector = conector
+        self.servicio = servicio
+        self.trabajadores = trabajadores
+        self.max_conversaciones = max_conversaciones
+        # id de conversación -> conector con su historial, de la menos a la más usada
+        self.conversaciones = OrderedDict()
+        self.expulsadas = 0
+        self.pendientes = {}  # id de conversación -> registros en espera
+        self.activas = set()
+        self.restauradas = {}  # id de conversación -> turnos previos aún sin pasar al historial
+        self.procesados = 0
+        self.errores = 0
+        self._lock = threading.Lock()
+        # Limita los registros leídos y aún sin procesar
+        self._en_vuelo = threading.BoundedSemaphore(trabajadores * 4)
+        self._ejecutor = ThreadPoolExecutor(max_workers=trabajadores)
+        self._salida = open(ruta_salida, "a", encoding="utf-8")
+
+    def conector_de(self, conversacion):
+        """Devuelve (creándolo si hace falta) el conector de una conversación (requiere el lock)"""
+        conector = self.conversaciones.get(conversacion)
+        if conector is not None:
+            self.conversaciones.move_to_end(conversacion)
+            return conector
+        conector = self.conversaciones[conversacion] = self.conector.nueva_conversacion()
+        if len(self.conversaciones) > self.max_conversaciones:
+            # La menos usada que no tenga un registro en curso
+            for antigua in self.conversaciones:
+                if antigua not in self.activas:
+                    del self.conversaciones[antigua]
+                    self.restauradas.pop(antigua, None)
+                    self.expulsadas += 1
+                    break
+        return conector
+
+    def restaurar(self, completadas):
+        """Guarda los resultados de una salida previa para rehacer el historial
+
+        Cada línea que se reintenta solo ve los turnos de su conversación
+        anteriores a ella: se pasan al historial justo antes de procesarla.
+        """
+        with self._lock:
+            for resultado in completadas:
+                # Las líneas sin conversación no tienen historial que rehacer
+                if resultado["conversacion"] != f"linea-{resultado['linea']}":
+                    self.restauradas.setdefault(resultado["conversacion"], deque()).append(resultado)
+
+    def ponerse_al_dia(self, conector, conversacion, linea):
+        """Pasa al historial los turnos restaurados anteriores a `linea` (requiere el lock)"""
+        previos = self.restauradas.get(conversacion)
+        while previos and previos[0]["linea"] < linea:
+            resultado = previos.popleft()
+            conector.agregar_al_historial(resultado["prompt"], resultado["respuesta"])
+
+    def enviar(self, linea, registro):
+        """Encola un registro; los de una misma conversación se procesan de uno en uno"""
+        self._en_vuelo.acquire()
+        conversacion = str(registro.get("conversacion") or f"linea-{linea}")
+        trabajo = (linea, conversacion, registro)
+        with self._lock:
+            if conversacion in self.activas:
+                self.pendientes.setdefault(conversacion, deque()).append(trabajo)
+                return
+            self.activas.add(conversacion)
+        self._ejecutor.submit(self._procesar, trabajo)
+
+    def _procesar(self, trabajo):
+        """Obtiene la respuesta de un registro, la escribe y lanza el siguiente de su conversación"""
+        linea, conversacion, registro = trabajo
+        try:
+            if registro.get("conversacion"):
+                with self._lock:
+                    conector = self.conector_de(conversacion)
+                    self.ponerse_al_dia(conector, conversacion, linea)
+            else:
+                conector = self.conector.nueva_conversacion()
+            prompt = registro.get("prompt")
+            if not isinstance(prompt, str):
+                prompt = ""
+            inicio = time.monotonic()
+            try:
+                if prompt.strip():
+                    respuesta = conector.obtener_respuesta_ia(
+                        prompt, servicio=registro.get("servicio") or self.servicio)
+                else:
+                    respuesta = "❌ Registro sin prompt"
+            except Exception as e:
+                respuesta = f"❌ Error inesperado: {str(e)}"
+
+            resultado = {
+                "linea": linea,
+                "id": registro.get("id", linea),
+                "conversacion": conversacion,
+                "prompt": prompt,
+                "respuesta": respuesta,
+                "error": respuesta.startswith(PREFIJOS_ERROR),
+                "duracion": round(time.monotonic() - inicio, 3)
+            }
+            self.escribir(resultado)
+        finally:
+            self._en_vuelo.release()
+            with self._lock:
+                cola = self.pendientes.get(conversacion)
+                siguiente = cola.popleft() if cola else None
+                if cola is not None and not cola:
+                    del self.pendientes[conversacion]
+                if siguiente is None:
+                    self.activas.discard(conversacion)
+            if siguiente is not None:
+                self._ejecutor.submit(self._procesar, siguiente)
+
+    def escribir(self, resultado):
+        """Añade un resultado a la salida"""
+        with self._lock:
+            self._salida.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+            self._salida.flush()
+            self.procesados += 1
+            if resultado["error"]:
+                self.errores += 1
+
+    def esperar(self):
+        """Espera a que terminen todos los registros encolados y cierra la salida"""
+        while True:
+            with self._lock:
+                if not self.activas:
+                    break
+            time.sleep(0.05)
+        self._ejecutor.shutdown(wait=True)
+        self._salida.close()
+
+
+def main(argumentos=None):
+    """Punto de entrada del modo lote"""
+    parser = argparse.ArgumentParser(description="Procesa un archivo de prompts con ConectorIA")
+    parser.add_argument("entrada", help="Archivo JSONL o CSV con un campo 'prompt' por registro")
+    parser.add_argument("salida", help="Archivo JSONL de resultados (se reanuda si ya existe)")
+    parser.add_argument("--trabajadores", type=int, default=4, help="Peticiones simultáneas")
+    parser.add_argument("--servicio", default="auto", help="auto, openai, gemini o huggingface")
+    parser.add_argument("--sin-cache", action="store_true", help="No usar la caché de respuestas")
+    args = parser.parse_args(argumentos)
+
+    print("🚀 Iniciando procesamiento por lotes...")
+    # Copia en memoria de la configuración: el lote usa las API keys del
+    # usuario pero no escribe ni vigila su config.json
+    conector = ConectorIA(ruta_cache=None if args.sin_cache else "cache_respuestas.db",
+                          ruta_historial=None, configuracion=ConfiguracionEnMemoria.copia_de())
+    completadas = cargar_completadas(args.salida)
+    hechas = {resultado["linea"] for resultado in completadas}
+    if hechas:
+        print(f"♻️  Reanudando: {len(hechas)} líneas ya completadas")
+
+    procesador = ProcesadorLote(conector, args.salida, args.trabajadores, args.servicio)
+    procesador.restaurar(completadas)
+
+    inicio = time.monotonic()
+    try:
+        for linea, registro, error in leer_registros(args.entrada):
+            if linea in hechas:
+                continue
+            if error:
+                procesador.escribir({"linea": linea, "error": error})
+            else:
+                procesador.enviar(linea, registro)
+    finally:
+        procesador.esperar()
+        conector.cerrar()
+
+    duracion = time.monotonic() - inicio
+    print(f"✅ Procesadas {procesador.procesados} líneas ({procesador.errores} con error) en {duracion:.1f} s")
+    return 1 if procesador.errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+
+from contexto_ia import estimar_tokens
+
+# Límites superiores (segundos) de los buckets de los histogramas
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+FASES = ("espera_cola", "conexion", "primer_byte", "total")
+# Variable de entorno con el archivo al que exportar las métricas en JSON cada minuto
+VARIABLE_EXPORTACION = "ASISTENTE_IA_METRICAS"
+
+# Traza de la llamada en curso en cada hilo
+_local = threading.local()
+
+
+def traza_actual():
+    """Devuelve la traza de la llamada que se está haciendo en este hilo, o None"""
+    return getattr(_local, "traza", None)
+
+
+def textos_json(datos):
+    """Devuelve los textos contenidos en un cuerpo JSON"""
+    if isinstance(datos, str):
+        yield datos
+    elif isinstance(datos, dict):
+        for valor in datos.values():
+            yield from textos_json(valor)
+    elif isinstance(datos, list):
+        for valor in datos:
+            yield from textos_json(valor)
+
+
+class Traza:
+    """Tiempos y tamaños de una llamada a un proveedor"""
+
+    __slots__ = ("servicio", "inicio", "espera_cola", "conexion", "conexiones_nuevas",
+                 "primer_byte", "primer_fragmento", "total", "bytes_enviados",
+                 "bytes_recibidos", "tokens_entrada", "tokens_salida", "reintentos",
+                 "estado_http", "error", "reloj")
+    CAMPOS_EXPORTADOS = __slots__[:-1]
+
+    def __init__(self, servicio):
+        self.servicio = servicio
+        self.inicio = time.time()
+        self.reloj = time.perf_counter()
+        self.espera_cola = 0.0
+        self.conexion = 0.0
+        self.conexiones_nuevas = 0
+        self.primer_byte = None
+        self.primer_fragmento = None
+        self.total = 0.0
+        self.bytes_enviados = 0
+        self.bytes_recibidos = 0
+        self.tokens_entrada = 0
+        self.tokens_salida = 0
+        self.reintentos = 0
+        self.estado_http = None
+        self.error = False
+
+    def registrar_peticion(self, cuerpo_json):
+        """Anota el tamaño y los tokens estimados del cuerpo enviado"""
+        if cuerpo_json is None:
+            return
+        self.bytes_enviados += len(json.dumps(cuerpo_json, ensure_ascii=False).encode("utf-8"))
+        self.tokens_entrada = sum(estimar_tokens(texto) for texto in textos_json(cuerpo_json))
+
+    def transcurrido(self):
+        """Segundos desde el inicio de la llamada"""
+        return time.perf_counter() - self.reloj
+
+    def registrar_respuesta(self, response, inicio_envio, stream=False):
+        """Anota el código, el tiempo hasta las cabeceras y el tamaño de una respuesta HTTP
+
+        Los cuerpos por streaming se cuentan a medida que se leen.
+        """
+        self.estado_http = response.status_code
+        self.primer_byte = (inicio_envio - self.reloj) + response.elapsed.total_seconds()
+        if not stream:
+            self.bytes_recibidos += len(response.content)
+
+    def cerrar(self, respuesta, error):
+        """Completa la traza con el resultado final de la llamada"""
+        self.total = self.transcurrido()
+        self.error = error
+        if not error:
+            self.tokens_salida = estimar_tokens(respuesta)
+
+    def como_dict(self):
+        return {campo: getattr(self, campo) for campo in self.CAMPOS_EXPORTADOS}
+
+
+class Histograma:
+    """Histograma acumulativo al estilo Prometheus"""
+
+    __slots__ = ("cuentas", "suma", "total")
+
+    def __init__(self):
+        self.cuentas = [0] * (len(BUCKETS_SEGUNDOS) + 1)  # El último es +Inf
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        for i, limite in enumerate(BUCKETS_SEGUNDOS):
+            if valor <= limite:
+                self.cuentas[i] += 1
+                break
+        else:
+            self.cuentas[-1] += 1
+        self.suma += valor
+        self.total += 1
+
+    def acumulado(self):
+        """Devuelve [(le, cuenta acumulada)] incluyendo +Inf"""
+        resultado = []
+        acumulado = 0
+        for limite, cuenta in zip(BUCKETS_SEGUNDOS + (float("inf"),), self.cuentas):
+            acumulado += cuenta
+            resultado.append((limite, acumulado))
+        return resultado
+
+
+class MetricasIA:
+    """Recoge las trazas de las llamadas y las agrega por proveedor"""
+
+    def __init__(self, max_trazas=500):
+        self.histogramas = {}  # (servicio, fase) -> Histograma
+        self.contadores = {}  # servicio -> {nombre: valor}
+        self.trazas = deque(maxlen=max_trazas)
+        self._lock = threading.Lock()
+        self._exportador = None
+        self._ruta_exportacion = None
+        self._detener_exportacion = threading.Event()
+
+    def iniciar_traza(self, servicio):
+        """Crea la traza de una llamada y la asocia al hilo actual"""
+        traza = Traza(servicio)
+        _local.traza = traza
+        return traza
+
+    def finalizar_traza(self, traza):
+        """Desasocia la traza del hilo y la agrega a las métricas"""
+        if traza_actual() is traza:
+            _local.traza = None
+
+        with self._lock:
+            self.trazas.append(traza)
+            for fase in FASES:
+                valor = getattr(traza, fase)
+                if valor is not None:
+                    clave = (traza.servicio, fase)
+                    if clave not in self.histogramas:
+                        self.histogramas[clave] = Histograma()
+                    self.histogramas[clave].observar(valor)
+
+            contadores = self.contadores.setdefault(traza.servicio, {
+                "peticiones": 0, "errores": 0, "reintentos": 0, "conexiones_nuevas": 0,
+                "bytes_enviados": 0, "bytes_recibidos": 0, "tokens_entrada": 0, "tokens_salida": 0
+            })
+            contadores["peticiones"] += 1
+            contadores["errores"] += int(traza.error)
+            for nombre in ("reintentos", "conexiones_nuevas", "bytes_enviados", "bytes_recibidos",
+                           "tokens_entrada", "tokens_salida"):
+                contadores[nombre] += getattr(traza, nombre)
+
+    def exportar_prometheus(self):
+        """Devuelve las métricas en formato de texto de Prometheus"""
+        lineas = [
+            "# HELP asistente_ia_duracion_segundos Duración de cada fase de las llamadas a la IA",
+            "# TYPE asistente_ia_duracion_segundos histogram"
+        ]
+        with self._lock:
+            for (servicio, fase), histograma in sorted(self.histogramas.items()):
+                etiquetas = f'servicio="{servicio}",fase="{fase}"'
+                for limite, cuenta in histograma.acumulado():
+                    le = "+Inf" if limite == float("inf") else repr(limite)
+                    lineas.append(f'asistente_ia_duracion_segundos_bucket{{{etiquetas},le="{le}"}} {cuenta}')
+                lineas.append(f"asistente_ia_duracion_segundos_sum{{{etiquetas}}} {histograma.suma:.6f}")
+                lineas.append(f"asistente_ia_duracion_segundos_count{{{etiquetas}}} {histograma.total}")
+
+            nombres = sorted({nombre for contadores in self.contadores.values() for nombre in contadores})
+            for nombre in nombres:
+                lineas.append(f"# TYPE asistente_ia_{nombre}_total counter")
+                for servicio, contadores in sorted(self.contadores.items()):
+                    lineas.append(f'asistente_ia_{nombre}_total{{servicio="{servicio}"}} {contadores[nombre]}')
+        return "\n".join(lineas) + "\n"
+
+    def instantanea(self):
+        """Devuelve contadores, histogramas y trazas recientes como diccionario"""
+        with self._lock:
+            return {
+                "generado": time.time(),
+                "contadores": {servicio: dict(c) for servicio, c in self.contadores.items()},
+                "histogramas": {
+                    f"{servicio}.{fase}": {
+                        "buckets": [[limite if limite != float("inf") else "+Inf", cuenta]
+                                    for limite, cuenta in h.acumulado()],
+                        "suma": h.suma,
+                        "total": h.total
+                    }
+                    for (servicio, fase), h in self.histogramas.items()
+                },
+                "trazas_recientes": [traza.como_dict() for traza in self.trazas]
+            }
+
+    def exportar_json(self, ruta):
+        """Escribe la instantánea en un archivo JSON de forma atómica"""
+        directorio = os.path.dirname(os.path.abspath(ruta))
+        descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+                json.dump(self.instantanea(), f, ensure_ascii=False)
+            os.replace(temporal, ruta)
+        except Exception:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+
+    def iniciar_exportacion(self, ruta, intervalo=60.0):
+        """Reescribe periódicamente el archivo JSON con las métricas más recientes"""
+        if self._exportador is not None:
+            return
+        self._ruta_exportacion = ruta
+
+        def exportar():
+            while not self._detener_exportacion.wait(intervalo):
+                try:
+                    self.exportar_json(ruta)
+                except Exception as e:
+                    print(f"Error exportando métricas: {e}")
+
+        self._exportador = threading.Thread(target=exportar, daemon=True)
+        self._exportador.start()
+
+    def cerrar(self):
+        """Detiene la exportación periódica escribiendo una última vez"""
+        if self._exportador is None:
+            return
+        self._detener_exportacion.set()
+        self._exportador.join()
+        try:
+            self.exportar_json(self._ruta_exportacion)
+        except Exception as e:
+            print(f"Error exportando métricas: {e}")
+
+    def percentiles(self, servicio, fase, ps=(50, 95)):
+        """Percentiles de una fase a partir de las trazas recientes"""
+        with self._lock:
+            valores = sorted(getattr(t, fase) for t in self.trazas
+                             if t.servicio == servicio and getattr(t, fase) is not None)
+        if not valores:
+            return [None for _ in ps]
+        return [valores[min(len(valores) - 1, max(0, round(p / 100 * len(valores)) - 1))] for p in ps]
+
+    def resumen(self):
+        """Texto breve con el estado de cada proveedor para el comando 'diagnóstico'"""
+        with self._lock:
+            contadores = {servicio: dict(c) for servicio, c in self.contadores.items()}
+        if not contadores:
+            return "Aún no se ha hecho ninguna llamada a la IA."
+
+        def ms(valor):
+            return "-" if valor is None else f"{valor * 1000:.0f} ms"
+
+        lineas = []
+        for servicio, c in sorted(contadores.items()):
+            total_p50, total_p95 = self.percentiles(servicio, "total")
+            ttfb_p50, _ = self.percentiles(servicio, "primer_byte")
+            cola_p50, _ = self.percentiles(servicio, "espera_cola")
+            conexion_p50, _ = self.percentiles(servicio, "conexion")
+            lineas.append(
+                f"• {servicio}: {c['peticiones']} llamadas, {c['errores']} errores, "
+                f"{c['reintentos']} reintentos\n"
+                f"   total p50 {ms(total_p50)} / p95 {ms(total_p95)} · primer byte p50 {ms(ttfb_p50)} · "
+                f"cola p50 {ms(cola_p50)} · conexión p50 {ms(conexion_p50)}\n"
+                f"   {c['conexiones_nuevas']} conexiones nuevas · {c['bytes_enviados']} B enviados / "
+                f"{c['bytes_recibidos']} B recibidos · ~{c['tokens_entrada']} tokens de entrada / "
+                f"~{c['tokens_salida']} de salida"
+            )
+        return "\n".join(lineas)
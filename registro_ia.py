@@ -0,0 +1,227 @@
+import bisect
+import datetime
+import json
+import os
+import re
+import struct
+import threading
+
+# Cada entrada del índice: desplazamiento (8 bytes) y longitud (4 bytes) de la línea
+ENTRADA_INDICE = struct.Struct("<QI")
+_NOMBRE_SEGMENTO = re.compile(r"^(\d{6})\.jsonl$")
+# Lo único que puede haber en el directorio de un registro (y el índice de búsqueda)
+_ARCHIVO_REGISTRO = re.compile(r"^(\d{6}\.(jsonl|idx)|indice_bm25\.bin(\.tmp)?)$")
+
+
+def es_registro(directorio):
+    """True si `directorio` tiene la forma de un RegistroConversacion: segmentos con su .idx y nada más"""
+    try:
+        nombres = set(os.listdir(directorio))
+    except OSError:
+        return False
+    segmentos = [nombre for nombre in nombres if _NOMBRE_SEGMENTO.match(nombre)]
+    return (bool(segmentos) and all(_ARCHIVO_REGISTRO.match(nombre) for nombre in nombres)
+            and all(nombre[:-len(".jsonl")] + ".idx" in nombres for nombre in segmentos))
+
+
+class RegistroConversacion:
+    """Registro de turnos de conversación en disco, solo de escritura al final
+
+    Los turnos se guardan como líneas JSON en segmentos numerados
+    (000001.jsonl, 000002.jsonl...) que rotan al superar max_bytes_segmento.
+    Junto a cada segmento hay un índice .idx con la posición de cada línea,
+    así que leer los últimos N turnos cuesta O(N) aunque el registro tenga
+    meses de historia: al arrancar solo se consulta el tamaño de los índices.
+    Si el programa se cortó a mitad de una escritura, al abrir se descarta la
+    línea incompleta y se reindexan las completas.
+    """
+
+    def __init__(self, directorio="historial", max_bytes_segmento=8 * 1024 * 1024, sincronizar=False):
+        self.directorio = directorio
+        self.max_bytes_segmento = max_bytes_segmento
+        self.sincronizar = sincronizar
+        self._lock = threading.Lock()
+        os.makedirs(directorio, exist_ok=True)
+
+        numeros = sorted(int(m.group(1)) for m in map(_NOMBRE_SEGMENTO.match, os.listdir(directorio)) if m)
+        if numeros:
+            self._reparar(numeros[-1])
+        else:
+            numeros = [1]
+
+        # Segmentos como listas paralelas: número, primer turno y cantidad de turnos
+        self._numeros = []
+        self._primeros = []
+        self._cantidades = []
+        total = 0
+        for numero in numeros:
+            cantidad = self._tamano(self._ruta(numero, ".idx")) // ENTRADA_INDICE.size
+            self._numeros.append(numero)
+            self._primeros.append(total)
+            self._cantidades.append(cantidad)
+            total += cantidad
+        self._abrir_ultimo()
+
+    def _ruta(self, numero, extension):
+        return os.path.join(self.directorio, f"{numero:06d}{extension}")
+
+    @staticmethod
+    def _tamano(ruta):
+        try:
+            return os.path.getsize(ruta)
+        except OSError:
+            return 0
+
+    def _reparar(self, numero):
+        """Deja el último segmento y su índice coherentes tras un posible corte"""
+        ruta_log = self._ruta(numero, ".jsonl")
+        ruta_idx = self._ruta(numero, ".idx")
+        tamano_log = self._tamano(ruta_log)
+
+        with open(ruta_idx, "a+b") as indice:
+            indice.seek(0, os.SEEK_END)
+            cantidad = indice.tell() // ENTRADA_INDICE.size
+            # Descartar entradas que apuntan más allá del final del segmento
+            fin = 0
+            while cantidad:
+                indice.seek((cantidad - 1) * ENTRADA_INDICE.size)
+                desplazamiento, longitud = ENTRADA_INDICE.unpack(indice.read(ENTRADA_INDICE.size))
+                if desplazamiento + longitud <= tamano_log:
+                    fin = desplazamiento + longitud
+                    break
+                cantidad -= 1
+            indice.truncate(cantidad * ENTRADA_INDICE.size)
+
+            if tamano_log > fin:
+                # Líneas escritas sin llegar a indexarlas: indexar las completas
+                with open(ruta_log, "r+b") as log:
+                    log.seek(fin)
+                    resto = log.read()
+                    indice.seek(0, os.SEEK_END)
+                    posicion = fin
+                    for linea in resto.splitlines(keepends=True):
+                        if not linea.endswith(b"\n"):
+                            break
+                        indice.write(ENTRADA_INDICE.pack(posicion, len(linea)))
+                        posicion += len(linea)
+                    log.truncate(posicion)
+
+    def _abrir_ultimo(self):
+        numero = self._numeros[-1]
+        self._log = open(self._ruta(numero, ".jsonl"), "ab")
+        self._indice = open(self._ruta(numero, ".idx"), "ab")
+        self._tamano_log = self._log.tell()
+
+    def _rotar(self):
+        """Cierra el segmento actual y empieza uno nuevo (requiere el lock)"""
+        self._log.close()
+        self._indice.close()
+        self._numeros.append(self._numeros[-1] + 1)
+        self._primeros.append(self._primeros[-1] + self._cantidades[-1])
+        self._cantidades.append(0)
+        self._abrir_ultimo()
+
+    @property
+    def total(self):
+        """Número de turnos guardados"""
+        with self._lock:
+            return self._primeros[-1] + self._cantidades[-1]
+
+    def agregar(self, pregunta, respuesta, tipo="ia", **extra):
+        """Añade un turno al final del registro y devuelve su número"""
+        with self._lock:
+            numero = self._primeros[-1] + self._cantidades[-1]
+            entrada = {"n": numero, "timestamp": datetime.datetime.now().isoformat(),
+                       "tipo": tipo, "pregunta": pregunta, "respuesta": respuesta}
+            entrada.update(extra)
+            linea = (json.dumps(entrada, ensure_ascii=False) + "\n").encode("utf-8")
+
+            if self._cantidades[-1] and self._tamano_log + len(linea) > self.max_bytes_segmento:
+                self._rotar()
+
+            # Primero la línea y después su entrada de índice: si se corta
+            # entre ambas, _reparar la reindexa al abrir
+            self._log.write(linea)
+            self._log.flush()
+            self._indice.write(ENTRADA_INDICE.pack(self._tamano_log, len(linea)))
+            self._indice.flush()
+            if self.sincronizar:
+                os.fsync(self._log.fileno())
+                os.fsync(self._indice.fileno())
+            self._tamano_log += len(linea)
+            self._cantidades[-1] += 1
+            return numero
+
+    def leer(self, desde, hasta):
+        """Devuelve los turnos [desde, hasta) en orden"""
+        with self._lock:
+            total = self._primeros[-1] + self._cantidades[-1]
+            segmentos = list(zip(self._numeros, self._primeros, self._cantidades))
+        desde = max(0, desde)
+        hasta = min(hasta, total)
+        if desde >= hasta:
+            return []
+
+        entradas = []
+        primero = bisect.bisect_right([s[1] for s in segmentos], desde) - 1
+        for numero, inicio, cantidad in segmentos[primero:]:
+            if inicio >= hasta:
+                break
+            a = max(desde, inicio) - inicio
+            b = min(hasta, inicio + cantidad) - inicio
+            if a < b:
+                entradas.extend(self._leer_segmento(numero, a, b))
+        return entradas
+
+    def _leer_segmento(self, numero, a, b):
+        """Lee las líneas [a, b) de un segmento con una sola lectura del log"""
+        with open(self._ruta(numero, ".idx"), "rb") as indice:
+            indice.seek(a * ENTRADA_INDICE.size)
+            posiciones = list(ENTRADA_INDICE.iter_unpack(indice.read((b - a) * ENTRADA_INDICE.size)))
+        if not posiciones:
+            return []
+
+        inicio = posiciones[0][0]
+        fin = posiciones[-1][0] + posiciones[-1][1]
+        with open(self._ruta(numero, ".jsonl"), "rb") as log:
+            log.seek(inicio)
+            bloque = log.read(fin - inicio)
+
+        entradas = []
+        for desplazamiento, longitud in posiciones:
+            linea = bloque[desplazamiento - inicio:desplazamiento - inicio + longitud]
+            try:
+                entradas.append(json.loads(linea))
+            except ValueError:
+                continue
+        return entradas
+
+    def ultimos(self, n, tipo=None, limite=2000):
+        """Últimos n turnos (del tipo indicado, si se pasa), del más antiguo al más reciente
+
+        Al filtrar por tipo solo se revisan los últimos `limite` turnos (None
+        para no acotar): si los recientes son todos de otro tipo no se
+        recorre el registro entero buscando alguno.
+        """
+        resultado = []
+        hasta = self.total
+        tope = max(0, hasta - limite) if tipo and limite else 0
+        while hasta > tope and len(resultado) < n:
+            desde = max(tope, hasta - max(n, 32))
+            bloque = self.leer(desde, hasta)
+            if tipo:
+                bloque = [entrada for entrada in bloque if entrada.get("tipo") == tipo]
+            resultado[:0] = bloque
+            hasta = desde
+        return resultado[-n:] if n else []
+
+    def iterar(self, desde=0, lote=1000):
+        """Recorre todos los turnos a partir de `desde` leyendo por bloques"""
+        total = self.total
+        for inicio in range(desde, total, lote):
+            yield from self.leer(inicio, min(total, inicio + lote))
+
+    def cerrar(self):
+        with self._lock:
+            self._log.close()
+            self._indice.close()
@@ -0,0 +1,582 @@
+"""Modo servidor del asistente: API HTTP y WebSocket local, sin interfaz gráfica
+
+No importa tkinter, así que funciona en servidores sin pantalla y permite
+conectar varias interfaces al mismo asistente:
+
+    python servidor_asistente.py --puerto 8765
+
+- POST /comando con {"texto": "...", "sesion": "..."} responde
+  {"respuesta": "...", "error": false}. Sin "sesion" cada petición va en
+  una conversación de un solo uso; con "sesion", las peticiones con el
+  mismo nombre comparten historial. Ninguna se guarda en el registro de
+  conversación del usuario.
+- GET /estado devuelve el servicio de IA activo y la carga del servidor
+- GET /metrics devuelve las métricas de las llamadas a la IA en formato
+  Prometheus; con --metricas-json se vuelcan además a un archivo cada minuto
+- GET /ws abre un WebSocket: se envía {"texto": "..."} y se reciben
+  {"tipo": "fragmento", "texto": ...} según llega la respuesta y al final
+  {"tipo": "fin", "respuesta": ..., "error": ...}. Enviar
+  {"tipo": "cancelar"} cancela el comando en curso. Cada WebSocket tiene
+  su propia conversación, con un id aleatorio que ningún cliente puede
+  indicar, salvo que los mensajes pidan una "sesion" con nombre.
+
+Cualquier página web que el usuario abra puede intentar conectarse a
+127.0.0.1, así que se rechazan (403) las peticiones cuyo Origin no sea
+local, POST /comando solo acepta Content-Type: application/json y, salvo
+con --sin-token, todas las peticiones deben llevar el token que se muestra
+al arrancar: en la cabecera "Authorization: Bearer <token>" o, desde un
+navegador (que no deja poner cabeceras al WebSocket), como ?token=<token>.
+
+Los comandos "abrir navegador" y "buscar ..." devuelven la URL en lugar
+de abrirla en el equipo del servidor.
+
+Los comandos se ejecutan en un grupo de hilos de tamaño fijo. Si además
+hay demasiados esperando turno, los nuevos reciben 503 (o un mensaje de
+error por el WebSocket) en lugar de acumularse. Si un cliente lee despacio,
+sus fragmentos se agrupan en mensajes más grandes en lugar de encolarse.
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import signal
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from asistente_con_ia import AsistenteVirtualIA, PREFIJOS_ERROR
+
+# Constante del protocolo WebSocket para calcular Sec-WebSocket-Accept (RFC 6455)
+GUID_WEBSOCKET = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MAX_CABECERAS = 16 * 1024
+MAX_CUERPO = 64 * 1024  # También el tamaño máximo de un mensaje WebSocket
+
+# Hosts que se aceptan en la cabecera Origin sin configurar nada
+HOSTS_LOCALES = {"localhost", "127.0.0.1", "::1"}
+
+# Las sesiones que nombran los clientes van aparte de las que asigna el
+# servidor (ws-..., http-...): un cliente no puede colarse en otra conexión
+PREFIJO_SESION_CLIENTE = "cliente-"
+
+# Códigos de operación de las tramas WebSocket
+CONTINUACION, TEXTO, BINARIO, CIERRE, PING, PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+
+class Ocupado(Exception):
+    """Hay demasiados comandos esperando turno"""
+
+
+class ErrorPeticion(Exception):
+    """Petición HTTP mal formada; lleva el código con el que responder"""
+
+    def __init__(self, estado, mensaje=None):
+        super().__init__(mensaje or estado.phrase)
+        self.estado = estado
+
+
+class CierreWebSocket(Exception):
+    """El cliente cerró el WebSocket o violó el protocolo"""
+
+    def __init__(self, codigo=1000):
+        super().__init__(codigo)
+        self.codigo = codigo
+
+
+def desenmascarar(datos, mascara):
+    """Aplica la máscara XOR de 4 bytes de las tramas del cliente"""
+    if not datos:
+        return datos
+    repeticiones = len(datos) // 4 + 1
+    clave = int.from_bytes((mascara * repeticiones)[:len(datos)], "big")
+    return (int.from_bytes(datos, "big") ^ clave).to_bytes(len(datos), "big")
+
+
+class ConexionWebSocket:
+    """Lectura y escritura de tramas WebSocket sobre un par de streams de asyncio"""
+
+    def __init__(self, lector, escritor, max_mensaje=MAX_CUERPO):
+        self.lector = lector
+        self.escritor = escritor
+        self.max_mensaje = max_mensaje
+        self._lock_envio = asyncio.Lock()
+        self.cerrada = False
+
+    async def _leer_trama(self):
+        cabecera = await self.lector.readexactly(2)
+        fin = bool(cabecera[0] & 0x80)
+        opcode = cabecera[0] & 0x0F
+        longitud = cabecera[1] & 0x7F
+        if not cabecera[1] & 0x80:
+            raise CierreWebSocket(1002)  # Las tramas del cliente deben ir enmascaradas
+        if longitud == 126:
+            longitud = struct.unpack("!H", await self.lector.readexactly(2))[0]
+        elif longitud == 127:
+            longitud = struct.unpack("!Q", await self.lector.readexactly(8))[0]
+        if longitud > self.max_mensaje:
+            raise CierreWebSocket(1009)
+        mascara = await self.lector.readexactly(4)
+        return fin, opcode, desenmascarar(await self.lector.readexactly(longitud), mascara)
+
+    async def recibir(self):
+        """Devuelve el siguiente mensaje de texto completo; responde a los ping por el camino"""
+        partes = []
+        tamano = 0
+        while True:
+            fin, opcode, datos = await self._leer_trama()
+            if opcode == CIERRE:
+                raise CierreWebSocket(struct.unpack("!H", datos[:2])[0] if len(datos) >= 2 else 1000)
+            if opcode == PING:
+                await self.enviar(datos, PONG)
+                continue
+            if opcode == PONG:
+                continue
+            if opcode == BINARIO or (opcode == CONTINUACION) != bool(partes) or opcode not in (TEXTO, CONTINUACION):
+                raise CierreWebSocket(1003 if opcode == BINARIO else 1002)
+
+            partes.append(datos)
+            tamano += len(datos)
+            if tamano > self.max_mensaje:
+                raise CierreWebSocket(1009)
+            if fin:
+                try:
+                    return b"".join(partes).decode("utf-8")
+                except UnicodeDecodeError:
+                    raise CierreWebSocket(1007)
+
+    async def enviar(self, datos, opcode=TEXTO):
+        """Envía una trama y espera a que el cliente la vaya leyendo (contrapresión)"""
+        if isinstance(datos, str):
+            datos = datos.encode("utf-8")
+        longitud = len(datos)
+        if longitud < 126:
+            cabecera = bytes([0x80 | opcode, longitud])
+        elif longitud < 65536:
+            cabecera = bytes([0x80 | opcode, 126]) + struct.pack("!H", longitud)
+        else:
+            cabecera = bytes([0x80 | opcode, 127]) + struct.pack("!Q", longitud)
+        async with self._lock_envio:
+            self.escritor.write(cabecera + datos)
+            await self.escritor.drain()
+
+    async def enviar_json(self, objeto):
+        await self.enviar(json.dumps(objeto, ensure_ascii=False))
+
+    async def cerrar(self, codigo=1000):
+        if self.cerrada:
+            return
+        self.cerrada = True
+        try:
+            await self.enviar(struct.pack("!H", codigo), CIERRE)
+        except (ConnectionError, RuntimeError):
+            pass
+
+
+class ServidorAsistente:
+    """Atiende las conexiones HTTP y WebSocket y reparte los comandos al grupo de hilos"""
+
+    def __init__(self, asistente, max_concurrentes=4, max_pendientes=32, max_clientes=256,
+                 token=None, origenes=()):
+        self.asistente = asistente
+        self.token = token  # None: sin autenticación
+        self.origenes = {origen.rstrip("/").lower() for origen in origenes}  # Además de los locales
+        self.max_pendientes = max_pendientes
+        self.max_clientes = max_clientes
+        self._ejecutor = ThreadPoolExecutor(max_workers=max_concurrentes, thread_name_prefix="comando")
+        self._semaforo = asyncio.Semaphore(max_concurrentes)
+        self._cancelaciones = set()  # Eventos de cancelación de los comandos en curso
+        self.clientes = 0
+        self.esperando = 0
+        self.en_curso = 0
+        self.atendidos = 0
+        self.rechazados = 0
+
+    async def ejecutar(self, texto, al_recibir=None, cancelado=None, sesion=None):
+        """Ejecuta procesar_comando en el grupo de hilos, o lanza Ocupado si hay demasiada cola"""
+        if self.esperando >= self.max_pendientes:
+            self.rechazados += 1
+            raise Ocupado()
+        self.esperando += 1
+        try:
+            await self._semaforo.acquire()
+        finally:
+            self.esperando -= 1
+
+        cancelado = cancelado or threading.Event()
+        self._cancelaciones.add(cancelado)
+        self.en_curso += 1
+        try:
+            futuro = asyncio.get_running_loop().run_in_executor(
+                self._ejecutor,
+                lambda: self.asistente.procesar_comando(texto, al_recibir=al_recibir, cancelado=cancelado,
+                                                        sesion=sesion))
+            try:
+                return await asyncio.shield(futuro)
+            except asyncio.CancelledError:
+                # El cliente se fue: que el hilo deje de leer la respuesta
+                cancelado.set()
+                raise
+        finally:
+            self.en_curso -= 1
+            self.atendidos += 1
+            self._cancelaciones.discard(cancelado)
+            self._semaforo.release()
+
+    def estado(self):
+        return {
+            "servicio": self.asistente.conector_ia.servicio_activo(),
+            "sesiones": self.asistente.conector_ia.conversaciones.estadisticas(),
+            "clientes": self.clientes,
+            "en_curso": self.en_curso,
+            "esperando": self.esperando,
+            "atendidos": self.atendidos,
+            "rechazados": self.rechazados
+        }
+
+    async def atender(self, lector, escritor):
+        """Atiende una conexión: peticiones HTTP con keep-alive o un WebSocket"""
+        if self.clientes >= self.max_clientes:
+            self.rechazados += 1
+            await self.responder(escritor, HTTPStatus.SERVICE_UNAVAILABLE,
+                                 {"error": "Demasiados clientes conectados"}, cerrar=True)
+            escritor.close()
+            return
+
+        self.clientes += 1
+        try:
+            while True:
+                try:
+                    peticion = await self.leer_peticion(lector)
+                except ErrorPeticion as e:
+                    await self.responder(escritor, e.estado, {"error": str(e)}, cerrar=True)
+                    break
+                if peticion is None:
+                    break
+                metodo, ruta, consulta, cabeceras, cuerpo, mantener = peticion
+                try:
+                    self.comprobar_acceso(metodo, ruta, consulta, cabeceras)
+                except ErrorPeticion as e:
+                    self.rechazados += 1
+                    extra = {"WWW-Authenticate": "Bearer"} if e.estado == HTTPStatus.UNAUTHORIZED else None
+                    await self.responder(escritor, e.estado, {"error": str(e)}, cerrar=True, cabeceras=extra)
+                    break
+                if ruta == "/ws" and cabeceras.get("upgrade", "").lower() == "websocket":
+                    await self.atender_websocket(lector, escritor, cabeceras)
+                    break
+                if not await self.atender_http(escritor, metodo, ruta, cuerpo, mantener):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.clientes -= 1
+            escritor.close()
+            try:
+                await escritor.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def leer_peticion(self, lector):
+        """Devuelve (metodo, ruta, consulta, cabeceras, cuerpo, mantener_conexion) o None si el cliente cerró"""
+        try:
+            bloque = await lector.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            if not e.partial:
+                return None
+            raise
+        except asyncio.LimitOverrunError:
+            raise ErrorPeticion(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+
+        lineas = bloque.decode("latin-1").split("\r\n")
+        try:
+            metodo, objetivo, version = lineas[0].split(" ")
+        except ValueError:
+            raise ErrorPeticion(HTTPStatus.BAD_REQUEST)
+        cabeceras = {}
+        for linea in lineas[1:]:
+            if linea:
+                nombre, _, valor = linea.partition(":")
+                cabeceras[nombre.strip().lower()] = valor.strip()
+
+        if "chunked" in cabeceras.get("transfer-encoding", "").lower():
+            raise ErrorPeticion(HTTPStatus.LENGTH_REQUIRED)
+        try:
+            longitud = int(cabeceras.get("content-length", 0))
+        except ValueError:
+            raise ErrorPeticion(HTTPStatus.BAD_REQUEST)
+        if longitud > MAX_CUERPO:
+            raise ErrorPeticion(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        cuerpo = await lector.readexactly(longitud) if longitud > 0 else b""
+
+        conexion = cabeceras.get("connection", "").lower()
+        mantener = conexion != "close" if version == "HTTP/1.1" else conexion == "keep-alive"
+        partes = urlsplit(objetivo)
+        return metodo, partes.path, parse_qs(partes.query), cabeceras, cuerpo, mantener
+
+    def origen_permitido(self, origen):
+        """Sin Origin (curl, scripts) o con un Origin local o configurado"""
+        if origen is None:
+            return True
+        origen = origen.rstrip("/").lower()
+        if origen in self.origenes:
+            return True
+        partes = urlsplit(origen)
+        return partes.scheme in ("http", "https") and partes.hostname in HOSTS_LOCALES
+
+    def comprobar_acceso(self, metodo, ruta, consulta, cabeceras):
+        """Lanza ErrorPeticion si la petición viene de otra web, no trae el token o no es JSON"""
+        if not self.origen_permitido(cabeceras.get("origin")):
+            raise ErrorPeticion(HTTPStatus.FORBIDDEN, "Origen no permitido")
+        if self.token:
+            autorizacion = cabeceras.get("authorization", "")
+            recibido = autorizacion[7:] if autorizacion[:7].lower() == "bearer " else None
+            if recibido is None:
+                recibido = (consulta.get("token") or [""])[0]
+            if not hmac.compare_digest(recibido.encode(), self.token.encode()):
+                raise ErrorPeticion(HTTPStatus.UNAUTHORIZED, "Falta el token o no es válido")
+        if metodo == "POST":
+            tipo = cabeceras.get("content-type", "").split(";")[0].strip().lower()
+            if tipo != "application/json":
+                raise ErrorPeticion(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, "Usa Content-Type: application/json")
+
+    async def responder(self, escritor, estado, datos, cerrar=False, cabeceras=None,
+                        tipo="application/json; charset=utf-8"):
+        """Envía una respuesta: `datos` se serializa a JSON salvo que ya sea texto"""
+        if isinstance(datos, str):
+            cuerpo = datos.encode("utf-8")
+        else:
+            cuerpo = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+        lineas = [
+            f"HTTP/1.1 {estado.value} {estado.phrase}",
+            f"Content-Type: {tipo}",
+            f"Content-Length: {len(cuerpo)}",
+            f"Connection: {'close' if cerrar else 'keep-alive'}"
+        ]
+        lineas.extend(f"{nombre}: {valor}" for nombre, valor in (cabeceras or {}).items())
+        escritor.write(("\r\n".join(lineas) + "\r\n\r\n").encode("latin-1") + cuerpo)
+        await escritor.drain()
+
+    async def atender_http(self, escritor, metodo, ruta, cuerpo, mantener):
+        """Responde a una petición HTTP; devuelve si la conexión sigue abierta"""
+        if ruta in ("/estado", "/metrics"):
+            if metodo != "GET":
+                await self.responder(escritor, HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Usa GET"},
+                                     not mantener, {"Allow": "GET"})
+            elif ruta == "/estado":
+                await self.responder(escritor, HTTPStatus.OK, self.estado(), not mantener)
+            else:
+                metricas = self.asistente.conector_ia.metricas.exportar_prometheus()
+                await self.responder(escritor, HTTPStatus.OK, metricas, not mantener,
+                                     tipo="text/plain; version=0.0.4; charset=utf-8")
+            return mantener
+
+        if ruta != "/comando":
+            await self.responder(escritor, HTTPStatus.NOT_FOUND, {"error": "Ruta no encontrada"}, not mantener)
+            return mantener
+        if metodo != "POST":
+            await self.responder(escritor, HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Usa POST"},
+                                 not mantener, {"Allow": "POST"})
+            return mantener
+
+        try:
+            datos = json.loads(cuerpo)
+            texto, sesion = datos.get("texto", ""), datos.get("sesion")
+        except (ValueError, AttributeError):
+            texto = sesion = None
+        if not isinstance(texto, str) or not texto.strip() or not isinstance(sesion, (str, type(None))):
+            await self.responder(escritor, HTTPStatus.BAD_REQUEST,
+                                 {"error": "Envía un JSON con el campo 'texto' (y 'sesion' opcional)"},
+                                 not mantener)
+            return mantener
+
+        # Sin "sesion", una conversación de un solo uso: los clientes no se
+        # mezclan entre sí ni con la conversación principal
+        efimera = sesion is None
+        sesion = f"http-{secrets.token_urlsafe(16)}" if efimera else PREFIJO_SESION_CLIENTE + sesion
+        try:
+            respuesta = await self.ejecutar(texto.strip(), sesion=sesion)
+        except Ocupado:
+            await self.responder(escritor, HTTPStatus.SERVICE_UNAVAILABLE,
+                                 {"error": "El asistente está ocupado, prueba en unos segundos"},
+                                 not mantener, {"Retry-After": "1"})
+            return mantener
+        finally:
+            if efimera:
+                self.asistente.conector_ia.conversaciones.eliminar(sesion)
+        await self.responder(escritor, HTTPStatus.OK,
+                             {"respuesta": respuesta, "error": respuesta.startswith(PREFIJOS_ERROR)},
+                             not mantener)
+        return mantener
+
+    async def atender_websocket(self, lector, escritor, cabeceras):
+        clave = cabeceras.get("sec-websocket-key")
+        if not clave or cabeceras.get("sec-websocket-version") != "13":
+            await self.responder(escritor, HTTPStatus.BAD_REQUEST, {"error": "Handshake WebSocket no válido"},
+                                 cerrar=True, cabeceras={"Sec-WebSocket-Version": "13"})
+            return
+
+        aceptar = base64.b64encode(hashlib.sha1((clave + GUID_WEBSOCKET).encode()).digest()).decode()
+        escritor.write((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {aceptar}\r\n\r\n").encode("latin-1"))
+        await escritor.drain()
+
+        conexion = ConexionWebSocket(lector, escritor)
+        sesion_propia = f"ws-{secrets.token_urlsafe(16)}"
+        tarea = None
+        cancelado = None
+        try:
+            while True:
+                try:
+                    mensaje = await conexion.recibir()
+                except CierreWebSocket as e:
+                    await conexion.cerrar(1000 if e.codigo in (1000, 1001) else e.codigo)
+                    break
+
+                try:
+                    datos = json.loads(mensaje)
+                except ValueError:
+                    datos = {"texto": mensaje}  # También se acepta texto plano
+                if not isinstance(datos, dict):
+                    datos = {"texto": str(datos)}
+
+                if datos.get("tipo") == "cancelar":
+                    if cancelado is not None:
+                        cancelado.set()
+                    continue
+                texto = datos.get("texto")
+                sesion = datos.get("sesion")
+                if not isinstance(texto, str) or not texto.strip() or not isinstance(sesion, (str, type(None))):
+                    await conexion.enviar_json({"tipo": "error", "error": "Falta el campo 'texto'"})
+                    continue
+                sesion = PREFIJO_SESION_CLIENTE + sesion if sesion else sesion_propia
+                if tarea is not None and not tarea.done():
+                    await conexion.enviar_json({"tipo": "error", "error": "Ya hay un comando en curso"})
+                    continue
+
+                cancelado = threading.Event()
+                tarea = asyncio.create_task(self.responder_websocket(conexion, texto.strip(), cancelado, sesion))
+        finally:
+            if cancelado is not None:
+                cancelado.set()
+            if tarea is not None and not tarea.done():
+                tarea.cancel()
+            self.asistente.conector_ia.conversaciones.eliminar(sesion_propia)
+
+    async def responder_websocket(self, conexion, texto, cancelado, sesion):
+        """Ejecuta un comando enviando la respuesta por fragmentos según llega"""
+        bucle = asyncio.get_running_loop()
+        pendientes = []
+        hay_fragmentos = asyncio.Event()
+
+        def al_recibir(fragmento):
+            # Desde el hilo trabajador: nunca se bloquea, solo apunta el fragmento
+            pendientes.append(fragmento)
+            bucle.call_soon_threadsafe(hay_fragmentos.set)
+
+        async def enviar_pendientes():
+            # Mientras se espera a que el cliente lea (drain) se acumulan
+            # fragmentos, que salen juntos en el siguiente mensaje
+            cantidad = len(pendientes)
+            if cantidad:
+                bloque = "".join(pendientes[:cantidad])
+                del pendientes[:cantidad]
+                await conexion.enviar_json({"tipo": "fragmento", "texto": bloque})
+
+        async def reenviar():
+            while True:
+                await hay_fragmentos.wait()
+                hay_fragmentos.clear()
+                await enviar_pendientes()
+
+        envio = asyncio.create_task(reenviar())
+        try:
+            try:
+                respuesta = await self.ejecutar(texto, al_recibir, cancelado, sesion)
+            finally:
+                envio.cancel()
+                try:
+                    await envio
+                except asyncio.CancelledError:
+                    pass
+            await enviar_pendientes()
+            await conexion.enviar_json({"tipo": "fin", "respuesta": respuesta,
+                                        "error": respuesta.startswith(PREFIJOS_ERROR)})
+        except Ocupado:
+            await conexion.enviar_json({"tipo": "error",
+                                        "error": "El asistente está ocupado, prueba en unos segundos"})
+        except (ConnectionError, RuntimeError):
+            cancelado.set()
+
+    def cerrar(self):
+        """Cancela los comandos en curso y libera los hilos"""
+        for cancelado in list(self._cancelaciones):
+            cancelado.set()
+        self._ejecutor.shutdown(wait=False, cancel_futures=True)
+
+
+async def servir(host, puerto, asistente, **opciones):
+    """Arranca el servidor y lo mantiene hasta recibir SIGINT o SIGTERM"""
+    servidor = ServidorAsistente(asistente, **opciones)
+    red = await asyncio.start_server(servidor.atender, host, puerto, limit=MAX_CABECERAS)
+    print(f"🚀 Asistente escuchando en http://{host}:{puerto} (WebSocket en ws://{host}:{puerto}/ws)")
+    if servidor.token:
+        print(f"🔑 Token de acceso: {servidor.token}")
+    else:
+        print("⚠️  Sin token: cualquier programa del equipo puede usar el asistente")
+
+    detener = asyncio.Event()
+    bucle = asyncio.get_running_loop()
+    for senal in (signal.SIGINT, signal.SIGTERM):
+        try:
+            bucle.add_signal_handler(senal, detener.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: Ctrl+C llega como KeyboardInterrupt
+
+    try:
+        async with red:
+            await detener.wait()
+    finally:
+        print("👋 Deteniendo el asistente...")
+        servidor.cerrar()
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Asistente con IA sin interfaz gráfica (HTTP + WebSocket)")
+    parser.add_argument("--host", default="127.0.0.1", help="Interfaz en la que escuchar (por defecto solo local)")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--nombre", default="Jarvis")
+    parser.add_argument("--concurrentes", type=int, default=4, help="Comandos ejecutándose a la vez")
+    parser.add_argument("--pendientes", type=int, default=32, help="Comandos en espera antes de responder 503")
+    parser.add_argument("--clientes", type=int, default=256, help="Conexiones abiertas como máximo")
+    parser.add_argument("--metricas-json", metavar="RUTA", help="Volcar las métricas a este archivo JSON")
+    parser.add_argument("--intervalo-metricas", type=float, default=60.0, help="Segundos entre volcados")
+    parser.add_argument("--token", help="Token de acceso (por defecto se genera uno en cada arranque)")
+    parser.add_argument("--sin-token", action="store_true", help="No pedir token (el Origin se sigue comprobando)")
+    parser.add_argument("--origen", action="append", default=[],
+                        help="Origin de una web que puede conectarse además de las locales (repetible)")
+    args = parser.parse_args(argumentos)
+    token = None if args.sin_token else (args.token or secrets.token_urlsafe(24))
+
+    # Sin micrófono ni altavoz: la voz la ponen los clientes, si acaso. Y
+    # nada de abrir el navegador en el servidor: se devuelve la URL
+    asistente = AsistenteVirtualIA(args.nombre, iniciar_voz=False, abrir_navegador=False)
+    if args.metricas_json:
+        asistente.conector_ia.metricas.iniciar_exportacion(args.metricas_json, args.intervalo_metricas)
+    try:
+        asyncio.run(servir(args.host, args.puerto, asistente, max_concurrentes=args.concurrentes,
+                           max_pendientes=args.pendientes, max_clientes=args.clientes,
+                           token=token, origenes=args.origen))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        asistente.conector_ia.cerrar()
+
+
+if __name__ == "__main__":
+    main()
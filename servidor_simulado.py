@@ -0,0 +1,219 @@
+"""Servidor local que imita las APIs de OpenAI, Gemini y Hugging Face
+
+Sirve para probar y medir ConectorIA sin red ni API keys:
+
+    python servidor_simulado.py --puerto 8089 --latencia 0.3 --tasa-429 0.05
+
+y luego usar ConectorIA(hosts={"openai": "http://127.0.0.1:8089", ...}).
+Soporta chat completions (con y sin stream), generateContent y
+streamGenerateContent de Gemini, y el endpoint de inferencia de Hugging Face.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+RESPUESTA_POR_DEFECTO = (
+    "Esta es una respuesta simulada del servidor local. Sirve para medir la "
+    "latencia y el rendimiento del asistente sin depender de la red."
+)
+
+
+class ConfiguracionSimulada:
+    """Comportamiento del servidor simulado"""
+
+    def __init__(self, latencia=0.2, variacion=0.05, tasa_errores=0.0, tasa_429=0.0,
+                 retry_after=1.0, fragmentos=8, retardo_fragmento=0.02,
+                 respuesta=RESPUESTA_POR_DEFECTO):
+        self.latencia = latencia
+        self.variacion = variacion
+        self.tasa_errores = tasa_errores
+        self.tasa_429 = tasa_429
+        self.retry_after = retry_after
+        self.fragmentos = fragmentos
+        self.retardo_fragmento = retardo_fragmento
+        self.respuesta = respuesta
+
+
+class ManejadorSimulado(BaseHTTPRequestHandler):
+    """Atiende peticiones con las formas de respuesta de cada proveedor"""
+
+    protocol_version = "HTTP/1.1"  # Mantener conexiones abiertas (keep-alive)
+    disable_nagle_algorithm = True  # Cabeceras y cuerpo salen sin esperar al ACK
+
+    def log_message(self, formato, *args):
+        pass
+
+    @property
+    def configuracion(self):
+        return self.server.configuracion
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        longitud = int(self.headers.get("Content-Length", 0))
+        try:
+            cuerpo = json.loads(self.rfile.read(longitud) or b"{}")
+        except ValueError:
+            self.enviar_json(400, {"error": "JSON no válido"})
+            return
+
+        self.server.contar("peticiones")
+        configuracion = self.configuracion
+        time.sleep(max(0.0, random.gauss(configuracion.latencia, configuracion.variacion)))
+
+        sorteo = random.random()
+        if sorteo < configuracion.tasa_429:
+            self.server.contar("respuestas_429")
+            self.enviar_json(429, {"error": {"message": "Rate limit simulado"}},
+                             {"Retry-After": str(configuracion.retry_after)})
+            return
+        if sorteo < configuracion.tasa_429 + configuracion.tasa_errores:
+            self.server.contar("errores")
+            self.enviar_json(500, {"error": {"message": "Error simulado"}})
+            return
+
+        ruta = urlparse(self.path).path
+        if ruta == "/v1/chat/completions":
+            self.responder_openai(cuerpo)
+        elif ruta.endswith(":streamGenerateContent"):
+            self.responder_gemini(stream=True)
+        elif ruta.endswith(":generateContent"):
+            self.responder_gemini(stream=False)
+        elif ruta.startswith("/models/"):
+            entrada = cuerpo.get("inputs", "")
+            self.enviar_json(200, [{"generated_text": f"{entrada} {configuracion.respuesta}"}])
+        else:
+            self.enviar_json(404, {"error": "Ruta no simulada"})
+
+    def trocear(self):
+        """Divide la respuesta en los fragmentos que se envían por streaming"""
+        palabras = self.configuracion.respuesta.split(" ")
+        numero = max(1, min(self.configuracion.fragmentos, len(palabras)))
+        tamano = -(-len(palabras) // numero)
+        trozos = [" ".join(palabras[i:i + tamano]) for i in range(0, len(palabras), tamano)]
+        return [trozo + (" " if i < len(trozos) - 1 else "") for i, trozo in enumerate(trozos)]
+
+    def responder_openai(self, cuerpo):
+        if not cuerpo.get("stream"):
+            self.enviar_json(200, {
+                "choices": [{"message": {"role": "assistant", "content": self.configuracion.respuesta}}]
+            }, self.cabeceras_ritmo())
+            return
+
+        eventos = [{"choices": [{"delta": {"content": trozo}}]} for trozo in self.trocear()]
+        self.enviar_sse(eventos, final="[DONE]")
+
+    def responder_gemini(self, stream):
+        def evento(texto):
+            return {"candidates": [{"content": {"parts": [{"text": texto}]}}]}
+
+        if stream:
+            self.enviar_sse([evento(trozo) for trozo in self.trocear()])
+        else:
+            self.enviar_json(200, evento(self.configuracion.respuesta))
+
+    def cabeceras_ritmo(self):
+        """Cabeceras x-ratelimit-* como las de OpenAI"""
+        return {
+            "x-ratelimit-limit-requests": "10000",
+            "x-ratelimit-remaining-requests": "9999",
+            "x-ratelimit-reset-requests": "6ms"
+        }
+
+    def enviar_json(self, codigo, datos, cabeceras=None):
+        contenido = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(contenido)))
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(contenido)
+
+    def enviar_sse(self, eventos, final=None):
+        """Envía eventos Server-Sent Events con codificación chunked"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        datos = [json.dumps(e, ensure_ascii=False) for e in eventos] + ([final] if final else [])
+        try:
+            for i, dato in enumerate(datos):
+                if i:
+                    time.sleep(self.configuracion.retardo_fragmento)
+                trozo = f"data: {dato}\n\n".encode("utf-8")
+                self.wfile.write(f"{len(trozo):x}\r\n".encode() + trozo + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente canceló la respuesta y cerró la conexión
+            self.close_connection = True
+
+
+class ServidorSimulado(ThreadingHTTPServer):
+    """Servidor HTTP multihilo con contadores de peticiones"""
+
+    daemon_threads = True
+    request_queue_size = 256  # Evita reintentos de SYN con mucha concurrencia
+
+    def __init__(self, direccion, configuracion=None):
+        super().__init__(direccion, ManejadorSimulado)
+        self.configuracion = configuracion or ConfiguracionSimulada()
+        self.contadores = {"peticiones": 0, "respuestas_429": 0, "errores": 0}
+        self._lock = threading.Lock()
+
+    def contar(self, nombre):
+        with self._lock:
+            self.contadores[nombre] += 1
+
+    @property
+    def url(self):
+        host, puerto = self.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def hosts(self):
+        """Hosts para pasar a ConectorIA(hosts=...)"""
+        return {"openai": self.url, "gemini": self.url, "huggingface": self.url}
+
+
+def iniciar_en_hilo(configuracion=None, puerto=0):
+    """Arranca un servidor simulado en segundo plano y lo devuelve"""
+    servidor = ServidorSimulado(("127.0.0.1", puerto), configuracion)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que simula los proveedores de IA")
+    parser.add_argument("--puerto", type=int, default=8089)
+    parser.add_argument("--latencia", type=float, default=0.2, help="Latencia media en segundos")
+    parser.add_argument("--variacion", type=float, default=0.05, help="Desviación de la latencia")
+    parser.add_argument("--tasa-errores", type=float, default=0.0, help="Proporción de respuestas 500")
+    parser.add_argument("--tasa-429", type=float, default=0.0, help="Proporción de respuestas 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After de los 429")
+    parser.add_argument("--fragmentos", type=int, default=8, help="Fragmentos por respuesta en streaming")
+    parser.add_argument("--retardo-fragmento", type=float, default=0.02, help="Segundos entre fragmentos")
+    args = parser.parse_args()
+
+    configuracion = ConfiguracionSimulada(
+        latencia=args.latencia, variacion=args.variacion, tasa_errores=args.tasa_errores,
+        tasa_429=args.tasa_429, retry_after=args.retry_after, fragmentos=args.fragmentos,
+        retardo_fragmento=args.retardo_fragmento)
+    servidor = ServidorSimulado(("127.0.0.1", args.puerto), configuracion)
+    print(f"🧪 Servidor simulado escuchando en {servidor.url}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("👋 Servidor detenido")
+
+
+if __name__ == "__main__":
+    main()
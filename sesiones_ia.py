@@ -0,0 +1,147 @@
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Bytes aproximados de un turno además del texto (objeto con __slots__ y
+# cabeceras de las dos cadenas)
+COSTE_TURNO = sys.getsizeof(object()) + 2 * sys.getsizeof("") + 8 * 3
+# Bytes aproximados de una conversación vacía (objeto, deque y lista del resumen)
+COSTE_CONVERSACION = 64 + sys.getsizeof(deque(maxlen=1)) + sys.getsizeof([])
+
+
+def _coste_texto(texto):
+    return sys.getsizeof(texto) - sys.getsizeof("")
+
+
+class Turno:
+    """Una pregunta y su respuesta en el historial de una conversación
+
+    Se lee igual que los dict de antes (turno["pregunta"]) para que el
+    constructor de contexto no cambie.
+    """
+
+    __slots__ = ("timestamp", "pregunta", "respuesta")
+
+    def __init__(self, pregunta, respuesta, timestamp=None):
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.pregunta = pregunta
+        self.respuesta = respuesta
+
+    def __getitem__(self, clave):
+        try:
+            return getattr(self, clave)
+        except AttributeError:
+            raise KeyError(clave)
+
+    def coste(self):
+        return COSTE_TURNO + _coste_texto(self.pregunta) + _coste_texto(self.respuesta)
+
+
+class Conversacion:
+    """Historial de una conversación: los últimos turnos en un búfer circular
+    y el resumen de los que ya salieron de él"""
+
+    __slots__ = ("id", "turnos", "resumen", "ultimo_uso", "tamano")
+
+    def __init__(self, max_turnos=10, id_sesion=None):
+        self.id = id_sesion  # None para las que no gestiona GestorSesiones
+        self.turnos = deque(maxlen=max_turnos)
+        self.resumen = []
+        self.ultimo_uso = time.monotonic()
+        self.tamano = COSTE_CONVERSACION
+
+    def agregar(self, turno, plegar):
+        """Añade un turno; si el búfer está lleno, el más antiguo pasa al resumen con plegar(resumen, turno)"""
+        if len(self.turnos) == self.turnos.maxlen:
+            antiguo = self.turnos.popleft()
+            plegar(self.resumen, antiguo)
+        self.turnos.append(turno)
+        self.ultimo_uso = time.monotonic()
+        self.tamano = (COSTE_CONVERSACION + sum(t.coste() for t in self.turnos)
+                       + sum(sys.getsizeof(linea) for linea in self.resumen))
+
+
+class GestorSesiones:
+    """Conversaciones independientes por id de sesión, con límite de memoria
+
+    Las sesiones se guardan por orden de uso. Se expulsan las que llevan
+    más de `inactividad` segundos sin usarse y, si aun así se pasa de
+    `max_sesiones` o de `max_bytes` (estimados), las menos usadas. Una
+    petición en curso de una sesión expulsada termina con normalidad, pero
+    su turno ya no se conserva.
+    """
+
+    def __init__(self, max_turnos=10, max_sesiones=10_000, max_bytes=64 * 1024 * 1024,
+                 inactividad=1800.0):
+        self.max_turnos = max_turnos
+        self.max_sesiones = max_sesiones
+        self.max_bytes = max_bytes
+        self.inactividad = inactividad
+        self._sesiones = OrderedDict()  # id -> Conversacion, de la menos a la más usada
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.creadas = 0
+        self.expulsadas = 0
+
+    def obtener(self, id_sesion):
+        """Devuelve la conversación de una sesión, creándola si no existe"""
+        ahora = time.monotonic()
+        with self._lock:
+            conversacion = self._sesiones.get(id_sesion)
+            if conversacion is None:
+                conversacion = Conversacion(self.max_turnos, id_sesion)
+                self._sesiones[id_sesion] = conversacion
+                self.bytes += conversacion.tamano
+                self.creadas += 1
+            else:
+                self._sesiones.move_to_end(id_sesion)
+            conversacion.ultimo_uso = ahora
+            self._expulsar(ahora, conversacion)
+            return conversacion
+
+    def agregar(self, conversacion, pregunta, respuesta, plegar):
+        """Añade un turno a una conversación (también a las que no son de ninguna sesión)"""
+        turno = Turno(pregunta, respuesta)
+        with self._lock:
+            antes = conversacion.tamano
+            conversacion.agregar(turno, plegar)
+            if conversacion.id is not None and self._sesiones.get(conversacion.id) is conversacion:
+                self.bytes += conversacion.tamano - antes
+                self._sesiones.move_to_end(conversacion.id)
+                self._expulsar(conversacion.ultimo_uso, conversacion)
+
+    def eliminar(self, id_sesion):
+        """Olvida una sesión; devuelve si existía"""
+        with self._lock:
+            conversacion = self._sesiones.pop(id_sesion, None)
+            if conversacion is None:
+                return False
+            self.bytes -= conversacion.tamano
+            return True
+
+    def _expulsar(self, ahora, conservar):
+        """Quita las sesiones inactivas y las menos usadas que sobren (requiere el lock)"""
+        limite = ahora - self.inactividad
+        while self._sesiones:
+            id_sesion, conversacion = next(iter(self._sesiones.items()))
+            if conversacion is conservar:
+                break
+            sobran = len(self._sesiones) > self.max_sesiones or self.bytes > self.max_bytes
+            if not sobran and conversacion.ultimo_uso > limite:
+                break
+            del self._sesiones[id_sesion]
+            self.bytes -= conversacion.tamano
+            self.expulsadas += 1
+
+    def __len__(self):
+        return len(self._sesiones)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "sesiones": len(self._sesiones),
+                "bytes": self.bytes,
+                "creadas": self.creadas,
+                "expulsadas": self.expulsadas
+            }
@@ -0,0 +1,124 @@
+import itertools
+import queue
+import threading
+import time
+
+
+class Trabajo:
+    """Un comando en cola o en ejecución en un hilo trabajador
+
+    Los trabajadores solo escriben en el trabajo; el hilo de la interfaz
+    consulta su estado (fragmentos, terminado) desde after() sin bloquearse.
+    """
+
+    __slots__ = ("numero", "funcion", "argumentos", "creado", "inicio", "fragmentos",
+                 "resultado", "error", "caducado", "cancelado", "terminado")
+
+    def __init__(self, numero, funcion, argumentos):
+        self.numero = numero
+        self.funcion = funcion
+        self.argumentos = argumentos
+        self.creado = time.monotonic()
+        self.inicio = None
+        self.fragmentos = []  # Texto recibido por streaming, en orden
+        self.resultado = None
+        self.error = None
+        self.caducado = False  # Descartado por esperar demasiado en la cola
+        self.cancelado = threading.Event()
+        self.terminado = threading.Event()
+
+    def emitir(self, fragmento):
+        """Callback al_recibir: acumula los fragmentos para que los recoja la interfaz"""
+        if not self.cancelado.is_set():
+            self.fragmentos.append(fragmento)
+
+    def cancelar(self):
+        self.cancelado.set()
+
+    @property
+    def activo(self):
+        """Sigue pendiente de entregar un resultado (ni terminado ni cancelado)"""
+        return not (self.terminado.is_set() or self.cancelado.is_set())
+
+
+class ColaTrabajos:
+    """Cola de trabajos con un número máximo de hilos trabajadores
+
+    La función de cada trabajo recibe `cancelado` (un threading.Event) y
+    `al_recibir` como argumentos con nombre. Los trabajos cancelados antes
+    de empezar no llegan a ejecutarse, y los que esperan en la cola más de
+    `max_espera` segundos se descartan por obsoletos.
+    """
+
+    def __init__(self, max_concurrentes=2, max_pendientes=8, max_espera=60.0):
+        self.max_concurrentes = max_concurrentes
+        self.max_pendientes = max_pendientes
+        self.max_espera = max_espera
+        self._cola = queue.Queue()
+        self._activos = {}  # numero -> trabajo (en cola o ejecutándose)
+        self._numeros = itertools.count(1)
+        self._lock = threading.Lock()
+        self._cerrada = False
+        self.completados = 0
+        self.descartados = 0
+        self._hilos = [threading.Thread(target=self._trabajar, daemon=True, name=f"trabajador-{i}")
+                       for i in range(max_concurrentes)]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def enviar(self, funcion, *argumentos):
+        """Encola un trabajo; devuelve el Trabajo o None si la cola está llena o cerrada"""
+        with self._lock:
+            if self._cerrada or len(self._activos) >= self.max_pendientes:
+                return None
+            trabajo = Trabajo(next(self._numeros), funcion, argumentos)
+            self._activos[trabajo.numero] = trabajo
+        self._cola.put(trabajo)
+        return trabajo
+
+    def cancelar_todos(self):
+        """Cancela los trabajos en cola y en curso; devuelve cuántos había"""
+        with self._lock:
+            trabajos = list(self._activos.values())
+        for trabajo in trabajos:
+            trabajo.cancelar()
+        return len(trabajos)
+
+    @property
+    def pendientes(self):
+        with self._lock:
+            return len(self._activos)
+
+    def _trabajar(self):
+        while True:
+            trabajo = self._cola.get()
+            if trabajo is None:
+                return
+            if (not trabajo.cancelado.is_set() and self.max_espera is not None
+                    and time.monotonic() - trabajo.creado > self.max_espera):
+                trabajo.caducado = True
+                trabajo.cancelar()
+
+            if not trabajo.cancelado.is_set():
+                trabajo.inicio = time.monotonic()
+                try:
+                    trabajo.resultado = trabajo.funcion(*trabajo.argumentos, cancelado=trabajo.cancelado,
+                                                        al_recibir=trabajo.emitir)
+                except Exception as e:
+                    trabajo.error = e
+
+            with self._lock:
+                self._activos.pop(trabajo.numero, None)
+                if trabajo.cancelado.is_set():
+                    self.descartados += 1
+                else:
+                    self.completados += 1
+            trabajo.terminado.set()
+
+    def cerrar(self):
+        """Cancela todo y detiene los trabajadores (sin esperar a las llamadas en curso)"""
+        with self._lock:
+            self._cerrada = True
+        self.cancelar_todos()
+        for _ in self._hilos:
+            self._cola.put(None)
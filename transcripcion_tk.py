@@ -0,0 +1,245 @@
+import itertools
+import tkinter as tk
+from collections import deque
+
+# Unos 60 volcados por segundo como máximo
+INTERVALO_VOLCADO_MS = 16
+# Líneas que se mantienen en el widget; lo anterior se recorta y se vuelve
+# a leer del registro en disco al desplazarse hasta arriba
+MAX_LINEAS = 2000
+# Turnos del registro que se cargan cada vez que se llega arriba
+TURNOS_POR_PAGINA = 20
+
+
+def _linea(indice):
+    """Número de línea de un índice de Tk ("12.5" -> 12)"""
+    return int(indice.split(".")[0])
+
+
+class EscritorHistorial:
+    """Agrupa las escrituras en un widget Text y las vuelca como mucho una vez por fotograma
+
+    Cada escritura solo se apunta en memoria; el primer apunte programa un
+    volcado con after() que inserta todo el texto pendiente de una vez y
+    hace un único see(END). Así un stream de cientos de fragmentos o un
+    pegado largo cuestan una inserción y un redibujado por fotograma, en
+    lugar de un update() síncrono por mensaje.
+
+    El widget guarda como mucho unas `max_lineas`: al pasarse se recortan
+    los bloques más antiguos. Cada bloque es un turno y sabe cuántos turnos
+    del registro lo preceden; como el turno se guarda al terminar, ese número
+    se indica después con numerar_bloque(). Si se da `cargar_anteriores(desde, hasta)`,
+    que devuelve el texto de esos turnos del registro en disco, al llegar
+    arriba del todo se cargan los turnos anteriores página a página.
+    """
+
+    def __init__(self, widget, intervalo_ms=INTERVALO_VOLCADO_MS, max_lineas=MAX_LINEAS,
+                 cargar_anteriores=None, anteriores=0):
+        self.widget = widget
+        self.intervalo_ms = intervalo_ms
+        self.max_lineas = max_lineas
+        self.cargar_anteriores = cargar_anteriores
+        self.anteriores = anteriores  # Turnos del registro anteriores a lo que muestra el widget
+        self._pendiente = []  # Textos y cortes de bloque aún sin volcar
+        self._programado = None
+        # Marca del inicio de cada bloque en el widget, del más antiguo al más reciente
+        self._bloques = deque()
+        # Turnos del registro anteriores a cada bloque (None mientras no se sabe)
+        self._anteriores = {}
+        self._marcas = itertools.count()
+        self.volcados = 0
+        self.escrituras = 0
+        self.recortes = 0
+
+        if cargar_anteriores is not None:
+            self._vigilar_desplazamiento()
+
+    def escribir(self, texto):
+        """Añade texto al final del historial en el próximo volcado"""
+        if not texto:
+            return
+        self._pendiente.append(texto)
+        self.escrituras += 1
+        self._programar()
+
+    def marcar_bloque(self, anteriores=None):
+        """Señala que lo siguiente empieza un bloque y devuelve su marca
+
+        Solo se recorta por el inicio de un bloque, para no partir un turno.
+        Si aún no se sabe cuántos turnos del registro lo preceden, se indica
+        después con numerar_bloque().
+        """
+        marca = self._nueva_marca(anteriores)
+        self._pendiente.append((marca,))
+        self._programar()
+        return marca
+
+    def numerar_bloque(self, marca, anteriores):
+        """Indica cuántos turnos del registro preceden al bloque (su número en el registro)
+
+        Con None el turno no llegó al registro (error, cancelado...): el
+        bloque deja de ser un punto de recorte y queda unido al anterior.
+        """
+        if marca not in self._anteriores:
+            return  # Ya recortado o borrado
+        if anteriores is not None:
+            self._anteriores[marca] = anteriores
+            return
+        del self._anteriores[marca]
+        if (marca,) in self._pendiente:
+            self._pendiente.remove((marca,))
+        else:
+            self._bloques.remove(marca)
+            self.widget.mark_unset(marca)
+
+    def _programar(self):
+        if self._programado is None:
+            self._programado = self.widget.after(self.intervalo_ms, self._al_vencer)
+
+    def _al_vencer(self):
+        self._programado = None
+        self.volcar()
+
+    def volcar(self):
+        """Inserta ya todo el texto pendiente"""
+        if self._programado is not None:
+            self.widget.after_cancel(self._programado)
+            self._programado = None
+        if not self._pendiente:
+            return
+
+        # Solo se sigue el final si el usuario no está leyendo más arriba
+        seguir = self._al_final()
+        textos = []
+        for elemento in self._pendiente:
+            if isinstance(elemento, str):
+                textos.append(elemento)
+                continue
+            if textos:
+                self.widget.insert(tk.END, "".join(textos))
+                textos.clear()
+            self._agregar_marca(tk.END, elemento[0], al_principio=False)
+        if textos:
+            self.widget.insert(tk.END, "".join(textos))
+        self._pendiente.clear()
+
+        self._recortar(seguir)
+        if seguir:
+            self.widget.see(tk.END)
+        self.volcados += 1
+
+    def _nueva_marca(self, anteriores):
+        marca = f"bloque{next(self._marcas)}"
+        self._anteriores[marca] = anteriores
+        return marca
+
+    def _agregar_marca(self, indice, marca, al_principio):
+        self.widget.mark_set(marca, f"{indice}-1c" if indice == tk.END else indice)
+        # Gravedad izquierda: el texto que se añade detrás no mueve la marca
+        self.widget.mark_gravity(marca, tk.LEFT)
+        if al_principio:
+            self._bloques.appendleft(marca)
+        else:
+            self._bloques.append(marca)
+
+    def _al_final(self):
+        return self.widget.yview()[1] >= 1.0
+
+    def _recortar(self, al_final):
+        """Quita los bloques más antiguos si el widget pasa de max_lineas"""
+        lineas = _linea(self.widget.index("end-1c"))
+        if lineas <= self.max_lineas:
+            return
+        # Mientras se leen páginas antiguas no se recorta hasta el triple del límite
+        if lineas <= 3 * self.max_lineas and not al_final:
+            return
+
+        # Recortar de más para no hacerlo en cada volcado
+        primera = lineas - self.max_lineas * 3 // 4
+        quitados = []
+        while self._bloques and _linea(self.widget.index(self._bloques[0])) < primera:
+            marca = self._bloques.popleft()
+            self.widget.mark_unset(marca)
+            quitados.append(self._anteriores.pop(marca))
+        visibles = list(self._anteriores.values())
+        if self._bloques:
+            self.widget.delete("1.0", self._bloques[0])
+        else:
+            # Un único bloque enorme: recortar por líneas (el último quitado sigue a la vista en parte)
+            self.widget.delete("1.0", f"{primera}.0")
+            visibles.extend(quitados[-1:])
+
+        # Los turnos terminan en cualquier orden: lo que queda empieza en el
+        # menor número de turno que sigue a la vista
+        conocidos = [anteriores for anteriores in visibles if anteriores is not None]
+        quitados = [anteriores for anteriores in quitados if anteriores is not None]
+        if conocidos:
+            self.anteriores = min(conocidos)
+        elif quitados:
+            self.anteriores = max(quitados) + 1
+        self.recortes += 1
+
+    def _vigilar_desplazamiento(self):
+        """Carga la página anterior cuando el usuario se desplaza hasta arriba"""
+        def comprobar(_evento=None):
+            self.widget.after_idle(self._comprobar_inicio)
+
+        for evento in ("<MouseWheel>", "<Button-4>", "<Prior>", "<Control-Home>"):
+            self.widget.bind(evento, comprobar, add="+")
+        barra = getattr(self.widget, "vbar", None)
+        if barra is not None:
+            def desplazar(*argumentos):
+                self.widget.yview(*argumentos)
+                comprobar()
+            barra.config(command=desplazar)
+
+    def _comprobar_inicio(self):
+        if self.anteriores > 0 and self.widget.yview()[0] <= 0.0:
+            self.cargar_pagina()
+
+    def cargar_pagina(self, turnos=TURNOS_POR_PAGINA):
+        """Inserta arriba los `turnos` anteriores del registro; devuelve cuántos cargó"""
+        if self.anteriores <= 0 or self.cargar_anteriores is None:
+            return 0
+        desde = max(0, self.anteriores - turnos)
+        bloques = self.cargar_anteriores(desde, self.anteriores)
+        if not bloques:
+            self.anteriores = 0
+            return 0
+
+        # El bloque que estaba arriba del todo debe desplazarse con el texto nuevo
+        primero = self._bloques[0] if self._bloques else None
+        if primero is not None and self.widget.index(primero) != "1.0":
+            primero = None
+        arriba = _linea(self.widget.index("@0,0"))
+
+        texto = "".join(bloques)
+        self.widget.insert("1.0", texto)
+        nuevas = texto.count("\n")
+        if primero is not None:
+            self.widget.mark_set(primero, f"{1 + nuevas}.0")
+
+        # Un bloque por turno cargado, del más reciente al más antiguo
+        linea = 1 + nuevas
+        for desplazamiento, bloque in zip(range(len(bloques) - 1, -1, -1), reversed(bloques)):
+            linea -= bloque.count("\n")
+            self._agregar_marca(f"{linea}.0", self._nueva_marca(desde + desplazamiento), al_principio=True)
+
+        self.anteriores = desde
+        # Mantener a la vista lo mismo que antes de cargar
+        self.widget.yview(f"{arriba + nuevas}.0")
+        return len(bloques)
+
+    def borrar(self, anteriores=None):
+        """Vacía el historial descartando lo que aún no se había volcado"""
+        self._pendiente.clear()
+        if self._programado is not None:
+            self.widget.after_cancel(self._programado)
+            self._programado = None
+        for marca in self._bloques:
+            self.widget.mark_unset(marca)
+        self._bloques.clear()
+        self._anteriores.clear()
+        if anteriores is not None:
+            self.anteriores = anteriores
+        self.widget.delete(1.0, tk.END)